@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class AuthManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auth_manager'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from backend.authentication import forget_user
+        from backend.response_cache import reset_new_user
+        post_save.connect(reset_new_user, sender=User)
+        post_save.connect(forget_user, sender=User)
+        post_delete.connect(forget_user, sender=User)
@@ -0,0 +1,92 @@
+"""
+Password checks for logins, kept off the threads that serve everything else.
+
+Checking a password runs a deliberately slow key derivation (hundreds of
+milliseconds with PBKDF2). Logins hand it to a pool of LOGIN_HASH_WORKERS
+threads per process, so no more hashes than that run at once however many
+logins arrive; up to LOGIN_HASH_QUEUE more logins wait for a worker, and the
+rest are turned away at once (``LoginsBusy``) instead of piling up behind
+them. The hashers release the GIL, so the workers use as many cores.
+
+The user is loaded in the request thread. As with ``authenticate()``, a
+password stored with a hasher other than the first of PASSWORD_HASHERS, or
+with outdated parameters, is hashed again (also in the pool) on a successful
+login.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.signals import user_login_failed
+
+
+class LoginsBusy(Exception):
+    pass
+
+
+class PasswordChecks:
+    def __init__(self):
+        self._reset()
+        # Pool threads do not survive a fork
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._executor = self._slots = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(settings.LOGIN_HASH_WORKERS, thread_name_prefix='login-hash')
+                self._slots = threading.BoundedSemaphore(settings.LOGIN_HASH_WORKERS + settings.LOGIN_HASH_QUEUE)
+            return self._executor, self._slots
+
+    def run(self, function, *args):
+        """Run ``function`` in the pool and wait for its result; raises LoginsBusy if the queue is full"""
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            raise LoginsBusy()
+        try:
+            return executor.submit(function, *args).result()
+        finally:
+            slots.release()
+
+
+password_checks = PasswordChecks()
+
+
+def _check(password, encoded):
+    """Whether ``password`` matches ``encoded``, and its new hash if the stored one is outdated"""
+    if encoded is None:
+        # Hash anyway, as ModelBackend does, so unknown usernames take as long
+        make_password(password)
+        return False, None
+    upgraded = []
+    correct = check_password(password, encoded, setter=lambda raw: upgraded.append(make_password(raw)))
+    return correct, upgraded[0] if upgraded else None
+
+
+def authenticate_login(request, username, password):
+    """
+    ModelBackend's authentication with the password check in the pool: the
+    active user with these credentials, or None. Raises LoginsBusy.
+    """
+    if username is None or password is None:
+        return None
+    UserModel = get_user_model()
+    try:
+        user = UserModel._default_manager.get_by_natural_key(username)
+    except UserModel.DoesNotExist:
+        user = None
+
+    correct, upgraded = password_checks.run(_check, password, user.password if user else None)
+    if not correct or not getattr(user, 'is_active', True):
+        user_login_failed.send(sender=__name__, credentials={'username': username}, request=request)
+        return None
+    if upgraded:
+        user.password = upgraded
+        user.save(update_fields=['password'])
+    return user
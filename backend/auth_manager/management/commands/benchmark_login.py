@@ -0,0 +1,101 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from auth_manager import login
+
+
+def _log_in(credentials, deadline, results):
+    """Log in over and over until ``deadline``, backing off when turned away"""
+    client = APIClient()
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.post("/auth/login/", credentials, format="json")
+            elapsed = time.perf_counter() - start
+            with results["lock"]:
+                results["statuses"][response.status_code] = results["statuses"].get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    results["latencies"].append(elapsed)
+            if response.status_code == 503:
+                time.sleep(float(response["Retry-After"]))
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure logins per second and per core through the login endpoint with each of "
+        "PASSWORD_HASHER_CLASSES, from concurrent clients"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=32, help="Concurrent clients (default: 32)")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds per hasher (default: 10)")
+
+    def handle(self, *args, **options):
+        # Not an error logged per turned away login
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        cores = os.cpu_count()
+        self.stdout.write(
+            f"{options['clients']} clients for {options['duration']:.0f} s each, "
+            f"{settings.LOGIN_HASH_WORKERS} hash workers, queue of {settings.LOGIN_HASH_QUEUE}, {cores} cores"
+        )
+        # Every client logs in from one address as one user, which the login throttles would stop
+        unthrottled = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+        for name, hasher in settings.PASSWORD_HASHER_CLASSES.items():
+            with override_settings(PASSWORD_HASHERS=[hasher], REST_FRAMEWORK=unthrottled):
+                try:
+                    make_password("probe")
+                except ValueError as e:
+                    self.stdout.write(f"{name:>8}: skipped ({e})")
+                    continue
+                self._run(name, cores, options)
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    def _run(self, name, cores, options):
+        credentials = {"username": f"benchmark-login-{uuid.uuid4().hex[:8]}", "password": "benchmark-pass"}
+        user = User.objects.create_user(**credentials)
+        # A pool sized from the current settings
+        login.password_checks = login.PasswordChecks()
+        results = {"lock": threading.Lock(), "latencies": [], "statuses": {}}
+        try:
+            deadline = time.perf_counter() + options["duration"]
+            start = time.perf_counter()
+            clients = [
+                threading.Thread(target=_log_in, args=(credentials, deadline, results))
+                for _ in range(options["clients"])
+            ]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            user.delete()
+        self._report(name, cores, results, elapsed)
+
+    def _report(self, name, cores, results, elapsed):
+        latencies = sorted(results["latencies"])
+        if not latencies:
+            self.stdout.write(f"{name:>8}: no successful logins ({results['statuses']})")
+            return
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        rate = len(latencies) / elapsed
+        self.stdout.write(
+            f"{name:>8}: {rate:7.1f} logins/s, {rate / cores:7.1f} per core, p50 {percentile(0.5):6.0f} ms, "
+            f"p99 {percentile(0.99):6.0f} ms, {results['statuses'].get(503, 0)} turned away (503)"
+        )
@@ -0,0 +1,146 @@
+"""
+One-time codes, such as the second step of a login (LOGIN_OTP_REQUIRED).
+
+A code is issued for a purpose and a subject (``'login'``, a username), and
+verifies at most once, within OTP_TTL seconds, with at most OTP_MAX_ATTEMPTS
+guesses: a wrong guess past that drops the code. Only an HMAC of the code is
+stored, and guesses are compared with ``hmac.compare_digest``.
+
+OTP_BACKEND picks where codes are kept:
+
+- ``memory``: in this process, at most OTP_MAX_ENTRIES codes; past that, the
+  expired and then the oldest are dropped. Only for a single process: a
+  code issued by one worker is unknown to the others.
+- ``cache``: in the OTP_CACHE_ALIAS cache, shared by every process using it
+  (by default files in ``BASE_DIR/cache/otp``, so the workers of one host
+  share them; memcached or Redis spread them over hosts). The file based
+  cache unpickles what it reads, so its directory must only be writable by
+  the app's user: Django creates it with mode 0700, and it is not put in a
+  shared temporary directory where anyone could create it first. The cache
+  expires codes and caps their number. A code is used up by whichever
+  process deletes it first, so it cannot verify twice even in two workers
+  at once, and a code whose guess count is lost to eviction is dropped.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = ('memory', 'cache')
+DIGITS = 6
+
+
+def _digest(purpose, subject, code):
+    message = f'{purpose}:{subject}:{code}'.encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _key(purpose, subject):
+    # A fixed size key whatever the subject, safe for any cache
+    return 'otp:' + hashlib.blake2b(f'{purpose}:{subject}'.encode(), digest_size=16).hexdigest()
+
+
+class MemoryCodes:
+    clock = time.monotonic
+
+    def __init__(self):
+        self.clear()
+        # A lock held by another thread at fork would never be released in the child
+        os.register_at_fork(after_in_child=self.clear)
+
+    def clear(self):
+        self._lock = threading.Lock()
+        # key -> [digest, expires, guesses left], in order of issue, so of expiry
+        self._codes = OrderedDict()
+
+    def __len__(self):
+        return len(self._codes)
+
+    def put(self, key, digest):
+        now = self.clock()
+        with self._lock:
+            self._codes.pop(key, None)
+            self._codes[key] = [digest, now + settings.OTP_TTL, settings.OTP_MAX_ATTEMPTS]
+            while self._codes:
+                oldest = next(iter(self._codes.values()))
+                if oldest[1] > now and len(self._codes) <= settings.OTP_MAX_ENTRIES:
+                    break
+                self._codes.popitem(last=False)
+
+    def check(self, key, digest):
+        with self._lock:
+            entry = self._codes.get(key)
+            if entry is None or entry[1] <= self.clock():
+                self._codes.pop(key, None)
+                return False
+            if hmac.compare_digest(entry[0], digest):
+                del self._codes[key]
+                return True
+            entry[2] -= 1
+            if not entry[2]:
+                del self._codes[key]
+            return False
+
+
+class CacheCodes:
+    def _cache(self):
+        return caches[settings.OTP_CACHE_ALIAS]
+
+    def put(self, key, digest):
+        cache = self._cache()
+        cache.set_many({key: digest, f'{key}:guesses': 0}, timeout=settings.OTP_TTL)
+
+    def check(self, key, digest):
+        cache = self._cache()
+        stored = cache.get(key)
+        if stored is None:
+            return False
+        if hmac.compare_digest(stored, digest):
+            # Only the one process that deletes it gets to use it
+            return bool(cache.delete(key))
+        guesses_key = f'{key}:guesses'
+        if cache.add(guesses_key, 0, timeout=settings.OTP_TTL):
+            # The count was culled or evicted: without it guesses would go uncounted
+            cache.delete(key)
+            return False
+        try:
+            guesses = cache.incr(guesses_key)
+        except ValueError:
+            # Expired or evicted meanwhile
+            cache.delete(key)
+            return False
+        if guesses >= settings.OTP_MAX_ATTEMPTS:
+            cache.delete(key)
+        return False
+
+
+memory_codes = MemoryCodes()
+cache_codes = CacheCodes()
+
+
+def _backend():
+    backend = settings.OTP_BACKEND
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(f"OTP_BACKEND must be one of: {', '.join(BACKENDS)}.")
+    return memory_codes if backend == 'memory' else cache_codes
+
+
+def issue(purpose, subject):
+    """A new code for ``subject``, replacing any it had for ``purpose``"""
+    code = f'{secrets.randbelow(10 ** DIGITS):0{DIGITS}d}'
+    _backend().put(_key(purpose, subject), _digest(purpose, subject, code))
+    return code
+
+
+def verify(purpose, subject, code):
+    """Whether ``code`` is ``subject``'s current code for ``purpose``; a code verifies once"""
+    if not subject or code is None:
+        return False
+    return _backend().check(_key(purpose, subject), _digest(purpose, subject, str(code).strip()))
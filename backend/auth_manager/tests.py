@@ -1,3 +1,369 @@
-from django.test import TestCase
+import multiprocessing
+import re
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from auth_manager import login, otp
+from backend import throttling
+from backend.authentication import add_user_claims
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        caches['auth'].clear()
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.authorize(self.user)
+
+    def authorize(self, user):
+        token = add_user_claims(AccessToken.for_user(user), user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def user_queries(self, path='/order/stats/'):
+        """Status of a request, and how many of its queries read the user table"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response.status_code, sum('"auth_user"' in query['sql'] for query in queries)
+
+    @override_settings(AUTH_USER_LOOKUP='database')
+    def test_database_lookup_reads_the_user_every_time(self):
+        self.assertEqual(self.user_queries(), (200, 1))
+        self.assertEqual(self.user_queries(), (200, 1))
+
+    def test_cache_lookup_reads_the_user_once(self):
+        self.assertEqual(self.user_queries(), (200, 1))
+        self.assertEqual(self.user_queries(), (200, 0))
+
+    def test_cached_user_is_dropped_on_change(self):
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.user_queries(), (401, 1))
+
+        self.user.delete()
+        self.assertEqual(self.user_queries(), (401, 1))
+
+    @override_settings(AUTH_USER_LOOKUP='stateless')
+    def test_stateless_lookup_trusts_the_token(self):
+        self.assertEqual(self.user_queries(), (200, 0))
+
+        response = self.client.post('/product/', {
+            'name': 'Pen', 'cost_price': '1.00', 'selling_price': '2.00', 'stock_available': 3,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.user.products.get().name, 'Pen')
+
+    def test_users_only_see_their_own_rows(self):
+        self.client.post('/product/', {
+            'name': 'Pen', 'cost_price': '1.00', 'selling_price': '2.00', 'stock_available': 3,
+        }, format='json')
+        other = User.objects.create_user(username='other', password='secret-pass')
+        self.authorize(other)
+        response = self.client.get('/product/')
+        self.assertEqual(response.data['data'], [])
+
+    @override_settings(AUTH_USER_LOOKUP='redis')
+    def test_unknown_lookup_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get('/order/stats/')
+
+
+class LoginTests(APITestCase):
+    def setUp(self):
+        throttling.token_buckets.clear()
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+
+    def log_in(self, password='secret-pass'):
+        return self.client.post('/auth/login/', {'username': 'seller', 'password': password}, format='json')
+
+    def test_login_returns_tokens(self):
+        response = self.log_in()
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.data['data']['access'])
+        refresh = RefreshToken(response.data['data']['refresh'])
+        self.assertEqual(access['user_id'], str(self.user.pk))
+        self.assertIs(access['is_staff'], False)
+        self.assertNotEqual(access['jti'], refresh['jti'])
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_outdated_hash_is_replaced_on_login(self):
+        self.user.password = make_password('secret-pass', hasher='md5')
+        self.user.save()
+        self.assertEqual(self.log_in().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertEqual(self.log_in().status_code, 200)
+
+    def test_bad_credentials_are_rejected(self):
+        self.assertEqual(self.log_in('wrong-pass').status_code, 400)
+        response = self.client.post('/auth/login/', {'username': 'nobody', 'password': 'secret-pass'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.log_in().status_code, 400)
+
+    @override_settings(LOGIN_HASH_WORKERS=1, LOGIN_HASH_QUEUE=0)
+    def test_logins_are_turned_away_when_the_pool_is_full(self):
+        checks = login.PasswordChecks()
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            started.set()
+            release.wait(10)
+
+        holder = threading.Thread(target=checks.run, args=(hold,))
+        with mock.patch.object(login, 'password_checks', checks):
+            holder.start()
+            started.wait(10)
+            try:
+                response = self.log_in()
+            finally:
+                release.set()
+                holder.join()
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+            self.assertEqual(self.log_in().status_code, 200)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        throttling.token_buckets.clear()
+        throttling.metrics.clear()
+        caches['throttle'].clear()
+        User.objects.create_user(username='seller', password='secret-pass')
+
+    def log_in(self, username='seller', **extra):
+        return self.client.post(
+            '/auth/login/', {'username': username, 'password': 'wrong-pass'}, format='json', **extra
+        )
+
+    @throttle_rates(login_ip='100/min', login_username='3/min')
+    # Stopped, so slow password hashing does not refill the bucket
+    @mock.patch.object(throttling.token_buckets, 'clock', return_value=1000.0)
+    def test_attempts_over_the_limit_are_turned_away_before_any_work(self, clock):
+        for _ in range(3):
+            self.assertEqual(self.log_in().status_code, 400)
+
+        with mock.patch.object(login.password_checks, 'run') as check, self.assertNumQueries(0):
+            response = self.log_in(username=' SELLER')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        check.assert_not_called()
+        self.assertEqual(self.log_in(username='other').status_code, 400)
+        self.assertEqual(throttling.metrics.snapshot()[('login', 'username', 'throttled')], 1)
+
+    @throttle_rates(login_ip='2/min', login_username='100/min')
+    def test_addresses_are_limited_across_usernames(self):
+        self.assertEqual(self.log_in('a').status_code, 400)
+        self.assertEqual(self.log_in('b').status_code, 400)
+        self.assertEqual(self.log_in('c').status_code, 429)
+        self.assertEqual(self.log_in('c', REMOTE_ADDR='10.0.0.2').status_code, 400)
+
+    @throttle_rates(register_ip='1/hour', register_username='1/hour')
+    def test_registration_is_limited(self):
+        details = {'username': 'buyer', 'email': 'buyer@example.com', 'password': 'secret-pass'}
+        self.assertEqual(self.client.post('/auth/register/', details, format='json').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.post('/auth/register/', {**details, 'username': 'buyer2'}, format='json')
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(THROTTLE_BACKEND='cache')
+    @throttle_rates(login_ip='100/min', login_username='3/min')
+    def test_cache_backend_limits_attempts(self):
+        for _ in range(3):
+            self.assertEqual(self.log_in().status_code, 400)
+        self.assertEqual(self.log_in().status_code, 429)
+
+    def credential_stuffing(self, backend, clock):
+        """10,000 attempts in one second from one address over 1,000 usernames; returns how many got through"""
+        factory = APIRequestFactory()
+        view = mock.Mock(throttle_scope='login')
+        requests = [
+            Request(factory.post('/auth/login/', {'username': f'user{i}'}, format='json'), parsers=[JSONParser()])
+            for i in range(1000)
+        ]
+        allowed = 0
+        with mock.patch.object(backend, 'clock', clock):
+            for i in range(10000):
+                clock.return_value = 1_000_000 + i / 10000
+                request = requests[i % len(requests)]
+                allowed += all([
+                    throttling.IPThrottle().allow_request(request, view),
+                    throttling.UsernameThrottle().allow_request(request, view),
+                ])
+        return allowed
+
+    @throttle_rates(login_ip='30/min', login_username='10/min')
+    def test_memory_backend_holds_at_ten_thousand_attempts_a_second(self):
+        self.assertEqual(self.credential_stuffing(throttling.token_buckets, mock.Mock()), 30)
+        counts = throttling.metrics.snapshot()
+        self.assertEqual(counts['login', 'ip', 'allowed'], 30)
+        self.assertEqual(counts['login', 'ip', 'throttled'], 9970)
+        # Every username was tried ten times, within its limit
+        self.assertEqual(counts['login', 'username', 'allowed'], 10000)
+
+    @override_settings(THROTTLE_BACKEND='cache')
+    @throttle_rates(login_ip='30/min', login_username='10/min')
+    def test_cache_backend_holds_at_ten_thousand_attempts_a_second(self):
+        self.assertEqual(self.credential_stuffing(throttling.sliding_windows, mock.Mock()), 30)
+
+    @override_settings(THROTTLE_MAX_KEYS=100)
+    @throttle_rates(login_ip='30/min', login_username='10/min')
+    def test_memory_backend_keeps_at_most_max_keys(self):
+        self.credential_stuffing(throttling.token_buckets, mock.Mock())
+        self.assertEqual(len(throttling.token_buckets._buckets), 100)
+
+
+class SharedOTPCacheMixin:
+    """Codes in a cache of their own, in files as the default 'otp' cache keeps them"""
+    def setUp(self):
+        super().setUp()
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES={**settings.CACHES, 'otp': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}))
+        otp.memory_codes.clear()
+
+
+@override_settings(LOGIN_OTP_REQUIRED=True)
+class OTPLoginTests(SharedOTPCacheMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        throttling.token_buckets.clear()
+        User.objects.create_user(username='seller', email='seller@example.com', password='secret-pass')
+
+    def emailed_code(self):
+        response = self.client.post('/auth/login/', {'username': 'seller', 'password': 'secret-pass'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('data', response.data)
+        return re.search(r'OTP for login is: (\d{6})', mail.outbox[-1].body).group(1)
+
+    def verify(self, code):
+        return self.client.post('/auth/verify_otp/', {'username': 'seller', 'otp': code}, format='json')
+
+    def test_code_is_exchanged_for_tokens_once(self):
+        for backend in otp.BACKENDS:
+            with self.subTest(backend=backend), override_settings(OTP_BACKEND=backend):
+                code = self.emailed_code()
+                response = self.verify(code)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(AccessToken(response.data['data']['access'])['user_id'], str(User.objects.get().pk))
+                self.assertEqual(self.verify(code).status_code, 400)
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_code_is_dropped_after_too_many_wrong_guesses(self):
+        for backend in otp.BACKENDS:
+            with self.subTest(backend=backend), override_settings(OTP_BACKEND=backend):
+                code = self.emailed_code()
+                wrong = f'{(int(code) + 1) % 10 ** 6:06d}'
+                for _ in range(3):
+                    self.assertEqual(self.verify(wrong).status_code, 400)
+                self.assertEqual(self.verify(code).status_code, 400)
+
+    def test_new_code_replaces_the_last(self):
+        first = self.emailed_code()
+        second = self.emailed_code()
+        if first != second:
+            self.assertEqual(self.verify(first).status_code, 400)
+        self.assertEqual(self.verify(second).status_code, 200)
+
+
+@override_settings(OTP_BACKEND='memory', OTP_TTL=300, OTP_MAX_ENTRIES=3)
+class MemoryOTPTests(SimpleTestCase):
+    def setUp(self):
+        otp.memory_codes.clear()
+        self.clock = self.enterContext(mock.patch.object(otp.memory_codes, 'clock', mock.Mock(return_value=1000)))
+
+    def test_codes_expire(self):
+        code = otp.issue('login', 'seller')
+        self.clock.return_value = 1300
+        self.assertFalse(otp.verify('login', 'seller', code))
+        self.assertEqual(len(otp.memory_codes), 0)
+
+    def test_codes_are_capped(self):
+        codes = {name: otp.issue('login', name) for name in ['a', 'b', 'c', 'd']}
+        self.assertEqual(len(otp.memory_codes), 3)
+        self.assertFalse(otp.verify('login', 'a', codes['a']))
+        self.assertTrue(otp.verify('login', 'd', codes['d']))
+
+    def test_expired_codes_are_dropped_first(self):
+        otp.issue('login', 'a')
+        self.clock.return_value = 1200
+        b = otp.issue('login', 'b')
+        self.clock.return_value = 1400
+        otp.issue('login', 'c')
+        self.assertEqual(len(otp.memory_codes), 2)
+        self.assertTrue(otp.verify('login', 'b', b))
+
+    def test_codes_are_per_purpose(self):
+        code = otp.issue('login', 'seller')
+        self.assertFalse(otp.verify('reset', 'seller', code))
+        self.assertTrue(otp.verify('login', 'seller', code))
+
+
+def verify_login_code(code):
+    """verify_otp's check, in a worker process of its own"""
+    return otp.verify('login', 'seller', code)
+
+
+def issue_login_code(_):
+    return otp.issue('login', 'seller')
+
+
+@override_settings(OTP_BACKEND='cache')
+class CacheOTPTests(SharedOTPCacheMixin, SimpleTestCase):
+    def test_code_is_dropped_when_its_guess_count_is_lost(self):
+        code = otp.issue('login', 'seller')
+        cache = caches[settings.OTP_CACHE_ALIAS]
+        cache.delete(otp._key('login', 'seller') + ':guesses')
+
+        self.assertFalse(otp.verify('login', 'seller', 'wrong'))
+        self.assertFalse(otp.verify('login', 'seller', code))
+
+    def test_wrong_guesses_are_counted(self):
+        code = otp.issue('login', 'seller')
+        for _ in range(settings.OTP_MAX_ATTEMPTS):
+            self.assertFalse(otp.verify('login', 'seller', 'wrong'))
+        self.assertFalse(otp.verify('login', 'seller', code))
+
+
+class WorkerProcessOTPTests(SharedOTPCacheMixin, SimpleTestCase):
+    WORKERS = 4
+
+    def workers(self):
+        return multiprocessing.get_context('fork').Pool(self.WORKERS)
+
+    @override_settings(OTP_BACKEND='cache')
+    def test_shared_codes_verify_in_any_worker_once(self):
+        with self.workers() as pool:
+            code, = pool.map(issue_login_code, [None])
+            self.assertEqual(sorted(pool.map(verify_login_code, [code] * self.WORKERS * 2)), [False] * 7 + [True])
+
+    @override_settings(OTP_BACKEND='memory')
+    def test_memory_codes_stay_in_their_process(self):
+        code = otp.issue('login', 'seller')
+        with self.workers() as pool:
+            self.assertEqual(pool.map(verify_login_code, [code] * self.WORKERS), [False] * self.WORKERS)
+        self.assertTrue(otp.verify('login', 'seller', code))
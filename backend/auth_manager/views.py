@@ -1,20 +1,40 @@
 from datetime import timedelta
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
 from django.contrib.auth.tokens import default_token_generator
 from rest_framework.decorators import action
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.mail import send_mail
 from django.conf import settings
-import random
 
-OTP_STORE = {}
+from backend.authentication import add_user_claims
+from backend.throttling import IPThrottle, UsernameThrottle
+from . import otp as otp_codes
+from .login import LoginsBusy, authenticate_login
+
+
+def login_response(user):
+    """The tokens of a user who has logged in"""
+    refresh = add_user_claims(RefreshToken.for_user(user), user)
+    # Carries the refresh token's claims over, rather than building another token from the user
+    access = refresh.access_token
+    access.set_exp(lifetime=timedelta(hours=10))
+    return Response({
+        "message": "Login successful",
+        "data": {
+            "name": user.username,
+            "access": str(access),
+            "refresh": str(refresh),
+        },
+    })
+
 
 class AuthViewSet(ViewSet):
+    # Set per action, for the throttles' rates
+    throttle_scope = None
 
-    @action(detail=False, methods=["post"])
+    @action(detail=False, methods=["post"], throttle_classes=[IPThrottle, UsernameThrottle], throttle_scope="register")
     def register(self, request):
         username = request.data.get("username")
         email = request.data.get("email")
@@ -70,62 +90,47 @@ class AuthViewSet(ViewSet):
         else:
             return Response({"meta": {"message": "Invalid or expired token"}}, status=400)
 
-    @action(detail=False, methods=["post"])
+    @action(detail=False, methods=["post"], throttle_classes=[IPThrottle, UsernameThrottle], throttle_scope="login")
     def login(self, request):
         username = request.data.get("username")
         password = request.data.get("password")
 
-        user = authenticate(username=username, password=password)
+        try:
+            user = authenticate_login(request, username, password)
+        except LoginsBusy:
+            return Response(
+                {"meta": {"message": "Too many logins in progress, please retry", "status_code": 503}},
+                status=503,
+                headers={"Retry-After": "1"},
+            )
         if not user:
             return Response({"meta": {"message": "Invalid credentials", "status_code": 400}}, status=400)
         
-        refresh = RefreshToken.for_user(user)
-        access = AccessToken.for_user(user)
-        access.set_exp(lifetime=timedelta(hours=10))
         # if not user.is_active:
         #     return Response({"meta": {"message": "Email not verified. Please verify your email first."}}, status=400)
 
-        # otp = random.randint(100000, 999999)
-        # OTP_STORE[username] = otp
-
-        # send_mail(
-        #     "Your Login OTP",
-        #     f"Hi {user.username},\n\nYour OTP for login is: {otp}\n\nIt is valid for 5 minutes.",
-        #     settings.DEFAULT_FROM_EMAIL,
-        #     [user.email],
-        #     fail_silently=False,
-        # )
-
-        return Response({
-            "message": "Login successful",
-            "data": {
-                "name": user.username,
-                "access": str(access),
-                "refresh": str(refresh),
-            },
-        })
-
-    # @action(detail=False, methods=["post"])
-    # def verify_otp(self, request):
-    #     username = request.data.get("username")
-    #     otp_code = request.data.get("otp")
-
-    #     if username not in OTP_STORE or str(OTP_STORE[username]) != str(otp_code):
-    #         return Response({"meta": {"message": "Invalid or expired OTP"}}, status=400)
-
-    #     user = User.objects.get(username=username)
-    #     refresh = RefreshToken.for_user(user)
-    #     access = AccessToken.for_user(user)
-    #     access.set_exp(lifetime=timedelta(hours=10))
-
-    #     del OTP_STORE[username]
+        if settings.LOGIN_OTP_REQUIRED:
+            otp = otp_codes.issue("login", user.get_username())
+            send_mail(
+                "Your Login OTP",
+                f"Hi {user.username},\n\nYour OTP for login is: {otp}\n\nIt is valid for {settings.OTP_TTL // 60} minutes.",
+                settings.DEFAULT_FROM_EMAIL,
+                [user.email],
+                fail_silently=False,
+            )
+            return Response({"meta": {"message": "OTP sent to your email."}})
+
+        return login_response(user)
+
+    @action(detail=False, methods=["post"], throttle_classes=[IPThrottle, UsernameThrottle], throttle_scope="verify_otp")
+    def verify_otp(self, request):
+        username = request.data.get("username")
+        otp_code = request.data.get("otp")
 
-    #     return Response({
-    #         "message": "Login successful",
-    #         "data": {
-    #             "name": user.username,
-    #             "access": str(access),
-    #             "refresh": str(refresh),
-    #         },
-    #     })
+        if not otp_codes.verify("login", username, otp_code):
+            return Response({"meta": {"message": "Invalid or expired OTP"}}, status=400)
 
+        user = User.objects.filter(username=username, is_active=True).first()
+        if user is None:
+            return Response({"meta": {"message": "Invalid or expired OTP"}}, status=400)
+        return login_response(user)
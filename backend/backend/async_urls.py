@@ -0,0 +1,17 @@
+"""
+URL configuration for ASGI deployments (ASYNC_READ_VIEWS): backend.urls, with
+the read endpoints of products and orders served by async views
+(backend.async_views).
+"""
+from django.urls import include, path
+
+from order_manager.urls import async_urlpatterns as order_urlpatterns
+from product_manager.urls import async_urlpatterns as product_urlpatterns
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("product/", include(product_urlpatterns)),
+    path("order/", include(order_urlpatterns)),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,96 @@
+"""
+Async views for the read endpoints, for ASGI deployments (ASYNC_READ_VIEWS).
+
+A DRF view is synchronous: under an ASGI server every request holds a worker
+thread from start to finish, waits on the database included. ``async_reads``
+puts async views in front of a router's URL patterns: GET and HEAD of the
+chosen routes go to an async handler using the async ORM, every other method
+to the viewset as before.
+
+Handlers look like viewset actions: they take a DRF request and return a DRF
+``Response``. Authentication and the IsAuthenticated check run first, in one
+thread hop, with the DEFAULT_AUTHENTICATION_CLASSES; errors become responses
+as DRF's exception handler makes them, and responses are always JSON.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import re_path
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from .renderers import FastJSONRenderer
+from .routers import choose_replica, start_routing, stop_routing
+
+
+def _authenticate(request):
+    """Authenticate ``request``; returns the replica to read from, if any"""
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    return choose_replica(request.user.pk) if settings.DATABASE_REPLICAS else None
+
+
+def _handle_exception(request, exc):
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # As APIView does: 401 with a challenge if the authenticator has one, else 403
+        header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+        if header:
+            exc.auth_header = header
+        else:
+            exc.status_code = 403
+    response = exception_handler(exc, {'request': request})
+    if response is None:
+        raise exc
+    return response
+
+
+def _render(request, response):
+    """``response`` rendered as DRF would, as a plain response Django has nothing left to do on"""
+    renderer = FastJSONRenderer()
+    content = renderer.render(response.data, renderer.media_type, {'request': request, 'response': response})
+    rendered = HttpResponse(content, status=response.status_code)
+    for header, value in response.items():
+        rendered[header] = value
+    if content:
+        rendered['Content-Type'] = renderer.media_type
+    else:
+        del rendered['Content-Type']
+    return rendered
+
+
+def async_read_view(handler, view):
+    """Serve GET and HEAD with the async ``handler``, everything else with the sync ``view``"""
+    async def async_view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or 'format' in kwargs:
+            return await sync_to_async(view)(request, *args, **kwargs)
+
+        request = Request(
+            request, authenticators=[authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        )
+        token = None
+        try:
+            replica = await sync_to_async(_authenticate)(request)
+            if settings.DATABASE_REPLICAS:
+                token = start_routing(request.user.pk, replica)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = _handle_exception(request, exc)
+        finally:
+            if token is not None:
+                stop_routing(token)
+        return _render(request, response)
+
+    # Like the viewsets, which check CSRF themselves for session authentication
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def async_reads(patterns, handlers):
+    """``patterns`` (a router's URLs) with the routes named in ``handlers`` read by async handlers"""
+    return [
+        re_path(pattern.pattern.regex.pattern, async_read_view(handlers[pattern.name], pattern.callback), name=pattern.name)
+        if pattern.name in handlers else pattern
+        for pattern in patterns
+    ]
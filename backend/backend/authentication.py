@@ -0,0 +1,100 @@
+"""
+JWT authentication that does not load the token's user row on every request.
+
+AUTH_USER_LOOKUP picks where the user comes from:
+
+- ``database``: simplejwt's JWTAuthentication, one User query per request.
+- ``cache``: the user's id, ``is_active`` and ``is_staff`` are kept in the
+  AUTH_USER_CACHE_ALIAS cache (bounded, entries expire after its TIMEOUT),
+  keyed by the token's user id, and dropped whenever the user is saved or
+  deleted. Queryset ``update()`` calls skip the signals, so such changes show
+  after the timeout, as they do in other processes with a per-process cache.
+- ``stateless``: trusts the claims the token was issued with (``add_user_claims``),
+  with no lookup at all; a deactivated user keeps access until their access
+  token expires.
+
+Outside ``database`` mode ``request.user`` is a User instance with only those
+fields loaded, which is all ``created_by=request.user`` filters and
+assignments need.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+LOOKUPS = ('database', 'cache', 'stateless')
+USER_FIELDS = ('pk', 'is_active', 'is_staff')
+
+
+def _cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def _user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def add_user_claims(token, user):
+    """Embed what ``stateless`` mode needs to know about ``user`` in ``token``"""
+    token['is_staff'] = user.is_staff
+    return token
+
+
+def forget_user(sender, instance, **kwargs):
+    """post_save/post_delete receiver for users: drop the cached user"""
+    key = _user_key(getattr(instance, api_settings.USER_ID_FIELD))
+    _cache().delete(key)
+    if transaction.get_connection().in_atomic_block:
+        # A request may cache the old row before the change commits
+        transaction.on_commit(lambda: _cache().delete(key))
+
+
+def _cached_user_fields(user_model, user_id):
+    key = _user_key(user_id)
+    fields = _cache().get(key)
+    if fields is None:
+        fields = user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).values(*USER_FIELDS).first()
+        if fields is not None:
+            _cache().set(key, fields)
+    return fields
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        lookup = settings.AUTH_USER_LOOKUP
+        if lookup not in LOOKUPS:
+            raise ImproperlyConfigured(f"AUTH_USER_LOOKUP must be one of: {', '.join(LOOKUPS)}.")
+        if lookup == 'database' or api_settings.CHECK_REVOKE_TOKEN:
+            # Revocation compares the password hash, which only the row has
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if lookup == 'stateless':
+            fields = {
+                api_settings.USER_ID_FIELD: user_id,
+                'is_active': True,
+                'is_staff': validated_token.get('is_staff', False),
+            }
+        else:
+            fields = _cached_user_fields(self.user_model, user_id)
+            if fields is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not fields['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        user = self.user_model(**fields)
+        # Like a row loaded from the database
+        user._state.adding = False
+        user._state.db = DEFAULT_DB_ALIAS
+        return user
@@ -0,0 +1,27 @@
+"""
+SQLite backend tuned for several worker processes writing to one database.
+
+Every new connection applies the ``PRAGMAS`` of the database settings
+(DB_SQLITE_* in settings.py): WAL journaling, so readers and the writer no
+longer block each other, ``synchronous = NORMAL``, which is durable enough in
+WAL mode and skips an fsync per commit, a busy timeout, and the sizes of the
+memory map and page cache.
+
+``atomic`` blocks start with ``BEGIN IMMEDIATE`` rather than ``BEGIN``: a
+deferred transaction that reads and then writes, as order creation does,
+fails at once with "database is locked" when another process holds the write
+lock, since waiting could deadlock. Taking the write lock up front makes it
+wait out the busy timeout instead.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,36 @@
+"""
+Time-ordered UUIDs (version 7, RFC 9562) for primary keys.
+
+The first 48 bits are the Unix time in milliseconds, so new keys land at the
+end of the primary key index instead of at random pages. Within a millisecond
+the next 12 bits count up from a random start, keeping keys from one process
+strictly increasing; the last 62 bits are random. They are ordinary UUIDs, so
+existing version 4 keys and clients are unaffected.
+"""
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7():
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # Leave room to count up within the millisecond
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x7ff
+        else:
+            # Same millisecond, or the clock went back: keep counting from the last key
+            _counter += 1
+            if _counter > 0xfff:
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+    random_bits = int.from_bytes(os.urandom(8), 'big') & (2 ** 62 - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | random_bits)
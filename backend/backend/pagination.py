@@ -0,0 +1,112 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Pages are selected with a WHERE clause on the ordering keys of the last row
+already served instead of an OFFSET, so every page costs the same however deep
+the client has paged. Cursors are opaque, URL-safe tokens.
+
+Every list is served in pages of ``page_size`` rows (API_PAGE_SIZE unless the
+client asks for another size, never more than API_MAX_PAGE_SIZE); clients
+follow ``meta.next`` for the rest.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    return value
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset ordered by ``ordering``, which must end in a unique
+    field (the primary key) so that every row has a distinct position.
+    """
+
+    def __init__(self, ordering=('-created_at', '-id')):
+        self.keys = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        self.ordering = list(ordering)
+
+    def get_page_size(self, request):
+        """Rows per page"""
+        try:
+            page_size = int(request.query_params.get('page_size', settings.API_PAGE_SIZE))
+        except ValueError:
+            return settings.API_PAGE_SIZE
+        return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    def encode_cursor(self, row):
+        values = [
+            _encode_value(row[field] if isinstance(row, dict) else getattr(row, field))
+            for field, _ in self.keys
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, model):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise InvalidCursor("Invalid cursor.")
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor("Invalid cursor.")
+        decoded = []
+        for (field, _), value in zip(self.keys, values):
+            try:
+                value = model._meta.get_field(field).to_python(value)
+            except FieldDoesNotExist:
+                # Annotations (e.g. a search rank) round-trip as plain JSON values
+                pass
+            except ValidationError:
+                raise InvalidCursor("Invalid cursor.")
+            decoded.append(value)
+        return decoded
+
+    def after(self, values):
+        """Rows strictly after the position ``values`` in this ordering"""
+        condition = Q()
+        for index, (field, descending) in enumerate(self.keys):
+            lookup = {key: value for (key, _), value in zip(self.keys[:index], values)}
+            lookup[f"{field}__{'lt' if descending else 'gt'}"] = values[index]
+            condition |= Q(**lookup)
+        return condition
+
+    def page_queryset(self, queryset, request):
+        """Return the page size and the rows of the page, plus one to tell whether more follow"""
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor, queryset.model)))
+        page_size = self.get_page_size(request)
+        return page_size, queryset[:page_size + 1]
+
+    def _page(self, rows, page_size):
+        if len(rows) <= page_size:
+            return rows, None
+        rows = rows[:page_size]
+        return rows, self.encode_cursor(rows[-1])
+
+    def paginate(self, queryset, request):
+        """Return ``(rows, next_cursor)``; ``next_cursor`` is None on the last page"""
+        page_size, queryset = self.page_queryset(queryset, request)
+        return self._page(list(queryset), page_size)
+
+    async def apaginate(self, queryset, request):
+        """``paginate`` for async views"""
+        page_size, queryset = self.page_queryset(queryset, request)
+        return self._page([row async for row in queryset], page_size)
@@ -0,0 +1,133 @@
+"""
+PostgreSQL backend that takes its connections from a per-process pool.
+
+Configured with ``POOL = {'min_size': ..., 'max_size': ..., 'timeout': ...,
+'check_idle': ...}`` in the database settings (DB_POOL_* in settings.py): at
+most ``max_size`` connections are open, and ``min_size`` of them (by default
+all of them) are kept open between uses: psycopg2 disconnects any connection
+handed back while ``min_size`` others are already waiting in the pool, so a
+smaller ``min_size`` reconnects under load. A thread that finds them all in use waits up to ``timeout``
+seconds for one to come back before failing with OperationalError. Closing the
+connection, which Django does at the end of every request with CONN_MAX_AGE =
+0, hands it back to the pool rolled back instead of disconnecting. With
+CONN_HEALTH_CHECKS, a connection that sat in the pool longer than
+``check_idle`` seconds is checked when taken from it; one used moments ago is
+not worth the round trip. Requires psycopg2.
+"""
+import os
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+if is_psycopg3:
+    raise ImproperlyConfigured("backend.pooled_postgresql works with psycopg2 only.")
+
+from psycopg2 import pool as psycopg2_pool  # noqa: E402
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _forget_pools():
+    # A forked worker opens its own connections instead of sharing its parent's sockets
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_pools)
+
+
+def _usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        connection.rollback()
+    except base.Database.Error:
+        return False
+    return True
+
+
+class _Pool:
+    """
+    A ThreadedConnectionPool that waits for a free connection rather than
+    raising PoolError when all of them are in use, and remembers when each
+    idle connection was put back
+    """
+
+    def __init__(self, min_size, max_size, timeout, check_idle, **conn_params):
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._connections = psycopg2_pool.ThreadedConnectionPool(min_size, max_size, **conn_params)
+        self._available = threading.BoundedSemaphore(max_size)
+        self._returned_at = {}
+
+    def getconn(self, health_checks):
+        if not self._available.acquire(timeout=self.timeout):
+            raise base.Database.OperationalError(
+                f"No pooled connection came free in {self.timeout} seconds."
+            )
+        try:
+            connection = self._connections.getconn()
+            returned_at = self._returned_at.pop(id(connection), None)
+            idle = time.monotonic() - returned_at if returned_at is not None else 0
+            if health_checks and idle > self.check_idle and not _usable(connection):
+                self._connections.putconn(connection, close=True)
+                connection = self._connections.getconn()
+        except BaseException:
+            self._available.release()
+            raise
+        return connection
+
+    def putconn(self, connection):
+        # Raises PoolError for a connection of another pool, which keeps its slot
+        self._connections.putconn(connection)
+        if not connection.closed:
+            self._returned_at[id(connection)] = time.monotonic()
+        self._available.release()
+
+
+class _PooledDatabase:
+    """The psycopg2 module as the wrapper uses it, with connect() taking from the pool"""
+
+    def __init__(self, wrapper):
+        self._wrapper = wrapper
+
+    def __getattr__(self, name):
+        return getattr(base.Database, name)
+
+    def _pool(self, conn_params):
+        alias, settings_dict = self._wrapper.alias, self._wrapper.settings_dict
+        with _pools_lock:
+            if alias not in _pools:
+                options = settings_dict.get('POOL', {})
+                max_size = options.get('max_size') or 10
+                _pools[alias] = _Pool(
+                    min(options.get('min_size', max_size), max_size), max_size,
+                    options.get('timeout', 30), options.get('check_idle', 30), **conn_params
+                )
+            return _pools[alias]
+
+    def connect(self, **conn_params):
+        return self._pool(conn_params).getconn(self._wrapper.settings_dict['CONN_HEALTH_CHECKS'])
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.Database = _PooledDatabase(self)
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = _pools.get(self.alias)
+        with self.wrap_database_errors:
+            try:
+                # The pool rolls back open transactions and drops broken connections
+                pool.putconn(self.connection)
+            except (AttributeError, psycopg2_pool.PoolError):
+                # Opened by another pool, e.g. before a fork
+                self.connection.close()
@@ -0,0 +1,39 @@
+import json
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, JSONRenderer's encoder is used without it
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renders exactly the bytes JSONRenderer would, with orjson (>= 3.9) when it
+    is installed. Decimals are written through the standard library float
+    formatting, since orjson spells exponents differently (1e-7 vs 1e-07).
+    """
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, Decimal):
+            return orjson.Fragment(json.dumps(float(obj), allow_nan=False).encode())
+        return JSONEncoder().default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self._default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            # e.g. non-string keys or big integers, which only the stdlib encoder handles
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by JSONRenderer for JavaScript compatibility
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
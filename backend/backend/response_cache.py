@@ -0,0 +1,159 @@
+"""
+Per-user cache for the read endpoints the dashboards poll.
+
+Entries are keyed by user, endpoint, normalized query parameters and the
+current version of every data namespace the endpoint reads ("products",
+"orders"). Writes bump the version of the namespaces they touch, so stale
+entries are never read again and simply age out of the cache. The same key is
+sent as the ETag, so a client holding a current copy gets a 304 without any
+database work.
+
+The entries go to the ``RESPONSE_CACHE_ALIAS`` entry of ``CACHES``: an
+in-process LRU (locmem) by default, or any shared Django cache backend (file,
+Redis, ...). The versions go to ``RESPONSE_VERSION_CACHE_ALIAS``, which must be
+shared by every worker even when entries are cached per process: a write served
+by one worker has to make the entries of all of them stale.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete
+from django.utils.cache import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+NAMESPACES = ('products', 'orders')
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _versions():
+    return caches[settings.RESPONSE_VERSION_CACHE_ALIAS]
+
+
+def _version_key(user_id, namespace):
+    return f'response-version:{user_id}:{namespace}'
+
+
+def get_versions(user_id, namespaces):
+    cache = _versions()
+    keys = [_version_key(user_id, namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock, not 0, so a version evicted from the cache
+            # can never come back at a value an old entry was stored under
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(user_id, namespaces):
+    # A new value rather than incr(), which shared backends such as the file based
+    # one do as a read and a write that two workers may interleave
+    _versions().set_many(
+        {_version_key(user_id, namespace): time.time_ns() for namespace in namespaces}, timeout=None
+    )
+
+
+def invalidate(user_id, *namespaces):
+    """
+    Make every cached response of ``user_id`` that reads ``namespaces`` stale.
+    Inside a transaction the versions are bumped again on commit, so a reader
+    that cached pre-commit data in between cannot keep serving it.
+    """
+    _bump(user_id, namespaces)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(user_id, namespaces))
+
+
+def invalidate_on_write(model, *namespaces):
+    """Invalidate ``namespaces`` for the owner whenever a ``model`` row is saved or deleted"""
+    def receiver(sender, instance, **kwargs):
+        invalidate(instance.created_by_id, *namespaces)
+
+    post_save.connect(receiver, sender=model, weak=False)
+    # Before the row is gone, in case the owner has to be read from it
+    pre_delete.connect(receiver, sender=model, weak=False)
+
+
+def reset_new_user(sender, instance, created, **kwargs):
+    """
+    post_save receiver for users: a new user must never be served entries cached
+    for a deleted user that held the same id (SQLite reuses ids)
+    """
+    if created:
+        _bump(instance.pk, NAMESPACES)
+
+
+def _lookup(endpoint, namespaces, request, args, kwargs):
+    """
+    The cache key and ETag of a request, and the response to send without
+    running the view: a 304 for a current ETag, or a cached payload
+    """
+    params = sorted(
+        (name, value) for name, values in request.query_params.lists() for value in values
+    )
+    versions = get_versions(request.user.pk, namespaces)
+    digest = hashlib.sha256(
+        repr((endpoint, args, sorted(kwargs.items()), params, versions)).encode()
+    ).hexdigest()
+    key = f'response:{request.user.pk}:{digest}'
+    etag = f'"{digest[:32]}"'
+
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        return key, etag, Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    data = _cache().get(key)
+    return key, etag, None if data is None else Response(data, headers={'ETag': etag})
+
+
+def _store(key, etag, response):
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    _cache().set(key, response.data)
+    return Response(response.data, headers={'ETag': etag})
+
+
+def cached_response(endpoint, namespaces):
+    """Cache successful responses of a viewset action for the requesting user"""
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.RESPONSE_CACHE_ENABLED:
+                return view_method(self, request, *args, **kwargs)
+            key, etag, response = _lookup(endpoint, namespaces, request, args, kwargs)
+            if response is None:
+                response = _store(key, etag, view_method(self, request, *args, **kwargs))
+            return response
+        return wrapper
+    return decorator
+
+
+def acached_response(endpoint, namespaces):
+    """
+    ``cached_response`` for the handlers of backend.async_views; they share
+    entries with the viewset action of the same ``endpoint``
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request, *args, **kwargs):
+            if not settings.RESPONSE_CACHE_ENABLED:
+                return await handler(request, *args, **kwargs)
+            # Off the event loop: the cache may be a network service
+            key, etag, response = await sync_to_async(_lookup, thread_sensitive=False)(
+                endpoint, namespaces, request, args, kwargs
+            )
+            if response is None:
+                response = await handler(request, *args, **kwargs)
+                response = await sync_to_async(_store, thread_sensitive=False)(key, etag, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,109 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary. Reads go to a replica only while a view
+action listed in ``replica_actions`` of a ``ReplicaReadsMixin`` viewset, or an
+async read view (backend.async_views), runs, and never for a user who wrote
+within the last DATABASE_STICKY_SECONDS, so users always read their own writes
+even while the replicas lag behind, whichever worker served the write (the
+cache remembering it, DATABASE_STICKY_CACHE_ALIAS, is shared between them).
+Everything else (other actions, management commands, reads inside
+transactions) reads from the primary.
+"""
+import random
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+@dataclass
+class _Routing:
+    user_id: int
+    replica: str = None
+    wrote: bool = False
+
+
+_routing = ContextVar('database_routing', default=None)
+
+
+def _sticky_key(user_id):
+    return f'db-primary-reads:{user_id}'
+
+
+def reads_primary(user_id):
+    """Whether ``user_id`` wrote recently enough that replicas may not have their writes yet"""
+    return caches[settings.DATABASE_STICKY_CACHE_ALIAS].get(_sticky_key(user_id)) is not None
+
+
+def mark_write(user_id):
+    """Read ``user_id``'s data from the primary for the next DATABASE_STICKY_SECONDS"""
+    caches[settings.DATABASE_STICKY_CACHE_ALIAS].set(
+        _sticky_key(user_id), True, timeout=settings.DATABASE_STICKY_SECONDS
+    )
+
+
+def choose_replica(user_id):
+    """The replica to read ``user_id``'s data from, or None while it must come from the primary"""
+    if reads_primary(user_id):
+        return None
+    # One replica per request, so its reads see one consistent state
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def start_routing(user_id, replica=None):
+    """Route the queries of the current request for ``user_id``; returns a token for stop_routing"""
+    return _routing.set(_Routing(user_id, replica))
+
+
+def stop_routing(token):
+    _routing.reset(token)
+
+
+class ReplicaReadsMixin:
+    """Route the reads of ``replica_actions`` to a replica, and note every write of the user"""
+    replica_actions = ('list', 'retrieve', 'stats')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not settings.DATABASE_REPLICAS or not request.user.is_authenticated:
+            return
+        replica = choose_replica(request.user.pk) if self.action in self.replica_actions else None
+        self._routing_token = start_routing(request.user.pk, replica)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            token = getattr(self, '_routing_token', None)
+            if token is not None:
+                stop_routing(token)
+                self._routing_token = None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or routing.replica is None:
+            return None
+        if routing.wrote or transaction.get_connection(DEFAULT_DB_ALIAS).in_atomic_block:
+            # Read what the request has written, or is about to change, from the primary
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None and not routing.wrote:
+            routing.wrote = True
+            mark_write(routing.user_id)
+        # Also for rows that were read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
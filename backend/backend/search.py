@@ -0,0 +1,217 @@
+"""
+Full-text search indexes behind the ``search`` parameter of the list endpoints.
+
+SQLite gets an FTS5 table kept in step with the model table by triggers. Its rows
+carry the model's primary key (``row_id``) rather than pointing at the model
+table's implicit rowid, which VACUUM may renumber for tables keyed on a UUID; a
+``<table>_fts_keys`` table maps each key to its FTS rowid, so triggers find the
+row to update or delete through an index. PostgreSQL gets a generated
+``tsvector`` column with a GIN index plus a trigram index for substring matches.
+Other databases fall back to ``icontains``.
+
+Matching is prefix based (``lapt`` finds "laptop") and every search term must
+match. Indexes built with ``substring=True`` match terms anywhere in a word
+(``0001`` finds "ORD-20260101-0000001"): on SQLite their FTS5 table uses the
+trigram tokenizer, which cannot look up terms shorter than three characters, so
+those are matched with ``icontains`` among the rows the longer terms found.
+Results carry a ``search_rank`` annotation, see ``SearchIndex.ordering``.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+registry = []
+
+
+def _terms(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def _like_escape(text):
+    """``text`` matched literally by LIKE, whose default escape character on PostgreSQL is a backslash"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _icontains_all(terms, fields):
+    """Rows where every one of ``terms`` is in one of ``fields``"""
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for field in fields:
+            term_condition |= Q(**{f'{field}__icontains': term})
+        condition &= term_condition
+    return condition
+
+
+class SearchIndex:
+    # Shortest term the trigram tokenizer can look up
+    TRIGRAM = 3
+
+    def __init__(self, model, fields, weights, substring=False):
+        self.model = model
+        self.fields = fields
+        self.weights = weights
+        self.substring = substring
+        self.table = model._meta.db_table
+        self.fts_table = f'{self.table}_fts'
+        self.keys_table = f'{self.table}_fts_keys'
+        registry.append(self)
+
+    def _vendor(self, queryset):
+        return connections[queryset.db].vendor
+
+    def ordering(self, queryset):
+        """Keyset ordering for search results: best match first, then newest id"""
+        vendor = self._vendor(queryset)
+        if 'search_rank' not in queryset.query.annotations:
+            return ('-created_at', '-id')
+        if vendor == 'sqlite':
+            # bm25() scores better matches lower
+            return ('search_rank', '-id')
+        return ('-search_rank', '-id')
+
+    def search(self, queryset, text):
+        """Narrow ``queryset`` to rows matching every term of ``text``, annotated with ``search_rank``"""
+        terms = _terms(text)
+        if not terms:
+            return queryset.none()
+        vendor = self._vendor(queryset)
+
+        if vendor == 'sqlite':
+            indexed = [term for term in terms if len(term) >= self.TRIGRAM] if self.substring else terms
+            if indexed:
+                if self.substring:
+                    match = ' '.join(f'"{term}"' for term in indexed)
+                else:
+                    match = ' '.join(f'"{term}"*' for term in indexed)
+                # row_id is a column too, weighing nothing
+                weights = ', '.join(str(weight) for weight in [0.0, *self.weights])
+                # Joined rather than looked up per row, so the MATCH runs once and drives the
+                # query, each match finding its row through the primary key
+                return queryset.extra(
+                    tables=[self.fts_table],
+                    where=[f'"{self.fts_table}" MATCH %s', f'"{self.fts_table}".row_id = "{self.table}".id'],
+                    params=[match],
+                ).filter(
+                    _icontains_all([term for term in terms if term not in indexed], self.fields)
+                ).annotate(
+                    search_rank=RawSQL(f'bm25("{self.fts_table}", {weights})', [], output_field=FloatField()),
+                )
+
+        if vendor == 'postgresql':
+            tsquery = ' & '.join(f'{term}:*' for term in terms)
+            return queryset.filter(RawSQL(
+                f'("{self.table}".search_vector @@ to_tsquery(\'simple\', %s) '
+                f'OR "{self.table}"."{self.fields[0]}" ILIKE %s)',
+                [tsquery, f'%{_like_escape(text)}%'], output_field=BooleanField(),
+            )).annotate(search_rank=RawSQL(
+                f'ts_rank("{self.table}".search_vector, to_tsquery(\'simple\', %s))',
+                [tsquery], output_field=FloatField(),
+            ))
+
+        return queryset.filter(_icontains_all(terms, self.fields))
+
+    def _sqlite_statements(self):
+        columns = ', '.join(self.fields)
+        new_values = ', '.join(f'new.{field}' for field in self.fields)
+        assignments = ', '.join(f'{field} = new.{field}' for field in self.fields)
+        fts_rowid = f'(SELECT rowid FROM "{self.keys_table}" WHERE row_id = old.id)'
+        options = "tokenize='trigram'" if self.substring else "prefix='2 3'"
+        return {
+            'tables': [
+                f'CREATE TABLE IF NOT EXISTS "{self.keys_table}" '
+                f'(rowid INTEGER PRIMARY KEY, row_id TEXT NOT NULL UNIQUE)',
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS "{self.fts_table}" USING fts5('
+                f"row_id UNINDEXED, {columns}, {options})",
+            ],
+            'triggers': [
+                f'CREATE TRIGGER IF NOT EXISTS "{self.fts_table}_ai" AFTER INSERT ON "{self.table}" BEGIN '
+                f'INSERT INTO "{self.keys_table}"(row_id) VALUES (new.id); '
+                f'INSERT INTO "{self.fts_table}"(rowid, row_id, {columns}) '
+                f'VALUES (last_insert_rowid(), new.id, {new_values}); END',
+                f'CREATE TRIGGER IF NOT EXISTS "{self.fts_table}_ad" AFTER DELETE ON "{self.table}" BEGIN '
+                f'DELETE FROM "{self.fts_table}" WHERE rowid = {fts_rowid}; '
+                f'DELETE FROM "{self.keys_table}" WHERE row_id = old.id; END',
+                f'CREATE TRIGGER IF NOT EXISTS "{self.fts_table}_au" AFTER UPDATE OF {columns} '
+                f'ON "{self.table}" BEGIN '
+                f'UPDATE "{self.fts_table}" SET {assignments} WHERE rowid = {fts_rowid}; END',
+            ],
+        }
+
+    def install(self, using='default'):
+        """
+        Create the index if it is missing. Safe to run repeatedly; SQLite table
+        rebuilds in later migrations drop the triggers, so they are recreated and
+        the index rebuilt whenever one is found missing.
+        """
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                statements = self._sqlite_statements()
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s "
+                    "AND name LIKE %s",
+                    [self.table, f'{self.fts_table}_a_'],
+                )
+                complete = cursor.fetchone()[0] == len(statements['triggers'])
+                for table in statements['tables']:
+                    cursor.execute(table)
+                for trigger in statements['triggers']:
+                    cursor.execute(trigger)
+                if not complete:
+                    self.rebuild(using)
+            elif connection.vendor == 'postgresql':
+                document = ' || '.join(
+                    f"setweight(to_tsvector('simple', coalesce({field}, '')), '{'ABCD'[position]}')"
+                    for position, field in enumerate(self.fields)
+                )
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                cursor.execute(
+                    f'ALTER TABLE "{self.table}" ADD COLUMN IF NOT EXISTS search_vector tsvector '
+                    f'GENERATED ALWAYS AS ({document}) STORED'
+                )
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{self.table}_search_idx" '
+                    f'ON "{self.table}" USING GIN (search_vector)'
+                )
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{self.table}_trgm_idx" '
+                    f'ON "{self.table}" USING GIN ("{self.fields[0]}" gin_trgm_ops)'
+                )
+
+    def uninstall(self, using='default'):
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS "{self.fts_table}_{suffix}"')
+                cursor.execute(f'DROP TABLE IF EXISTS "{self.fts_table}"')
+                cursor.execute(f'DROP TABLE IF EXISTS "{self.keys_table}"')
+            elif connection.vendor == 'postgresql':
+                cursor.execute(f'ALTER TABLE "{self.table}" DROP COLUMN IF EXISTS search_vector')
+                cursor.execute(f'DROP INDEX IF EXISTS "{self.table}_trgm_idx"')
+
+    def rebuild(self, using='default'):
+        """Re-read every row of the model table into the index"""
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                columns = ', '.join(self.fields)
+                cursor.execute(f'DELETE FROM "{self.fts_table}"')
+                cursor.execute(f'DELETE FROM "{self.keys_table}"')
+                cursor.execute(f'INSERT INTO "{self.keys_table}"(row_id) SELECT id FROM "{self.table}"')
+                cursor.execute(
+                    f'INSERT INTO "{self.fts_table}"(rowid, row_id, {columns}) '
+                    f'SELECT k.rowid, k.row_id, {", ".join(f"t.{field}" for field in self.fields)} '
+                    f'FROM "{self.table}" t JOIN "{self.keys_table}" k ON k.row_id = t.id'
+                )
+            elif connection.vendor == 'postgresql':
+                # The tsvector column is generated; only the indexes can go stale
+                cursor.execute(f'REINDEX INDEX "{self.table}_search_idx"')
+                cursor.execute(f'REINDEX INDEX "{self.table}_trgm_idx"')
+
+    def install_after_migrate(self, using='default', **kwargs):
+        """post_migrate receiver"""
+        self.install(using)
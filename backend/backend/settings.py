@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
 from pathlib import Path
+from django.conf import global_settings
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -24,6 +25,37 @@ load_dotenv(BASE_DIR / ".env")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ADMIN_REGISTRATION_KEY = os.getenv("ADMIN_REGISTRATION_KEY", "")
 
+# Seconds a stock reservation holds units before they return to stock, by default
+# and at most (a client asking for ttl_seconds)
+STOCK_RESERVATION_TTL = int(os.getenv("STOCK_RESERVATION_TTL", 900))
+STOCK_RESERVATION_MAX_TTL = int(os.getenv("STOCK_RESERVATION_MAX_TTL", 86400))
+
+# Product.demand_forecast is the units expected to sell in the next FORECAST_HORIZON_DAYS,
+# from the last FORECAST_HISTORY_DAYS of sales, each day weighing half as much as one
+# FORECAST_HALF_LIFE_DAYS more recent (see product_manager.forecasting)
+FORECAST_HORIZON_DAYS = int(os.getenv("FORECAST_HORIZON_DAYS", 30))
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", 365))
+FORECAST_HALF_LIFE_DAYS = int(os.getenv("FORECAST_HALF_LIFE_DAYS", 14))
+
+# Product.optimized_price maximizes the margin under the price elasticity fitted from the last
+# PRICING_HISTORY_DAYS of sales, at least PRICING_MIN_MARGIN_PERCENT over cost_price and within
+# PRICING_MAX_CHANGE_PERCENT of selling_price. Categories are priced by PRICING_WORKERS processes,
+# PRICING_CHUNK_SIZE products per transaction (see product_manager.pricing)
+PRICING_HISTORY_DAYS = int(os.getenv("PRICING_HISTORY_DAYS", 365))
+PRICING_MIN_MARGIN_PERCENT = int(os.getenv("PRICING_MIN_MARGIN_PERCENT", 10))
+PRICING_MAX_CHANGE_PERCENT = int(os.getenv("PRICING_MAX_CHANGE_PERCENT", 30))
+PRICING_WORKERS = int(os.getenv("PRICING_WORKERS", os.cpu_count() or 1))
+PRICING_CHUNK_SIZE = int(os.getenv("PRICING_CHUNK_SIZE", 10000))
+
+# Rows validated and written per transaction by the bulk product import
+PRODUCT_IMPORT_BATCH_SIZE = int(os.getenv("PRODUCT_IMPORT_BATCH_SIZE", 1000))
+
+# Orders moved per bulk status transition request
+ORDER_TRANSITION_BATCH_SIZE = int(os.getenv("ORDER_TRANSITION_BATCH_SIZE", 5000))
+
+# Order numbers each process reserves at a time (see order_manager.numbers)
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv("ORDER_NUMBER_BLOCK_SIZE", 100))
+
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -41,6 +73,17 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
 
+# Order emails are queued with the order and sent by the send_order_emails worker
+# (see order_manager.emails): ORDER_EMAIL_BATCH_SIZE per batch, each batch held
+# for ORDER_EMAIL_LEASE seconds; failures are retried after ORDER_EMAIL_RETRY_DELAY
+# seconds, doubling up to ORDER_EMAIL_RETRY_MAX_DELAY, ORDER_EMAIL_MAX_ATTEMPTS times
+ORDER_EMAIL_BATCH_SIZE = int(os.getenv("ORDER_EMAIL_BATCH_SIZE", 100))
+ORDER_EMAIL_LEASE = int(os.getenv("ORDER_EMAIL_LEASE", 300))
+ORDER_EMAIL_RETRY_DELAY = int(os.getenv("ORDER_EMAIL_RETRY_DELAY", 30))
+ORDER_EMAIL_RETRY_MAX_DELAY = int(os.getenv("ORDER_EMAIL_RETRY_MAX_DELAY", 3600))
+ORDER_EMAIL_MAX_ATTEMPTS = int(os.getenv("ORDER_EMAIL_MAX_ATTEMPTS", 8))
+ORDER_EMAIL_POLL_INTERVAL = int(os.getenv("ORDER_EMAIL_POLL_INTERVAL", 5))
+
 FRONTEND_URL = 'http://localhost:3000'
 BACKEND_URL = 'http://localhost:8000'
 
@@ -70,7 +113,12 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
 ]
 
-ROOT_URLCONF = 'backend.urls'
+# ASYNC_READ_VIEWS=True serves the product and order read endpoints with async
+# views, for ASGI servers (uvicorn backend.asgi:application). Leave it off under
+# WSGI (gunicorn), which would run every async view in an event loop of its own.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False").lower() in ("true", "1")
+
+ROOT_URLCONF = 'backend.async_urls' if ASYNC_READ_VIEWS else 'backend.urls'
 
 TEMPLATES = [
     {
@@ -94,12 +142,144 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_ENGINE=postgresql reads DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT;
+# for SQLite, DB_NAME is the database file (default: db.sqlite3).
+# Connections persist for DB_CONN_MAX_AGE seconds, checked before reuse, unless
+# DB_POOL_MAX_SIZE turns on a per-process pool of at most that many connections,
+# DB_POOL_MIN_SIZE of which stay open (default: all of them, as the pool closes any
+# connection handed back beyond that many). A request finding them all in
+# use waits up to DB_POOL_TIMEOUT seconds for one; health checks only run on
+# connections idle in the pool for more than DB_POOL_CHECK_IDLE seconds.
+# DB_REPLICAS lists read replicas: host[:port] entries for PostgreSQL, database
+# files for SQLite (copies kept in sync outside Django, or stand-ins for tests).
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 0))
+# DB_SQLITE_CONCURRENT=True turns on WAL mode and write transactions that take the
+# write lock up front (backend.concurrent_sqlite), for several workers on one file;
+# they wait up to DB_SQLITE_BUSY_TIMEOUT ms for the lock. DB_SQLITE_MMAP_SIZE is in
+# bytes, DB_SQLITE_CACHE_SIZE in KiB per connection.
+DB_SQLITE_CONCURRENT = os.getenv("DB_SQLITE_CONCURRENT", "False").lower() in ("true", "1")
+DB_REPLICAS = [replica.strip() for replica in os.getenv("DB_REPLICAS", "").split(",") if replica.strip()]
+
+if DB_ENGINE == "postgresql":
+    PRIMARY_DATABASE = {
+        'ENGINE': 'backend.pooled_postgresql' if DB_POOL_MAX_SIZE else 'django.db.backends.postgresql',
+        'NAME': os.getenv("DB_NAME", "spaising"),
+        'USER': os.getenv("DB_USER", "postgres"),
+        'PASSWORD': os.getenv("DB_PASSWORD", ""),
+        'HOST': os.getenv("DB_HOST", "localhost"),
+        'PORT': os.getenv("DB_PORT", "5432"),
+        # Pooled connections go back to the pool at the end of every request
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() in ("true", "1"),
+        'POOL': {
+            'min_size': int(os.getenv("DB_POOL_MIN_SIZE", DB_POOL_MAX_SIZE)),
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            'check_idle': float(os.getenv("DB_POOL_CHECK_IDLE", 30)),
+        },
+    }
+    REPLICA_DATABASES = [
+        {**PRIMARY_DATABASE, 'HOST': host, 'PORT': port or PRIMARY_DATABASE['PORT']}
+        for host, _, port in (replica.partition(":") for replica in DB_REPLICAS)
+    ]
+else:
+    PRIMARY_DATABASE = {
+        'ENGINE': 'backend.concurrent_sqlite' if DB_SQLITE_CONCURRENT else 'django.db.backends.sqlite3',
+        'NAME': os.getenv("DB_NAME", BASE_DIR / 'db.sqlite3'),
+        # A file rather than memory, so tests can share it with worker processes
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        # Applied by backend.concurrent_sqlite to every new connection
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': int(os.getenv("DB_SQLITE_BUSY_TIMEOUT", 5000)),
+            'mmap_size': int(os.getenv("DB_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+            # Negative: in KiB rather than pages
+            'cache_size': -int(os.getenv("DB_SQLITE_CACHE_SIZE", 64 * 1024)),
+        },
+    }
+    REPLICA_DATABASES = [{**PRIMARY_DATABASE, 'NAME': name} for name in DB_REPLICAS]
+
 DATABASES = {
+    'default': PRIMARY_DATABASE,
+    # Tests read the replicas from the test database of the primary
+    **{
+        f'replica_{number}': {**replica, 'TEST': {'MIRROR': 'default'}}
+        for number, replica in enumerate(REPLICA_DATABASES, 1)
+    },
+}
+
+# list/retrieve/stats reads go to a replica, except for DATABASE_STICKY_SECONDS
+# after the user wrote anything. That is remembered in DATABASE_STICKY_CACHE_ALIAS,
+# which every worker must share, or a write served by one would not send the next
+# read served by another to the primary: files under BASE_DIR by default, which
+# serves the workers of one host; DB_REPLICA_STICKY_CACHE_BACKEND/LOCATION can
+# point it at Redis or memcached across hosts.
+DATABASE_ROUTERS = ['backend.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 10))
+DATABASE_STICKY_CACHE_ALIAS = 'replica-sticky'
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Responses of the polled list/stats endpoints go to RESPONSE_CACHE_ALIAS: an
+# in-process LRU by default, or a shared backend for multi-worker deployments, e.g.
+# RESPONSE_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# RESPONSE_CACHE_LOCATION=redis://127.0.0.1:6379, or the file based cache. The
+# data versions they are keyed on go to RESPONSE_VERSION_CACHE_ALIAS, which every
+# worker must share so that a write in one makes the others' entries stale: files
+# under BASE_DIR by default, which serves the workers of one host; point
+# RESPONSE_VERSION_CACHE_BACKEND/LOCATION at Redis or memcached across hosts.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.getenv("RESPONSE_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("RESPONSE_CACHE_LOCATION", 'responses'),
+        'TIMEOUT': int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 5000))},
+    },
+    'response-versions': {
+        'BACKEND': os.getenv(
+            "RESPONSE_VERSION_CACHE_BACKEND", 'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv("RESPONSE_VERSION_CACHE_LOCATION", str(BASE_DIR / 'cache' / 'response-versions')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("RESPONSE_VERSION_CACHE_MAX_ENTRIES", 100000))},
+    },
+    'replica-sticky': {
+        'BACKEND': os.getenv(
+            "DB_REPLICA_STICKY_CACHE_BACKEND", 'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv("DB_REPLICA_STICKY_CACHE_LOCATION", str(BASE_DIR / 'cache' / 'replica-sticky')),
+    },
+    'auth': {
+        'BACKEND': os.getenv("AUTH_USER_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("AUTH_USER_CACHE_LOCATION", 'auth-users'),
+        'TIMEOUT': int(os.getenv("AUTH_USER_CACHE_TIMEOUT", 60)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", 10000))},
+    },
+    'throttle': {
+        'BACKEND': os.getenv("THROTTLE_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("THROTTLE_CACHE_LOCATION", 'throttle'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("THROTTLE_MAX_KEYS", 100000))},
+    },
+    # Shared by the worker processes of a host by default. The files are pickles: keep
+    # OTP_CACHE_LOCATION private to the app's user (Django creates it with mode 0700),
+    # never in a shared temporary directory
+    'otp': {
+        'BACKEND': os.getenv("OTP_CACHE_BACKEND", 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv("OTP_CACHE_LOCATION", str(BASE_DIR / 'cache' / 'otp')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("OTP_MAX_ENTRIES", 10000))},
+    },
 }
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_VERSION_CACHE_ALIAS = 'response-versions'
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() in ("true", "1")
 
 
 # Password validation
@@ -119,12 +299,77 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
+
+# New passwords are hashed with PASSWORD_HASHER: pbkdf2 (Django's default), scrypt
+# (several times cheaper per login at a comparable strength) or argon2 (needs
+# argon2-cffi). Stored hashes of the other hashers still verify and are replaced
+# with a PASSWORD_HASHER one on the user's next login.
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2")
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    hasher for hasher in global_settings.PASSWORD_HASHERS if hasher != PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]
+]
+
+# Logins check passwords on LOGIN_HASH_WORKERS threads per process (see
+# auth_manager.login); up to LOGIN_HASH_QUEUE more logins wait for one, the rest
+# are answered 503 at once
+LOGIN_HASH_WORKERS = int(os.getenv("LOGIN_HASH_WORKERS", os.cpu_count() or 1))
+LOGIN_HASH_QUEUE = int(os.getenv("LOGIN_HASH_QUEUE", 16))
+
+# Where JWT authentication gets the token's user (see backend.authentication):
+# "database" (a query per request), "cache" (cached in AUTH_USER_CACHE_ALIAS, which
+# is per process unless AUTH_USER_CACHE_BACKEND is shared, so other workers see a
+# deactivation only after AUTH_USER_CACHE_TIMEOUT seconds) or "stateless" (the
+# token's claims, no query; deactivation shows once the access token expires)
+AUTH_USER_LOOKUP = os.getenv("AUTH_USER_LOOKUP", "cache")
+AUTH_USER_CACHE_ALIAS = 'auth'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'backend.authentication.CachedJWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    # Attempts per client IP and per username at the login, OTP and registration endpoints
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv("LOGIN_THROTTLE_IP_RATE", "30/min"),
+        'login_username': os.getenv("LOGIN_THROTTLE_USERNAME_RATE", "10/min"),
+        'register_ip': os.getenv("REGISTER_THROTTLE_IP_RATE", "10/hour"),
+        'register_username': os.getenv("REGISTER_THROTTLE_USERNAME_RATE", "5/hour"),
+        'verify_otp_ip': os.getenv("VERIFY_OTP_THROTTLE_IP_RATE", "30/min"),
+        'verify_otp_username': os.getenv("VERIFY_OTP_THROTTLE_USERNAME_RATE", "10/min"),
+    },
 }
 
+# Where login and registration attempts are counted (see backend.throttling): memory
+# (a token bucket per key in each process, at most THROTTLE_MAX_KEYS of them) or cache
+# (sliding windows in the 'throttle' cache, shared by the processes using it: point
+# THROTTLE_CACHE_BACKEND at a file-based cache, memcached or Redis)
+THROTTLE_BACKEND = os.getenv("THROTTLE_BACKEND", "memory")
+THROTTLE_MAX_KEYS = int(os.getenv("THROTTLE_MAX_KEYS", 100000))
+THROTTLE_CACHE_ALIAS = 'throttle'
+
+# With LOGIN_OTP_REQUIRED, a login with the right password emails a one-time code,
+# exchanged for the tokens at verify_otp. Codes (see auth_manager.otp) live OTP_TTL
+# seconds, allow OTP_MAX_ATTEMPTS guesses and are kept in the OTP_BACKEND: memory
+# (this process only, at most OTP_MAX_ENTRIES) or cache (the 'otp' cache)
+LOGIN_OTP_REQUIRED = os.getenv("LOGIN_OTP_REQUIRED", "False").lower() in ("true", "1")
+OTP_BACKEND = os.getenv("OTP_BACKEND", "cache")
+OTP_TTL = int(os.getenv("OTP_TTL", 300))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", 5))
+OTP_MAX_ENTRIES = int(os.getenv("OTP_MAX_ENTRIES", 10000))
+OTP_CACHE_ALIAS = 'otp'
+
+# Rows per page on the cursor-paginated list endpoints (?page_size= up to the max)
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 100))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 1000))
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
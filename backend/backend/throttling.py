@@ -0,0 +1,180 @@
+"""
+Rate limits for the login and registration endpoints.
+
+Each throttle keys a limit on one thing about the request: the client's IP
+(``IPThrottle``) or the username it is trying (``UsernameThrottle``), with
+the rate DEFAULT_THROTTLE_RATES gives ``<view's throttle_scope>_<kind>``,
+e.g. ``login_ip``. They run in ``APIView.initial()``, so an attempt over
+either limit is turned away with a 429 before the view looks up a user or
+hashes a password.
+
+THROTTLE_BACKEND picks where the counts are kept:
+
+- ``memory``: a token bucket per key in this process. A key may make
+  ``num_requests`` attempts at once, then one more every
+  ``duration / num_requests`` seconds. At most THROTTLE_MAX_KEYS buckets are
+  kept; past that the least recently used is dropped (that key starts over
+  with a full bucket). Each worker process counts on its own.
+- ``cache``: a sliding window counter per key in the THROTTLE_CACHE_ALIAS
+  cache, shared by every process using the same cache: the count of this
+  window plus the share of the previous window's count still inside the
+  last ``duration`` seconds. Counting uses the cache's atomic ``incr()``.
+
+Allowed and turned away attempts are counted per scope and kind in
+``metrics``.
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('memory', 'cache')
+
+
+class ThrottleMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def count(self, scope, kind, allowed):
+        with self._lock:
+            self._counts[scope, kind, 'allowed' if allowed else 'throttled'] += 1
+
+    def snapshot(self):
+        """``{(scope, kind, 'allowed' | 'throttled'): attempts}`` since the process started or the last ``clear()``"""
+        with self._lock:
+            return dict(self._counts)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+metrics = ThrottleMetrics()
+
+
+class TokenBuckets:
+    clock = time.monotonic
+
+    def __init__(self):
+        self.clear()
+        # A lock held by another thread at fork would never be released in the child
+        os.register_at_fork(after_in_child=self.clear)
+
+    def clear(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, capacity, duration):
+        """Take a token from ``key``'s bucket; returns (allowed, seconds until the next token)"""
+        refill = capacity / duration
+        now = self.clock()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > settings.THROTTLE_MAX_KEYS:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / refill
+
+
+class SlidingWindows:
+    clock = time.time
+
+    def take(self, key, capacity, duration):
+        """Count an attempt for ``key``; returns (allowed, seconds until the count allows another)"""
+        cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        now = self.clock()
+        window, elapsed = divmod(now, duration)
+        current_key, previous_key = f'{key}:{window:.0f}', f'{key}:{window - 1:.0f}'
+        # Kept until it has slid out of the next window as well
+        cache.add(current_key, 0, timeout=2 * duration)
+        current = cache.incr(current_key)
+        previous = cache.get(previous_key, 0)
+        weight = 1 - elapsed / duration
+        if previous * weight + current <= capacity:
+            return True, 0
+        if current > capacity or not previous:
+            return False, duration - elapsed
+        # Until enough of the previous window has slid out
+        excess = previous * weight + current - capacity
+        return False, min(duration - elapsed, excess / previous * duration)
+
+
+token_buckets = TokenBuckets()
+sliding_windows = SlidingWindows()
+
+
+def _backend():
+    backend = settings.THROTTLE_BACKEND
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(f"THROTTLE_BACKEND must be one of: {', '.join(BACKENDS)}.")
+    return token_buckets if backend == 'memory' else sliding_windows
+
+
+class ScopedKeyThrottle(SimpleRateThrottle):
+    """Limits attempts per ``ident()`` of the request at the ``<view.throttle_scope>_<kind>`` rate"""
+    kind = None
+
+    def __init__(self):
+        # The rate depends on the view, see allow_request()
+        pass
+
+    def ident(self, request):
+        raise NotImplementedError('.ident() must be overridden')
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        # Read on every request (not once at import as SimpleRateThrottle does), so overrides apply
+        self.rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{self.scope}_{self.kind}')
+        if self.rate is None:
+            return True
+        ident = self.ident(request)
+        if ident is None:
+            return True
+
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        allowed, self._wait = _backend().take(
+            f'throttle:{self.scope}:{self.kind}:{ident}', self.num_requests, self.duration
+        )
+        metrics.count(self.scope, self.kind, allowed)
+        if not allowed:
+            logger.info('Throttled %s attempt by %s %s', self.scope, self.kind, ident)
+        return allowed
+
+    def wait(self):
+        # Whole seconds, rounded up: Retry-After truncates, and a client retrying early is turned away again
+        return math.ceil(self._wait)
+
+
+class IPThrottle(ScopedKeyThrottle):
+    kind = 'ip'
+
+    def ident(self, request):
+        # REMOTE_ADDR, or the client's address in X-Forwarded-For behind NUM_PROXIES proxies
+        return self.get_ident(request)
+
+
+class UsernameThrottle(ScopedKeyThrottle):
+    kind = 'username'
+
+    def ident(self, request):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        # A fixed size key whatever was sent, safe for any cache
+        return hashlib.blake2b(username.strip().lower().encode(), digest_size=16).hexdigest()
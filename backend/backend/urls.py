@@ -21,4 +21,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path("auth/", include("auth_manager.urls")),
     path("product/", include("product_manager.urls")),
+    path("order/", include("order_manager.urls")),
 ]
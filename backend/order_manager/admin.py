@@ -13,7 +13,7 @@ class ProductAdmin(admin.ModelAdmin):
         'category', 'created_by', 'created_at', 'customer_rating'
     ]
     search_fields = ['name', 'description', 'created_by__username']
-    readonly_fields = ['id', 'created_at', 'updated_at', 'profit_margin_display']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'profit_margin_display', 'sell_through_rate']
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'description', 'category')
@@ -22,7 +22,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('cost_price', 'selling_price', 'optimized_price')
         }),
         ('Inventory & Performance', {
-            'fields': ('stock_available', 'units_sold', 'customer_rating', 'demand_forecast')
+            'fields': ('stock_available', 'units_sold', 'sell_through_rate', 'customer_rating', 'demand_forecast')
         }),
         ('System Information', {
             'fields': ('id', 'created_by', 'created_at', 'updated_at'),
@@ -34,6 +34,7 @@ class ProductAdmin(admin.ModelAdmin):
     def profit_margin_display(self, obj):
         return f"{obj.profit_margin:.2f}%"
     profit_margin_display.short_description = 'Profit Margin'
+    profit_margin_display.admin_order_field = 'profit_margin'
     
     def save_model(self, request, obj, form, change):
         if not change:  # Only set created_by for new objects
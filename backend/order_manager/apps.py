@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, pre_delete
 
 
 class OrderManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'order_manager'
+
+    def ready(self):
+        from backend.response_cache import invalidate_on_write
+        from .models import Order, remove_from_rollups, snapshot_rollup
+        from .search import order_search
+        post_migrate.connect(order_search.install_after_migrate, sender=self)
+        pre_delete.connect(snapshot_rollup, sender=Order)
+        post_delete.connect(remove_from_rollups, sender=Order)
+        invalidate_on_write(Order, 'orders')
@@ -0,0 +1,59 @@
+from django.http import Http404
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.pagination import InvalidCursor
+from backend.response_cache import acached_response
+from .models import Order
+from .serializers import OrderSerializer, aserialize_order_rows
+from .views import STATS_AGGREGATES, order_list_query, order_stats_query, stats_series
+
+
+@acached_response('order-list', ['orders', 'products'])
+async def order_list(request):
+    """OrderViewSet.list on the async ORM"""
+    orders, paginator = order_list_query(request)
+    try:
+        orders, next_cursor = await paginator.apaginate(orders, request)
+    except InvalidCursor as e:
+        return Response({
+            "meta": {"message": str(e)},
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        "meta": {"message": "Orders fetched successfully.", "next": next_cursor},
+        "data": await aserialize_order_rows(orders),
+    })
+
+
+async def order_retrieve(request, pk=None):
+    """OrderViewSet.retrieve on the async ORM"""
+    try:
+        order = await Order.objects.with_items().aget(pk=pk, created_by=request.user)
+    except Order.DoesNotExist:
+        raise Http404("No Order matches the given query.")
+    serializer = OrderSerializer(order)
+    return Response({
+        "meta": {"message": "Order fetched successfully."},
+        "data": serializer.data,
+    })
+
+
+@acached_response('order-stats', ['orders'])
+async def order_stats(request):
+    """OrderViewSet.stats on the async ORM"""
+    rollups, interval, errors = order_stats_query(request)
+    if errors:
+        return Response({
+            "meta": {"message": "Validation failed."},
+            "errors": errors,
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    stats = await rollups.aaggregate(**STATS_AGGREGATES)
+    if interval:
+        stats['series'] = [row async for row in stats_series(rollups, interval)]
+    
+    return Response({
+        "meta": {"message": "Order statistics fetched successfully."},
+        "data": stats,
+    })
@@ -0,0 +1,104 @@
+"""
+Delivery of the OrderEmail outbox.
+
+Checkout only adds an OrderEmail row to the order's transaction, so it never
+waits on the mail server and an email is queued if and only if the order is
+saved. ``send_order_emails`` runs ``OrderEmailSender`` to send them later:
+
+- It claims up to ORDER_EMAIL_BATCH_SIZE due emails at a time, pushing their
+  ``next_attempt_at`` ORDER_EMAIL_LEASE seconds ahead in the same transaction
+  (with SKIP LOCKED where the database has it), so other workers pass them
+  over. If a worker dies mid-batch, its emails are due again once the lease
+  runs out: an email may go out twice, but is never lost.
+- The batch is sent over one connection of EMAIL_BACKEND, kept open from one
+  batch to the next, with a message at a time so a failure is put down to the
+  right email. Outcomes are written back with two queries per batch at most.
+- A failed email is tried again after ORDER_EMAIL_RETRY_DELAY seconds, doubling
+  with every attempt up to ORDER_EMAIL_RETRY_MAX_DELAY (less up to half, so
+  retries spread out), and is marked failed after ORDER_EMAIL_MAX_ATTEMPTS.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OrderEmail
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    """Seconds to wait before trying an email again after its ``attempts``-th failure"""
+    delay = min(settings.ORDER_EMAIL_RETRY_DELAY * 2 ** (attempts - 1), settings.ORDER_EMAIL_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1)
+
+
+class OrderEmailSender:
+    def __init__(self, connection=None):
+        self.connection = connection or get_connection()
+        self._open = False
+
+    def close(self):
+        if self._open:
+            self.connection.close()
+            self._open = False
+
+    def claim(self, now):
+        """Take the next batch of due emails for this worker"""
+        with transaction.atomic():
+            emails = list(
+                OrderEmail.objects.due(now).select_for_update(skip_locked=True)[:settings.ORDER_EMAIL_BATCH_SIZE]
+            )
+            OrderEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now + timedelta(seconds=settings.ORDER_EMAIL_LEASE)
+            )
+        return emails
+
+    def _send(self, email):
+        if not self._open:
+            self.connection.open()
+            self._open = True
+        message = EmailMessage(
+            email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.recipient], connection=self.connection
+        )
+        try:
+            self.connection.send_messages([message])
+        except Exception:
+            # The connection may be broken: start the next email on a new one
+            self.connection.close()
+            self._open = False
+            raise
+
+    def send_due(self, now=None):
+        """Send one batch of due emails; returns how many were claimed, sent, retried and failed"""
+        now = now or timezone.now()
+        emails = self.claim(now)
+        sent, retried, failed = [], [], []
+        for email in emails:
+            email.attempts += 1
+            try:
+                self._send(email)
+            except Exception as e:
+                logger.warning('Could not send order email %s (attempt %s): %s', email.pk, email.attempts, e)
+                email.last_error = str(e)
+                if email.attempts >= settings.ORDER_EMAIL_MAX_ATTEMPTS:
+                    email.status = 'failed'
+                    failed.append(email)
+                else:
+                    email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+                    retried.append(email)
+            else:
+                sent.append(email)
+
+        if sent:
+            OrderEmail.objects.filter(pk__in=[email.pk for email in sent]).update(
+                status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1, last_error='',
+            )
+        if retried or failed:
+            OrderEmail.objects.bulk_update(retried + failed, ['status', 'attempts', 'next_attempt_at', 'last_error'])
+        return {'claimed': len(emails), 'sent': len(sent), 'retried': len(retried), 'failed': len(failed)}
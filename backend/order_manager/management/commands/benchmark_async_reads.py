@@ -0,0 +1,222 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.tokens import AccessToken
+
+from order_manager.models import Order, OrderDailyRollup, OrderItem
+from product_manager.models import Product
+
+PATHS = ["/product/?page_size=20", "/order/?page_size=20", "/order/stats/?interval=day"]
+
+
+async def _read_response(reader):
+    """Read one response; returns its status and whether the connection stays open"""
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    headers = dict(
+        (name.strip().lower(), value.strip()) for name, _, value in (line.partition(":") for line in head[1:] if line)
+    )
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readuntil(b"\r\n")
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return int(head[0].split()[1]), headers.get("connection", "").lower() != "close"
+
+
+async def _connection(address, requests, deadline, results):
+    """One client: sends ``requests`` in turn until ``deadline``, over one connection while the server keeps it"""
+    reader = writer = None
+    sent = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(*address)
+            writer.write(requests[sent % len(requests)])
+            sent += 1
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            results["errors"] += 1
+            keep_alive = False
+        else:
+            results["latencies"].append(time.perf_counter() - start)
+            results["statuses"][status] = results["statuses"].get(status, 0) + 1
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _load(address, requests, connections_count, duration):
+    results = {"latencies": [], "statuses": {}, "errors": 0}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        _connection(address, requests, deadline, results) for _ in range(connections_count)
+    ))
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the product and order read endpoints with many concurrent connections, served by "
+        "gunicorn (sync DRF views) and by uvicorn (async views, ASYNC_READ_VIEWS), on a throwaway "
+        "SQLite database with the response cache off"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=1000, help="Concurrent connections (default: 1000)")
+        parser.add_argument("--duration", type=float, default=20, help="Seconds per server (default: 20)")
+        parser.add_argument("--workers", type=int, default=2, help="Server processes (default: 2)")
+        parser.add_argument(
+            "--threads", type=int, default=1,
+            help="Threads per gunicorn process; 1 runs the default sync workers (default: 1)",
+        )
+        parser.add_argument("--rows", type=int, default=200, help="Products and orders to create (default: 200)")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Path(directory) / "benchmark.sqlite3"
+            user = self._seed(database, options["rows"])
+            servers = {
+                f"gunicorn, {options['workers']} x {options['threads']} threads": (
+                    ["gunicorn", "backend.wsgi", "--bind", "{host}:{port}", "--workers", str(options["workers"]),
+                     "--threads", str(options["threads"]), "--backlog", "2048"],
+                    False,
+                ),
+                f"uvicorn, {options['workers']} x async": (
+                    ["uvicorn", "backend.asgi:application", "--host", "{host}", "--port", "{port}",
+                     "--workers", str(options["workers"]), "--backlog", "2048", "--no-access-log"],
+                    True,
+                ),
+            }
+            self.stdout.write(
+                f"{options['connections']} connections for {options['duration']:.0f} s each, "
+                f"cycling through {', '.join(PATHS)}"
+            )
+            for name, (command, async_views) in servers.items():
+                results, elapsed = self._run(
+                    command, async_views, database, Path(directory) / "server.log", user, options
+                )
+                self._report(name, results, elapsed)
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    def _seed(self, database, rows):
+        """Create the throwaway database with ``rows`` products and orders; returns their owner"""
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        connections[DEFAULT_DB_ALIAS].close()
+        del connections[DEFAULT_DB_ALIAS]
+        connections.settings[DEFAULT_DB_ALIAS] = {
+            **settings_dict, "ENGINE": "django.db.backends.sqlite3", "NAME": database,
+        }
+        try:
+            call_command("migrate", verbosity=0)
+            user = User.objects.create_user(username="benchmark")
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f"Product {i}",
+                    cost_price=Decimal("1.00"),
+                    selling_price=Decimal("5.00"),
+                    stock_available=100,
+                    created_by=user,
+                )
+                for i in range(rows)
+            ])
+            orders = Order.objects.bulk_create([
+                Order(
+                    order_number=f"BENCH-{i:08d}",
+                    customer_name="Jane Doe",
+                    customer_email="jane@example.com",
+                    customer_address="1 Main Street",
+                    total_amount=Decimal("10.00"),
+                    created_by=user,
+                )
+                for i in range(rows)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order, product=product, quantity=2,
+                    unit_price=Decimal("5.00"), total_price=Decimal("10.00"),
+                )
+                for order, product in zip(orders, products)
+            ])
+            OrderDailyRollup.objects.rebuild()
+            return user
+        finally:
+            connections[DEFAULT_DB_ALIAS].close()
+            del connections[DEFAULT_DB_ALIAS]
+            connections.settings[DEFAULT_DB_ALIAS] = settings_dict
+
+    def _run(self, command, async_views, database, log, user, options):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            address = probe.getsockname()
+        env = {
+            **os.environ,
+            "DB_ENGINE": "sqlite",
+            "DB_NAME": str(database),
+            "DB_REPLICAS": "",
+            "ASYNC_READ_VIEWS": str(async_views),
+            "RESPONSE_CACHE_ENABLED": "False",
+        }
+        with open(log, "wb") as output:
+            server = subprocess.Popen(
+                [sys.executable, "-m", *(arg.format(host=address[0], port=address[1]) for arg in command)],
+                cwd=settings.BASE_DIR, env=env, stdout=output, stderr=subprocess.STDOUT,
+            )
+        try:
+            self._wait_for(address, server, log)
+            token = str(AccessToken.for_user(user))
+            requests = [
+                (
+                    f"GET {path} HTTP/1.1\r\nHost: {address[0]}\r\n"
+                    f"Authorization: Bearer {token}\r\nAccept: application/json\r\n\r\n"
+                ).encode()
+                for path in PATHS
+            ]
+            start = time.perf_counter()
+            results = asyncio.run(_load(address, requests, options["connections"], options["duration"]))
+            return results, time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    def _wait_for(self, address, server, log, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                break
+            try:
+                socket.create_connection(address, timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"The server did not start:\n{log.read_text()[-2000:]}")
+
+    def _report(self, name, results, elapsed):
+        latencies = sorted(results["latencies"])
+        if not latencies:
+            raise CommandError(f"{name}: no responses ({results['errors']} errors)")
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        statuses = ", ".join(f"{code}: {count}" for code, count in sorted(results["statuses"].items()))
+        self.stdout.write(
+            f"{name:>28}: {len(latencies) / elapsed:8.1f} requests/s, p50 {percentile(0.5):7.0f} ms, "
+            f"p99 {percentile(0.99):7.0f} ms, {results['errors']} connection errors ({statuses})"
+        )
@@ -0,0 +1,74 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from order_manager.models import Order, OrderDailyRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Time moving orders from confirmed to shipped one save() at a time, as the update "
+        "endpoint does, against the bulk transition, on throwaway rows that are rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orders",
+            nargs="+",
+            type=int,
+            default=[100, 1000, 5000],
+            help="Order counts to benchmark (default: 100 1000 5000)",
+        )
+
+    def handle(self, *args, **options):
+        for count in sorted(options["orders"]):
+            with transaction.atomic():
+                user = User.objects.create_user(username=f"benchmark-{uuid.uuid4().hex[:12]}")
+                order_ids = self._create_orders(user, count)
+
+                start = time.perf_counter()
+                for order_id in order_ids:
+                    order = Order.objects.get(pk=order_id, created_by=user)
+                    order.status = "shipped"
+                    order.save()
+                per_order = time.perf_counter() - start
+
+                # Back to confirmed, rollups included, for the bulk run
+                Order.objects.filter(pk__in=order_ids).update(status="confirmed")
+                OrderDailyRollup.objects.apply(user.pk, timezone.localdate(), "shipped", -count, 0)
+                OrderDailyRollup.objects.apply(user.pk, timezone.localdate(), "confirmed", count, 0)
+
+                start = time.perf_counter()
+                Order.objects.filter(created_by=user, pk__in=order_ids).transition("shipped")
+                bulk = time.perf_counter() - start
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{count:>6} orders: per order {per_order * 1000:9.1f} ms ({count / per_order:8.0f}/s), "
+                f"bulk {bulk * 1000:8.1f} ms ({count / bulk:8.0f}/s), {per_order / bulk:6.1f}x"
+            )
+
+    def _create_orders(self, user, count):
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    order_number=f"BENCH-{i:08d}",
+                    customer_name="Jane Doe",
+                    customer_email="jane@example.com",
+                    customer_address="1 Main Street",
+                    status="confirmed",
+                    total_amount=Decimal("0.00"),
+                    created_by=user,
+                )
+                for i in range(count)
+            ],
+            batch_size=500,
+        )
+        # bulk_create skips Order.save, which keeps the rollups
+        OrderDailyRollup.objects.apply(user.pk, timezone.localdate(), "confirmed", count, 0)
+        return [order.id for order in orders]
@@ -0,0 +1,133 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from backend.renderers import FastJSONRenderer
+from order_manager.models import Order, OrderItem
+from order_manager.serializers import ORDER_VALUES, OrderSerializer, serialize_order_rows
+from product_manager.models import Product
+from product_manager.serializers import PRODUCT_VALUES, ProductSerializer, serialize_product_rows
+
+ITEMS_PER_ORDER = 2
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the list payloads through the DRF serializers against the fast read path, "
+        "query included, on throwaway rows that are rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            nargs="+",
+            type=int,
+            default=[1000, 10000, 100000],
+            help="Row counts to benchmark (default: 1000 10000 100000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Runs per measurement; the best one is reported (default: 3)",
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["rows"])
+        with transaction.atomic():
+            user = self._create_rows(max(sizes))
+            for model in ("products", "orders"):
+                for size in sizes:
+                    self._compare(model, user, size, options["repeat"])
+            transaction.set_rollback(True)
+
+    def _create_rows(self, count):
+        user = User.objects.create_user(username=f"benchmark-{uuid.uuid4().hex[:12]}")
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Product {i}",
+                    description="Benchmark product" if i % 2 else None,
+                    cost_price=Decimal("3.00") if i % 10 else Decimal("0.00"),
+                    selling_price=Decimal("4.99"),
+                    stock_available=i,
+                    customer_rating=Decimal("4.50") if i % 3 else None,
+                    created_by=user,
+                )
+                for i in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    order_number=f"BENCH-{i:08d}",
+                    customer_name="Jane Doe",
+                    customer_email="jane@example.com",
+                    customer_address="1 Main Street",
+                    total_amount=Decimal("9.98") * ITEMS_PER_ORDER,
+                    created_by=user,
+                )
+                for i in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=products[(i + offset) % count],
+                    quantity=2,
+                    unit_price=Decimal("4.99"),
+                    total_price=Decimal("9.98"),
+                )
+                for i, order in enumerate(orders)
+                for offset in range(min(ITEMS_PER_ORDER, count))
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return user
+
+    def _compare(self, model, user, size, repeat):
+        if model == "products":
+            queryset = Product.objects.filter(created_by=user).order_by("-created_at", "-id")
+
+            def current():
+                return JSONRenderer().render(ProductSerializer(queryset[:size], many=True).data)
+
+            def fast():
+                rows = list(queryset.values(*PRODUCT_VALUES)[:size])
+                return FastJSONRenderer().render(serialize_product_rows(rows))
+        else:
+            queryset = Order.objects.filter(created_by=user).order_by("-created_at", "-id")
+
+            def current():
+                return JSONRenderer().render(OrderSerializer(queryset.with_items()[:size], many=True).data)
+
+            def fast():
+                rows = list(queryset.values(*ORDER_VALUES)[:size])
+                return FastJSONRenderer().render(serialize_order_rows(rows))
+
+        current_time, expected = self._best(current, repeat)
+        fast_time, actual = self._best(fast, repeat)
+        if actual != expected:
+            raise CommandError(f"{model} x {size}: the fast payload differs from the serializer payload.")
+        self.stdout.write(
+            f"{model:>8} {size:>7} rows: serializers {current_time * 1000:9.1f} ms, "
+            f"fast path {fast_time * 1000:9.1f} ms, {current_time / fast_time:5.1f}x"
+        )
+
+    def _best(self, function, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            payload = function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, payload
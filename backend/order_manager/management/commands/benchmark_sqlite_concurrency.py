@@ -0,0 +1,113 @@
+import logging
+import multiprocessing
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.test import APIClient
+
+from product_manager.models import Product
+
+ENGINES = {
+    "stock": "django.db.backends.sqlite3",
+    "concurrent": "backend.concurrent_sqlite",
+}
+
+
+def _place_orders(user_id, product_ids, count):
+    """Place ``count`` one-line orders through the API; returns (placed, locked, failed)"""
+    # Not a warning per failed order
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    client = APIClient()
+    client.force_authenticate(User.objects.get(pk=user_id))
+    placed = locked = failed = 0
+    for i in range(count):
+        response = client.post("/order/", {
+            "customer_name": "Jane Doe",
+            "customer_email": "jane@example.com",
+            "customer_address": "1 Main Street",
+            "items": [{"product_id": str(product_ids[i % len(product_ids)]), "quantity": 1}],
+        }, format="json")
+        if response.status_code == 201:
+            placed += 1
+        elif "locked" in str(response.data.get("errors", "")):
+            locked += 1
+        else:
+            failed += 1
+    return placed, locked, failed
+
+
+class Command(BaseCommand):
+    help = (
+        "Place orders from several processes at once on a throwaway SQLite database, with "
+        "the stock backend and with backend.concurrent_sqlite, and compare lock errors and "
+        "throughput"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Processes placing orders (default: 4)")
+        parser.add_argument("--orders", type=int, default=200, help="Orders per process (default: 200)")
+        parser.add_argument("--products", type=int, default=20, help="Products ordered from (default: 20)")
+
+    def handle(self, *args, **options):
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        if settings_dict["ENGINE"] not in ENGINES.values():
+            raise CommandError("The default database must be SQLite.")
+        self.stdout.write(
+            f"{options['workers']} processes x {options['orders']} orders, "
+            f"on {options['products']} products"
+        )
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for name, engine in ENGINES.items():
+                    self._use_database({
+                        **settings_dict, "ENGINE": engine, "NAME": Path(directory) / f"{name}.sqlite3",
+                    })
+                    placed, locked, failed, elapsed = self._run(options)
+                    attempts = options["workers"] * options["orders"]
+                    self.stdout.write(
+                        f"{name:>10}: {placed:6d} placed ({placed / elapsed:7.1f}/s), "
+                        f"{locked:6d} lock errors ({locked / attempts:6.1%}), {failed} other failures"
+                    )
+        finally:
+            self._use_database(settings_dict)
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    def _use_database(self, settings_dict):
+        """Point the default alias, which the views use, at another database"""
+        connections[DEFAULT_DB_ALIAS].close()
+        del connections[DEFAULT_DB_ALIAS]
+        connections.settings[DEFAULT_DB_ALIAS] = settings_dict
+
+    def _run(self, options):
+        call_command("migrate", verbosity=0)
+        user = User.objects.create_user(username="benchmark")
+        product_ids = [
+            product.id
+            for product in Product.objects.bulk_create([
+                Product(
+                    name=f"Product {i}",
+                    cost_price=Decimal("1.00"),
+                    selling_price=Decimal("5.00"),
+                    stock_available=options["workers"] * options["orders"],
+                    created_by=user,
+                )
+                for i in range(options["products"])
+            ])
+        ]
+        # Each process opens its own connection
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with context.Pool(options["workers"]) as pool:
+            start = time.perf_counter()
+            results = pool.starmap(
+                _place_orders, [(user.pk, product_ids, options["orders"])] * options["workers"], chunksize=1
+            )
+            elapsed = time.perf_counter() - start
+        placed, locked, failed = map(sum, zip(*results))
+        return placed, locked, failed, elapsed
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from order_manager.models import OrderDailyRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-user daily order rollups from the orders table. Queryset updates and bulk "
+        "creates of orders bypass the rollups: run with --verify on a schedule"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the rollups against the orders table and report differences",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            differences = OrderDailyRollup.objects.differences()
+            for (user_id, day, status), (stored, expected) in sorted(
+                differences.items(), key=lambda item: str(item[0])
+            ):
+                self.stdout.write(
+                    f"user={user_id} day={day} status={status}: stored={stored} expected={expected}"
+                )
+            if differences:
+                raise CommandError(f"{len(differences)} rollup row(s) out of date.")
+            self.stdout.write(self.style.SUCCESS("Order rollups match the orders table."))
+            return
+
+        rows = OrderDailyRollup.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} order rollup row(s)."))
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from order_manager.emails import OrderEmailSender
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued order emails in batches over one mail connection, retrying failures with "
+        "backoff; runs until stopped unless --once is given"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Send what is due now, then exit")
+        parser.add_argument(
+            "--poll-interval", type=float, default=settings.ORDER_EMAIL_POLL_INTERVAL,
+            help="Seconds to wait when nothing is due (default: ORDER_EMAIL_POLL_INTERVAL)",
+        )
+
+    def handle(self, *args, **options):
+        sender = OrderEmailSender()
+        totals = {"sent": 0, "retried": 0, "failed": 0}
+        try:
+            while True:
+                outcome = sender.send_due()
+                for name in totals:
+                    totals[name] += outcome[name]
+                if outcome["claimed"]:
+                    self.stdout.write(
+                        f"{outcome['sent']} sent, {outcome['retried']} to retry, {outcome['failed']} failed"
+                    )
+                if outcome["claimed"] < settings.ORDER_EMAIL_BATCH_SIZE:
+                    if options["once"]:
+                        break
+                    # Idle: give the mail server its connection back until there is mail again
+                    if not outcome["claimed"]:
+                        sender.close()
+                    time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sender.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {totals['sent']} sent, {totals['retried']} to retry, {totals['failed']} failed"
+        ))
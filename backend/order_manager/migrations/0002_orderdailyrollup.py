@@ -0,0 +1,45 @@
+# Generated by Django 4.2.4 on 2026-10-17 21:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    Order = apps.get_model('order_manager', 'Order')
+    OrderDailyRollup = apps.get_model('order_manager', 'OrderDailyRollup')
+    totals = (
+        Order.objects.order_by()
+        .annotate(day=models.functions.TruncDate('created_at'))
+        .values('created_by_id', 'day', 'status')
+        .annotate(order_count=models.Count('id'), revenue=models.Sum('total_amount'))
+    )
+    OrderDailyRollup.objects.bulk_create(
+        [OrderDailyRollup(**row) for row in totals.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('order_manager', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('created_by', 'day', 'status')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.4 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_manager', '0002_orderdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='order_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_by', 'status', '-created_at', '-id'], name='order_owner_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+# Frozen copy of the DDL backend/search.py issued when this migration was
+# written; later changes to the index go in migrations of their own.
+INSTALL = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "order_manager_order_fts" USING fts5(order_number, customer_name, customer_email, content=\'order_manager_order\', content_rowid=\'rowid\', prefix=\'2 3\')',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_ai" AFTER INSERT ON "order_manager_order" BEGIN INSERT INTO "order_manager_order_fts"(rowid, order_number, customer_name, customer_email) VALUES (new.rowid, new.order_number, new.customer_name, new.customer_email); END',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_ad" AFTER DELETE ON "order_manager_order" BEGIN INSERT INTO "order_manager_order_fts"("order_manager_order_fts", rowid, order_number, customer_name, customer_email) VALUES (\'delete\', old.rowid, old.order_number, old.customer_name, old.customer_email); END',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_au" AFTER UPDATE OF order_number, customer_name, customer_email ON "order_manager_order" BEGIN INSERT INTO "order_manager_order_fts"("order_manager_order_fts", rowid, order_number, customer_name, customer_email) VALUES (\'delete\', old.rowid, old.order_number, old.customer_name, old.customer_email); INSERT INTO "order_manager_order_fts"(rowid, order_number, customer_name, customer_email) VALUES (new.rowid, new.order_number, new.customer_name, new.customer_email); END',
+        'INSERT INTO "order_manager_order_fts"("order_manager_order_fts") VALUES (\'rebuild\')',
+    ],
+    'postgresql': [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'ALTER TABLE "order_manager_order" ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (setweight(to_tsvector(\'simple\', coalesce(order_number, \'\')), \'A\') || setweight(to_tsvector(\'simple\', coalesce(customer_name, \'\')), \'B\') || setweight(to_tsvector(\'simple\', coalesce(customer_email, \'\')), \'C\')) STORED',
+        'CREATE INDEX IF NOT EXISTS "order_manager_order_search_idx" ON "order_manager_order" USING GIN (search_vector)',
+        'CREATE INDEX IF NOT EXISTS "order_manager_order_trgm_idx" ON "order_manager_order" USING GIN ("order_number" gin_trgm_ops)',
+    ],
+}
+
+UNINSTALL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_ai"',
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_ad"',
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_au"',
+        'DROP TABLE IF EXISTS "order_manager_order_fts"',
+    ],
+    'postgresql': [
+        'ALTER TABLE "order_manager_order" DROP COLUMN IF EXISTS search_vector',
+        'DROP INDEX IF EXISTS "order_manager_order_trgm_idx"',
+    ],
+}
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements.get(vendor, []):
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_manager', '0003_order_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(INSTALL), _run(UNINSTALL)),
+    ]
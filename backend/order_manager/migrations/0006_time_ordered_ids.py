@@ -0,0 +1,31 @@
+# Generated by Django 4.2.4 on 2026-10-17 21:34
+
+import backend.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_manager', '0005_ordernumbersequence'),
+    ]
+
+    # The default is applied by Django, not the database, and existing ids stay
+    # as they are, so only the migration state changes (SQLite would otherwise
+    # rebuild the tables)
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='id',
+                    field=models.UUIDField(default=backend.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='orderitem',
+                    name='id',
+                    field=models.UUIDField(default=backend.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
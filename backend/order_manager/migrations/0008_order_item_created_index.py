@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-17 22:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_manager', '0007_orderemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['created_at'], name='order_item_created_idx'),
+        ),
+    ]
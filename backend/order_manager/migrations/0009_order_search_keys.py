@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# The FTS5 table pointed at the implicit rowid of the model table, which
+# VACUUM may renumber as the table is keyed on a UUID. It is replaced by one
+# whose rows carry the primary key, mapped to FTS rowids by a keys table.
+# PostgreSQL indexes the table's own columns and is left as is.
+REKEY = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_ai"',
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_ad"',
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_au"',
+        'DROP TABLE IF EXISTS "order_manager_order_fts"',
+        'DROP TABLE IF EXISTS "order_manager_order_fts_keys"',
+        'CREATE TABLE IF NOT EXISTS "order_manager_order_fts_keys" (rowid INTEGER PRIMARY KEY, row_id TEXT NOT NULL UNIQUE)',
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "order_manager_order_fts" USING fts5(row_id UNINDEXED, order_number, customer_name, customer_email, prefix=\'2 3\')',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_ai" AFTER INSERT ON "order_manager_order" BEGIN INSERT INTO "order_manager_order_fts_keys"(row_id) VALUES (new.id); INSERT INTO "order_manager_order_fts"(rowid, row_id, order_number, customer_name, customer_email) VALUES (last_insert_rowid(), new.id, new.order_number, new.customer_name, new.customer_email); END',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_ad" AFTER DELETE ON "order_manager_order" BEGIN DELETE FROM "order_manager_order_fts" WHERE rowid = (SELECT rowid FROM "order_manager_order_fts_keys" WHERE row_id = old.id); DELETE FROM "order_manager_order_fts_keys" WHERE row_id = old.id; END',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_au" AFTER UPDATE OF order_number, customer_name, customer_email ON "order_manager_order" BEGIN UPDATE "order_manager_order_fts" SET order_number = new.order_number, customer_name = new.customer_name, customer_email = new.customer_email WHERE rowid = (SELECT rowid FROM "order_manager_order_fts_keys" WHERE row_id = old.id); END',
+        'INSERT INTO "order_manager_order_fts_keys"(row_id) SELECT id FROM "order_manager_order"',
+        'INSERT INTO "order_manager_order_fts"(rowid, row_id, order_number, customer_name, customer_email) SELECT k.rowid, k.row_id, t.order_number, t.customer_name, t.customer_email FROM "order_manager_order" t JOIN "order_manager_order_fts_keys" k ON k.row_id = t.id',
+    ],
+}
+
+RESTORE = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_ai"',
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_ad"',
+        'DROP TRIGGER IF EXISTS "order_manager_order_fts_au"',
+        'DROP TABLE IF EXISTS "order_manager_order_fts"',
+        'DROP TABLE IF EXISTS "order_manager_order_fts_keys"',
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "order_manager_order_fts" USING fts5(order_number, customer_name, customer_email, content=\'order_manager_order\', content_rowid=\'rowid\', prefix=\'2 3\')',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_ai" AFTER INSERT ON "order_manager_order" BEGIN INSERT INTO "order_manager_order_fts"(rowid, order_number, customer_name, customer_email) VALUES (new.rowid, new.order_number, new.customer_name, new.customer_email); END',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_ad" AFTER DELETE ON "order_manager_order" BEGIN INSERT INTO "order_manager_order_fts"("order_manager_order_fts", rowid, order_number, customer_name, customer_email) VALUES (\'delete\', old.rowid, old.order_number, old.customer_name, old.customer_email); END',
+        'CREATE TRIGGER IF NOT EXISTS "order_manager_order_fts_au" AFTER UPDATE OF order_number, customer_name, customer_email ON "order_manager_order" BEGIN INSERT INTO "order_manager_order_fts"("order_manager_order_fts", rowid, order_number, customer_name, customer_email) VALUES (\'delete\', old.rowid, old.order_number, old.customer_name, old.customer_email); INSERT INTO "order_manager_order_fts"(rowid, order_number, customer_name, customer_email) VALUES (new.rowid, new.order_number, new.customer_name, new.customer_email); END',
+        'INSERT INTO "order_manager_order_fts"("order_manager_order_fts") VALUES (\'rebuild\')',
+    ],
+}
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements.get(vendor, []):
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_manager', '0008_order_item_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(REKEY), _run(RESTORE)),
+    ]
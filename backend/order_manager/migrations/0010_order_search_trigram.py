@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Order numbers are searched by fragments such as 0001, which a prefix index
+# cannot find in ORD-20260101-0000001: the FTS5 table is rebuilt with the
+# trigram tokenizer. Its rows keep their rowids, and so the keys table and the
+# triggers stay as they are. PostgreSQL already has a trigram index on
+# order_number.
+TRIGRAM = {
+    'sqlite': [
+        'DROP TABLE "order_manager_order_fts"',
+        'CREATE VIRTUAL TABLE "order_manager_order_fts" USING fts5(row_id UNINDEXED, order_number, customer_name, customer_email, tokenize=\'trigram\')',
+        'INSERT INTO "order_manager_order_fts"(rowid, row_id, order_number, customer_name, customer_email) SELECT k.rowid, k.row_id, t.order_number, t.customer_name, t.customer_email FROM "order_manager_order" t JOIN "order_manager_order_fts_keys" k ON k.row_id = t.id',
+    ],
+}
+
+PREFIX = {
+    'sqlite': [
+        'DROP TABLE "order_manager_order_fts"',
+        'CREATE VIRTUAL TABLE "order_manager_order_fts" USING fts5(row_id UNINDEXED, order_number, customer_name, customer_email, prefix=\'2 3\')',
+        'INSERT INTO "order_manager_order_fts"(rowid, row_id, order_number, customer_name, customer_email) SELECT k.rowid, k.row_id, t.order_number, t.customer_name, t.customer_email FROM "order_manager_order" t JOIN "order_manager_order_fts_keys" k ON k.row_id = t.id',
+    ],
+}
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements.get(vendor, []):
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_manager', '0009_order_search_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(TRIGRAM), _run(PREFIX)),
+    ]
@@ -1,9 +1,67 @@
+from decimal import Decimal
+
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
 from django.core.validators import MinValueValidator
-import uuid
+from django.utils import timezone
 
+from backend.ids import uuid7
+from backend.response_cache import invalidate
 from product_manager.models import Product
+from .numbers import order_numbers
+
+
+class OrderTransitionConflict(Exception):
+    """Orders changed status while a bulk transition was applying"""
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Load the items and their products alongside, in one extra query"""
+        return self.prefetch_related(
+            models.Prefetch(
+                'items',
+                queryset=OrderItem.objects.select_related('product').order_by(*OrderItem.ITEMS_ORDERING),
+            )
+        )
+    
+    def transition(self, status):
+        """
+        Move the orders of the queryset that may go to ``status`` (see
+        Order.STATUS_TRANSITIONS) there, with one UPDATE per current status,
+        and shift their rollups along. Returns ``{order_id: (previous status,
+        outcome)}`` where outcome is 'updated', 'unchanged' or 'not_allowed'.
+        """
+        with transaction.atomic():
+            rows = self.order_by().select_for_update().values_list(
+                'id', 'status', 'created_by_id', 'created_at', 'total_amount'
+            )
+            results, moving, deltas = {}, {}, {}
+            for order_id, current, user_id, created_at, total_amount in rows:
+                if current == status:
+                    results[order_id] = (current, 'unchanged')
+                elif status not in Order.STATUS_TRANSITIONS[current]:
+                    results[order_id] = (current, 'not_allowed')
+                else:
+                    results[order_id] = (current, 'updated')
+                    moving.setdefault(current, []).append(order_id)
+                    key = (user_id, timezone.localdate(created_at), current)
+                    count, revenue = deltas.get(key, (0, 0))
+                    deltas[key] = (count + 1, revenue + total_amount)
+            
+            now = timezone.now()
+            for current, order_ids in moving.items():
+                updated = Order.objects.filter(pk__in=order_ids, status=current).update(status=status, updated_at=now)
+                if updated != len(order_ids):
+                    raise OrderTransitionConflict()
+            for (user_id, day, current), (count, revenue) in deltas.items():
+                OrderDailyRollup.objects.apply(user_id, day, current, -count, -revenue)
+                OrderDailyRollup.objects.apply(user_id, day, status, count, revenue)
+            for user_id in {user_id for user_id, _, _ in deltas}:
+                invalidate(user_id, 'orders')
+        return results
 
 
 class Order(models.Model):
@@ -15,52 +73,282 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+    # Statuses an order may move to from each status, enforced by bulk transitions
+    STATUS_TRANSITIONS = {
+        'pending': {'confirmed', 'cancelled'},
+        'confirmed': {'processing', 'shipped', 'cancelled'},
+        'processing': {'shipped', 'cancelled'},
+        'shipped': {'delivered'},
+        'delivered': set(),
+        'cancelled': set(),
+    }
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     order_number = models.CharField(max_length=20, unique=True, editable=False)
     customer_name = models.CharField(max_length=255)
     customer_email = models.EmailField()
     customer_phone = models.CharField(max_length=20, blank=True, null=True)
     customer_address = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    total_amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0'))])
     notes = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order list: per owner, newest first, optionally per status
+            models.Index(fields=['created_by', '-created_at', '-id'], name='order_owner_created_idx'),
+            models.Index(fields=['created_by', 'status', '-created_at', '-id'], name='order_owner_status_created_idx'),
+        ]
         
     def __str__(self):
         return f"Order {self.order_number} - {self.customer_name}"
     
+    # What the rollup row of an order depends on
+    ROLLUP_FIELDS = ('created_by_id', 'created_at', 'status', 'total_amount')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Reading a deferred field would load the instance again, through here
+        if all(name in field_names for name in cls.ROLLUP_FIELDS):
+            instance._rollup_snapshot = _rollup_key(*(getattr(instance, name) for name in cls.ROLLUP_FIELDS))
+        return instance
+    
+    def _rollup_key(self):
+        """The rollup row this order counts towards, with its revenue"""
+        return _rollup_key(*(getattr(self, name) for name in self.ROLLUP_FIELDS))
+    
+    def _stored_rollup_key(self):
+        """``_rollup_key`` as of the last load or save, read from the database if fields were deferred"""
+        if hasattr(self, '_rollup_snapshot'):
+            return self._rollup_snapshot
+        if self._state.adding:
+            return None
+        row = Order.objects.filter(pk=self.pk).values_list(*self.ROLLUP_FIELDS).first()
+        return _rollup_key(*row) if row else None
+    
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Generate order number: ORD-YYYYMMDD-XXXX
-            from django.utils import timezone
-            import random
-            date_str = timezone.now().strftime('%Y%m%d')
-            random_num = str(random.randint(1000, 9999))
-            self.order_number = f"ORD-{date_str}-{random_num}"
-        super().save(*args, **kwargs)
+            self.order_number = order_numbers.next()
+        with transaction.atomic():
+            previous = self._stored_rollup_key()
+            super().save(*args, **kwargs)
+            current = self._rollup_key()
+            if previous != current:
+                if previous:
+                    OrderDailyRollup.objects.apply(*previous[0], -1, -previous[1])
+                OrderDailyRollup.objects.apply(*current[0], 1, current[1])
+                self._rollup_snapshot = current
+
+
+def _rollup_key(created_by_id, created_at, status, total_amount):
+    if created_at is None or created_by_id is None:
+        return None
+    return (created_by_id, timezone.localdate(created_at), status), total_amount
+
+
+def snapshot_rollup(sender, instance, **kwargs):
+    """pre_delete receiver for orders: note their rollup row while it can still be read"""
+    instance._rollup_snapshot = instance._stored_rollup_key()
+
+
+def remove_from_rollups(sender, instance, origin=None, **kwargs):
+    """
+    post_delete receiver for orders: take a deleted order out of its rollup
+    row, whether it was deleted on its own, with a queryset or by cascade
+    """
+    previous = getattr(instance, '_rollup_snapshot', None)
+    # Deleting the user deletes their rollup rows as well
+    if previous is None or isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        return
+    OrderDailyRollup.objects.apply(*previous[0], -1, -previous[1])
+    instance._rollup_snapshot = None
 
 
 class OrderItem(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
-    unit_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
-    total_price = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0'))])
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0'))])
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Cart order, the same on every read path
+    ITEMS_ORDERING = ('created_at', 'id')
+    
     class Meta:
         unique_together = ['order', 'product']
+        indexes = [
+            # New sales since the last demand forecast
+            models.Index(fields=['created_at'], name='order_item_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
     
     def save(self, *args, **kwargs):
         self.total_price = self.quantity * self.unit_price
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class OrderDailyRollupQuerySet(models.QuerySet):
+    def apply(self, user_id, day, status, order_count, revenue):
+        """Add ``order_count`` orders and ``revenue`` to one user x day x status row"""
+        row = self.filter(created_by_id=user_id, day=day, status=status)
+        changes = {'order_count': F('order_count') + order_count, 'revenue': F('revenue') + revenue}
+        if row.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                self.create(
+                    created_by_id=user_id, day=day, status=status,
+                    order_count=order_count, revenue=revenue,
+                )
+        except IntegrityError:
+            # Created concurrently by another writer
+            row.update(**changes)
+    
+    def expected(self):
+        """Rollup totals recomputed from the orders table, keyed by (user id, day, status)"""
+        totals = (
+            Order.objects.order_by()
+            .annotate(day=TruncDate('created_at'))
+            .values('created_by_id', 'day', 'status')
+            .annotate(order_count=Count('id'), revenue=Sum('total_amount'))
+        )
+        return {
+            (row['created_by_id'], row['day'], row['status']): (row['order_count'], row['revenue'])
+            for row in totals.iterator()
+        }
+    
+    def rebuild(self):
+        """Replace every rollup row with totals recomputed from the orders table"""
+        expected = self.expected()
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create([
+                OrderDailyRollup(
+                    created_by_id=user_id, day=day, status=status,
+                    order_count=order_count, revenue=revenue,
+                )
+                for (user_id, day, status), (order_count, revenue) in expected.items()
+            ], batch_size=1000)
+        return len(expected)
+    
+    def differences(self):
+        """Keys whose stored totals disagree with the orders table, as {key: (stored, expected)}"""
+        expected = self.expected()
+        stored = {
+            (user_id, day, status): (order_count, revenue)
+            for user_id, day, status, order_count, revenue in self.values_list(
+                'created_by_id', 'day', 'status', 'order_count', 'revenue'
+            ).iterator()
+            if order_count or revenue
+        }
+        return {
+            key: (stored.get(key), expected.get(key))
+            for key in stored.keys() | expected.keys()
+            if stored.get(key) != expected.get(key)
+        }
+
+
+class OrderNumberSequence(models.Model):
+    """Last order number taken per day, see order_manager.numbers"""
+    day = models.DateField(unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day}: {self.last_value}"
+
+
+class OrderDailyRollup(models.Model):
+    """
+    Order count and revenue per user, day and status, kept in step with Order
+    writes so dashboards never have to scan the orders table.
+
+    Saves, bulk status transitions (``OrderQuerySet.transition``) and every
+    kind of delete keep them in step. Queryset ``update()`` and
+    ``bulk_create()`` of orders do not, so ``rebuild_order_rollups --verify``
+    is meant to run on a schedule (e.g. nightly from cron), and
+    ``rebuild_order_rollups`` to repair what it reports.
+    """
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='order_rollups')
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    objects = OrderDailyRollupQuerySet.as_manager()
+    
+    class Meta:
+        unique_together = ['created_by', 'day', 'status']
+    
+    def __str__(self):
+        return f"{self.created_by} {self.day} {self.status}: {self.order_count} orders"
+
+
+class OrderEmailQuerySet(models.QuerySet):
+    def queue_confirmation(self, order, items):
+        """Queue the confirmation email of a new ``order`` with its ``items``; call in the order's transaction"""
+        lines = '\n'.join(
+            f"- {item.product.name} x {item.quantity} at {item.unit_price}: {item.total_price}" for item in items
+        )
+        return self.create(
+            order=order,
+            recipient=order.customer_email,
+            subject=f"Your order {order.order_number}",
+            body=(
+                f"Hi {order.customer_name},\n\n"
+                f"Thank you for your order {order.order_number}.\n\n"
+                f"{lines}\n\n"
+                f"Total: {order.total_amount}\n"
+                f"Delivery address: {order.customer_address}\n"
+            ),
+        )
+    
+    def due(self, now):
+        return self.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+
+
+class OrderEmail(models.Model):
+    """
+    Outbox of customer emails about orders: written in the transaction that
+    changes the order, sent later by the ``send_order_emails`` worker (see
+    order_manager.emails).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='emails')
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # When a worker may (next) try to send it; pushed forward while a worker holds it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    
+    objects = OrderEmailQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # The worker's poll: pending emails that are due, oldest first
+            models.Index(fields=['status', 'next_attempt_at'], name='order_email_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} to {self.recipient} ({self.status})"
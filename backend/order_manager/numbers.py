@@ -0,0 +1,96 @@
+"""
+Order number allocation: ``ORD-YYYYMMDD-NNNNNNN`` from a per-day sequence row.
+
+Each process reserves a block of ORDER_NUMBER_BLOCK_SIZE numbers at a time
+with one UPDATE of the day's row (hi/lo), then hands them out from memory, so
+workers rarely touch the row and never collide. Numbers are fixed width and
+increase within a process; across processes they interleave by block. Numbers
+of a block a process does not use up are skipped, never reused.
+
+A block is only reserved outside transactions: if a reservation rolled back
+after numbers of it were handed out, another process could reserve the same
+block. Inside a transaction with no reserved numbers left, a single number is
+taken in that transaction instead and rolls back with it.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+PREFIX = 'ORD'
+DIGITS = 7
+MAX_PER_DAY = 10 ** DIGITS - 1
+
+
+class OrderNumbersExhausted(Exception):
+    pass
+
+
+def _day_prefix(day):
+    return f"{PREFIX}-{day:%Y%m%d}-"
+
+
+def _take(day, count, using):
+    """Advance the day's sequence by ``count``; returns the first and last number taken"""
+    from .models import OrderNumberSequence
+
+    sequence = OrderNumberSequence.objects.using(using).filter(day=day)
+    with transaction.atomic(using=using):
+        if not sequence.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic(using=using):
+                    OrderNumberSequence.objects.using(using).create(day=day, last_value=count)
+            except IntegrityError:
+                # Created concurrently by another process
+                sequence.update(last_value=F('last_value') + count)
+        last = sequence.values_list('last_value', flat=True).get()
+    if last > MAX_PER_DAY:
+        raise OrderNumbersExhausted(f"More than {MAX_PER_DAY} order numbers taken on {day}.")
+    return last - count + 1, last
+
+
+class OrderNumberAllocator:
+    def __init__(self, block_size=None, using='default'):
+        self.block_size = block_size
+        self.using = using
+        self._reset()
+        # A forked worker must not hand out the numbers its parent holds
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._day, self._prefix, self._next, self._last = None, '', 1, 0
+        self._today, self._tomorrow_at = None, 0
+
+    def _current_day(self):
+        # localdate() costs more than handing out a number, so remember when today ends
+        if time.time() >= self._tomorrow_at:
+            tz = timezone.get_default_timezone()
+            self._today = timezone.localdate(timezone=tz)
+            self._tomorrow_at = datetime.combine(
+                self._today + timedelta(days=1), datetime.min.time(), tzinfo=tz
+            ).timestamp()
+        return self._today
+
+    def next(self):
+        """The next order number for today, in the default time zone"""
+        day = self._current_day()
+        with self._lock:
+            if day != self._day or self._next > self._last:
+                if transaction.get_connection(self.using).in_atomic_block:
+                    value, _ = _take(day, 1, self.using)
+                    return f"{_day_prefix(day)}{value:0{DIGITS}d}"
+                block_size = self.block_size or settings.ORDER_NUMBER_BLOCK_SIZE
+                self._next, self._last = _take(day, block_size, self.using)
+                self._day, self._prefix = day, _day_prefix(day)
+            value = self._next
+            self._next += 1
+        return f"{self._prefix}{value:0{DIGITS}d}"
+
+
+order_numbers = OrderNumberAllocator()
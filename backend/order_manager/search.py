@@ -0,0 +1,8 @@
+from backend.search import SearchIndex
+from .models import Order
+
+order_search = SearchIndex(
+    Order, ['order_number', 'customer_name', 'customer_email'], weights=[10.0, 5.0, 5.0],
+    # Order numbers are looked up by their digits, e.g. 0001 for ORD-20260101-0000001
+    substring=True,
+)
@@ -1,4 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
+
+from backend.fast_serializers import compile_rows_serializer, datetime_to_string, decimal_to_string
 from .models import Order, OrderItem, Product
 
 
@@ -25,9 +28,79 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'order_number', 'total_amount', 'created_at', 'updated_at']
     
     def get_items_count(self, obj):
+        # Use the prefetched items when the queryset loaded them (see Order.objects.with_items)
+        if 'items' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.items.all())
         return obj.items.count()
 
 
+ORDER_VALUES = [
+    'id', 'order_number', 'customer_name', 'customer_email', 'customer_phone',
+    'customer_address', 'status', 'total_amount', 'notes', 'created_at', 'updated_at',
+]
+ORDER_ITEM_VALUES = [
+    'id', 'order_id', 'product_id', 'product__name', 'product__category',
+    'quantity', 'unit_price', 'total_price',
+]
+
+# Read-only twins of OrderItemSerializer and OrderSerializer over .values() rows
+_serialize_item_rows = compile_rows_serializer([
+    ('id', 'id', str),
+    ('product', 'product_id', str),
+    ('product_name', 'product__name', None),
+    ('product_category', 'product__category', None),
+    ('quantity', 'quantity', None),
+    ('unit_price', 'unit_price', decimal_to_string(10, 2)),
+    ('total_price', 'total_price', decimal_to_string(12, 2)),
+])
+_serialize_order_rows = compile_rows_serializer([
+    ('id', 'id', str),
+    ('order_number', 'order_number', None),
+    ('customer_name', 'customer_name', None),
+    ('customer_email', 'customer_email', None),
+    ('customer_phone', 'customer_phone', None),
+    ('customer_address', 'customer_address', None),
+    ('status', 'status', None),
+    ('total_amount', 'total_amount', decimal_to_string(12, 2)),
+    ('notes', 'notes', None),
+    ('items', 'items', None),
+    ('items_count', 'items_count', None),
+    ('created_at', 'created_at', datetime_to_string),
+    ('updated_at', 'updated_at', datetime_to_string),
+])
+
+
+def _item_rows(rows):
+    return (
+        OrderItem.objects.filter(order_id__in=[row['id'] for row in rows])
+        .order_by(*OrderItem.ITEMS_ORDERING)
+        .values(*ORDER_ITEM_VALUES)
+    )
+
+
+def _serialize_with_items(rows, item_rows):
+    items = {}
+    for item in item_rows:
+        items.setdefault(item['order_id'], []).append(item)
+    for row in rows:
+        row['items'] = _serialize_item_rows(items.get(row['id'], []))
+        row['items_count'] = len(row['items'])
+    return _serialize_order_rows(rows)
+
+
+def serialize_order_rows(rows):
+    """
+    Serialize Order.objects.values(*ORDER_VALUES) rows as OrderSerializer would,
+    loading the items of every order in one extra query
+    """
+    return _serialize_with_items(rows, _item_rows(rows) if rows else [])
+
+
+async def aserialize_order_rows(rows):
+    """``serialize_order_rows`` for async views"""
+    return _serialize_with_items(rows, [item async for item in _item_rows(rows)] if rows else [])
+
+
 class OrderItemCreateSerializer(serializers.Serializer):
     product_id = serializers.UUIDField()
     quantity = serializers.IntegerField(min_value=1)
@@ -40,8 +113,33 @@ class OrderCreateSerializer(serializers.Serializer):
     customer_address = serializers.CharField()
     notes = serializers.CharField(required=False, allow_blank=True)
     items = OrderItemCreateSerializer(many=True)
+    reservation = serializers.UUIDField(required=False)
     
     def validate_items(self, value):
         if not value:
             raise serializers.ValidationError("At least one item is required.")
-        return value
\ No newline at end of file
+        return value
+
+
+class OrderTransitionFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    filter = OrderTransitionFilterSerializer(required=False)
+    
+    def validate_ids(self, value):
+        if len(value) > settings.ORDER_TRANSITION_BATCH_SIZE:
+            raise serializers.ValidationError(
+                f"At most {settings.ORDER_TRANSITION_BATCH_SIZE} orders can be moved at once."
+            )
+        return value
+    
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Pass either ids or filter.")
+        return attrs
@@ -1,3 +1,952 @@
-from django.test import TestCase
+import asyncio
+import smtplib
+import multiprocessing
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils.module_loading import import_string
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from backend.ids import uuid7
+from backend.routers import mark_write
+from product_manager.models import Product, StockReservation
+from .emails import OrderEmailSender
+from .models import Order, OrderDailyRollup, OrderEmail, OrderItem, OrderNumberSequence
+from .numbers import OrderNumberAllocator
+from .serializers import OrderSerializer
+
+
+class OrderTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def make_products(self, count, stock=10, price='5.00'):
+        return [
+            Product.objects.create(
+                name=f'Product {i}',
+                cost_price=Decimal('1.00'),
+                selling_price=Decimal(price),
+                stock_available=stock,
+                created_by=self.user,
+            )
+            for i in range(count)
+        ]
+
+    def order_payload(self, items):
+        return {
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_address': '1 Main Street',
+            'items': items,
+        }
+
+
+class OrderCreateTests(OrderTestMixin, APITestCase):
+    def test_create_updates_stock_and_total(self):
+        first, second = self.make_products(2)
+        response = self.client.post('/order/', self.order_payload([
+            {'product_id': str(first.id), 'quantity': 2},
+            {'product_id': str(second.id), 'quantity': 3},
+        ]), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('25.00'))
+        self.assertEqual(order.items.count(), 2)
+        first.refresh_from_db()
+        self.assertEqual((first.stock_available, first.units_sold), (8, 2))
+
+    def test_repeated_lines_are_merged(self):
+        product, = self.make_products(1)
+        response = self.client.post('/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': 1},
+            {'product_id': str(product.id), 'quantity': 4},
+        ]), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(OrderItem.objects.get().quantity, 5)
+
+    def test_insufficient_stock_leaves_nothing_behind(self):
+        first, second = self.make_products(2, stock=3)
+        response = self.client.post('/order/', self.order_payload([
+            {'product_id': str(first.id), 'quantity': 1},
+            {'product_id': str(second.id), 'quantity': 4},
+        ]), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        first.refresh_from_db()
+        self.assertEqual(first.stock_available, 3)
+
+    def test_unknown_product_is_rejected(self):
+        other = User.objects.create_user(username='other', password='secret-pass')
+        foreign = Product.objects.create(
+            name='Foreign', cost_price=1, selling_price=2, stock_available=5, created_by=other
+        )
+        response = self.client.post('/order/', self.order_payload([
+            {'product_id': str(foreign.id), 'quantity': 1},
+        ]), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_reserved_stock_is_sold_not_taken_twice(self):
+        product, = self.make_products(1, stock=5)
+        token, _, _ = StockReservation.objects.hold(self.user, {product.id: 3})
+        response = self.client.post('/order/', {
+            **self.order_payload([{'product_id': str(product.id), 'quantity': 4}]),
+            'reservation': str(token),
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        product.refresh_from_db()
+        self.assertEqual((product.stock_available, product.units_sold), (1, 4))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        def queries_for(cart_size):
+            products = self.make_products(cart_size)
+            payload = self.order_payload([
+                {'product_id': str(product.id), 'quantity': 1} for product in products
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/order/', payload, format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(queries)
+
+        # The first order of the day also inserts its rollup row
+        queries_for(1)
+        # Stay below SQLite's 999 bound parameters, past which Django splits
+        # the bulk insert into batches
+        self.assertEqual(queries_for(1), queries_for(50))
+        self.assertEqual(queries_for(1), queries_for(100))
+
+
+class OrderListTests(OrderTestMixin, APITestCase):
+    def test_list_is_cursor_paginated(self):
+        product, = self.make_products(1, stock=50)
+        for _ in range(5):
+            self.client.post('/order/', self.order_payload([
+                {'product_id': str(product.id), 'quantity': 1},
+            ]), format='json')
+
+        first = self.client.get('/order/', {'page_size': 3})
+        second = self.client.get('/order/', {'page_size': 3, 'cursor': first.data['meta']['next']})
+
+        self.assertEqual(len(first.data['data']), 3)
+        self.assertEqual(len(second.data['data']), 2)
+        self.assertIsNone(second.data['meta']['next'])
+        ids = [row['id'] for row in first.data['data'] + second.data['data']]
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_list_payload_matches_order_serializer(self):
+        products = self.make_products(3, stock=50, price='2.35')
+        self.client.post('/order/', {**self.order_payload([
+            {'product_id': str(products[2].id), 'quantity': 3},
+            {'product_id': str(products[0].id), 'quantity': 1},
+        ]), 'notes': 'Leave at the door \u2028 \u00e9', 'customer_phone': '555-0100'}, format='json')
+        self.client.post('/order/', self.order_payload([
+            {'product_id': str(products[1].id), 'quantity': 2},
+        ]), format='json')
+        Order.objects.filter(notes='').update(customer_phone=None, notes=None)
+
+        response = self.client.get('/order/')
+
+        orders = Order.objects.filter(created_by=self.user).with_items().order_by('-created_at', '-id')
+        expected = JSONRenderer().render({
+            "meta": {"message": "Orders fetched successfully.", "next": None},
+            "data": OrderSerializer(orders, many=True).data,
+        })
+        self.assertEqual(response.content, expected)
+
+
+class OrderSearchTests(OrderTestMixin, APITestCase):
+    def test_search_matches_number_name_and_email(self):
+        product, = self.make_products(1)
+        for name, email in (('Jane Doe', 'jane@example.com'), ('John Roe', 'john@shop.test')):
+            self.client.post('/order/', {
+                **self.order_payload([{'product_id': str(product.id), 'quantity': 1}]),
+                'customer_name': name, 'customer_email': email,
+            }, format='json')
+        order = Order.objects.get(customer_name='John Roe')
+
+        def names(text):
+            response = self.client.get('/order/', {'search': text})
+            return [row['customer_name'] for row in response.data['data']]
+
+        self.assertEqual(names('jan'), ['Jane Doe'])
+        self.assertEqual(names('shop.test'), ['John Roe'])
+        self.assertEqual(names(order.order_number), ['John Roe'])
+        # A fragment of the number, and terms too short for the trigram index
+        self.assertEqual(names(order.order_number[-3:]), ['John Roe'])
+        self.assertEqual(names('jo ro'), ['John Roe'])
+
+
+class OrderCacheTests(OrderTestMixin, APITestCase):
+    def test_order_creation_refreshes_cached_lists_and_stats(self):
+        product, = self.make_products(1, stock=5)
+        products_etag = self.client.get('/product/')['ETag']
+        stats = self.client.get('/order/stats/')
+        self.assertEqual(stats.data['data']['total_orders'], 0)
+
+        self.client.post('/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': 2},
+        ]), format='json')
+
+        products = self.client.get('/product/', HTTP_IF_NONE_MATCH=products_etag)
+        self.assertEqual(products.data['data'][0]['stock_available'], 3)
+        self.assertEqual(self.client.get('/order/stats/').data['data']['total_orders'], 1)
+        self.assertEqual(len(self.client.get('/order/').data['data']), 1)
+
+
+class OrderDestroyTests(OrderTestMixin, APITestCase):
+    def test_destroy_restores_stock(self):
+        product, = self.make_products(1, stock=5)
+        self.client.post('/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': 2},
+        ]), format='json')
+        order = Order.objects.get()
+
+        response = self.client.delete(f'/order/{order.id}/')
+
+        self.assertEqual(response.status_code, 204)
+        product.refresh_from_db()
+        self.assertEqual((product.stock_available, product.units_sold), (5, 0))
+
+
+class OrderStatsTests(OrderTestMixin, APITestCase):
+    def make_order(self, status, total, created_at):
+        order = Order.objects.create(
+            customer_name='Jane Doe',
+            customer_email='jane@example.com',
+            customer_address='1 Main Street',
+            status=status,
+            total_amount=Decimal(total),
+            created_by=self.user,
+        )
+        # Backdating bypasses Order.save, so recompute the rollups afterwards
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        OrderDailyRollup.objects.rebuild()
+        return order
+
+    def test_stats_run_in_one_query(self):
+        self.make_order('pending', '10.00', datetime(2025, 1, 1, 10, tzinfo=dt_timezone.utc))
+        self.make_order('shipped', '5.50', datetime(2025, 1, 2, 10, tzinfo=dt_timezone.utc))
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/order/stats/')
+
+        data = response.data['data']
+        self.assertEqual(data['total_orders'], 2)
+        self.assertEqual(data['pending_orders'], 1)
+        self.assertEqual(data['shipped_orders'], 1)
+        self.assertEqual(data['total_revenue'], Decimal('15.50'))
+
+    def test_stats_date_range_and_series(self):
+        self.make_order('pending', '10.00', datetime(2025, 1, 1, 10, tzinfo=dt_timezone.utc))
+        self.make_order('pending', '2.00', datetime(2025, 1, 1, 23, tzinfo=dt_timezone.utc))
+        self.make_order('delivered', '7.00', datetime(2025, 1, 3, 10, tzinfo=dt_timezone.utc))
+        self.make_order('delivered', '1.00', datetime(2025, 2, 1, 10, tzinfo=dt_timezone.utc))
+
+        response = self.client.get('/order/stats/', {
+            'date_from': '2025-01-01', 'date_to': '2025-01-31', 'interval': 'day',
+        })
+
+        data = response.data['data']
+        self.assertEqual(data['total_orders'], 3)
+        self.assertEqual(data['total_revenue'], Decimal('19.00'))
+        self.assertEqual(
+            [(row['period'], row['orders'], row['revenue']) for row in data['series']],
+            [(date(2025, 1, 1), 2, Decimal('12.00')), (date(2025, 1, 3), 1, Decimal('7.00'))],
+        )
+
+    def test_stats_reject_bad_parameters(self):
+        response = self.client.get('/order/stats/', {'date_from': '2025-02-30', 'interval': 'year'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errors']), {'date_from', 'interval'})
+
+
+class OrderTransitionTests(OrderTestMixin, APITestCase):
+    def make_orders(self, *statuses):
+        orders = []
+        for order_status in statuses:
+            order = Order.objects.create(
+                customer_name='Jane Doe',
+                customer_email='jane@example.com',
+                customer_address='1 Main Street',
+                total_amount=Decimal('4.00'),
+                created_by=self.user,
+            )
+            if order_status != 'pending':
+                order.status = order_status
+                order.save()
+            orders.append(order)
+        return orders
+
+    def transition(self, payload):
+        return self.client.post('/order/transition/', payload, format='json')
+
+    def test_ids_report_each_order(self):
+        confirmed, pending, shipped = self.make_orders('confirmed', 'pending', 'shipped')
+        other = User.objects.create_user(username='other', password='secret-pass')
+        foreign = Order.objects.create(
+            customer_name='Other', customer_email='o@example.com', customer_address='2 Side Street',
+            total_amount=Decimal('1.00'), created_by=other, status='confirmed',
+        )
+
+        response = self.transition({'status': 'shipped', 'ids': [
+            str(confirmed.id), str(pending.id), str(shipped.id), str(foreign.id),
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['updated'], 1)
+        self.assertEqual(
+            [(row['from_status'], row['result']) for row in response.data['data']['results']],
+            [('confirmed', 'updated'), ('pending', 'not_allowed'), ('shipped', 'unchanged'), (None, 'not_found')],
+        )
+        self.assertEqual(Order.objects.get(pk=foreign.pk).status, 'confirmed')
+        self.assertEqual(OrderDailyRollup.objects.differences(), {})
+
+    def test_one_update_per_source_status(self):
+        orders = self.make_orders('pending', 'pending', 'confirmed', 'processing', 'delivered')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.transition({'status': 'cancelled', 'ids': [str(order.id) for order in orders]})
+
+        order_updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "order_manager_order"')
+        ]
+        self.assertEqual(len(order_updates), 3)
+        self.assertEqual(response.data['data']['updated'], 4)
+        self.assertEqual(Order.objects.filter(status='cancelled').count(), 4)
+        self.assertEqual(OrderDailyRollup.objects.differences(), {})
+
+    def test_filter_moves_matching_orders_in_batches(self):
+        self.make_orders('confirmed', 'confirmed', 'processing', 'pending')
+
+        with self.settings(ORDER_TRANSITION_BATCH_SIZE=2):
+            first = self.transition({'status': 'shipped', 'filter': {}})
+            second = self.transition({'status': 'shipped', 'filter': {}})
+
+        self.assertEqual((first.data['data']['updated'], first.data['data']['more']), (2, True))
+        self.assertEqual((second.data['data']['updated'], second.data['data']['more']), (1, False))
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 3)
+
+    def test_filter_narrows_by_status(self):
+        self.make_orders('confirmed', 'processing')
+
+        response = self.transition({'status': 'shipped', 'filter': {'status': 'processing'}})
+
+        self.assertEqual(response.data['data']['updated'], 1)
+        self.assertEqual(Order.objects.get(status='shipped').pk, Order.objects.order_by('created_at')[1].pk)
+
+    def test_transition_refreshes_cached_list(self):
+        order, = self.make_orders('confirmed')
+        etag = self.client.get('/order/')['ETag']
+
+        self.transition({'status': 'shipped', 'ids': [str(order.id)]})
+
+        response = self.client.get('/order/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['data'][0]['status'], 'shipped')
+
+    def test_invalid_payloads_are_rejected(self):
+        order, = self.make_orders('confirmed')
+
+        for payload in (
+            {'status': 'shipped'},
+            {'status': 'shipped', 'ids': [str(order.id)], 'filter': {}},
+            {'status': 'lost', 'ids': [str(order.id)]},
+        ):
+            self.assertEqual(self.transition(payload).status_code, 400)
+        with self.settings(ORDER_TRANSITION_BATCH_SIZE=1):
+            self.assertEqual(self.transition({'status': 'shipped', 'ids': [str(order.id)] * 2}).status_code, 400)
+
+
+class OrderRollupTests(OrderTestMixin, APITestCase):
+    def rollup_totals(self):
+        return {
+            status: (order_count, revenue)
+            for status, order_count, revenue in OrderDailyRollup.objects.filter(
+                created_by=self.user
+            ).values_list('status', 'order_count', 'revenue')
+            if order_count
+        }
+
+    def test_rollups_follow_create_update_and_delete(self):
+        product, = self.make_products(1)
+        self.client.post('/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': 2},
+        ]), format='json')
+        order = Order.objects.get()
+        self.assertEqual(self.rollup_totals(), {'pending': (1, Decimal('10.00'))})
+
+        self.client.put(f'/order/{order.id}/', {'status': 'confirmed'}, format='json')
+        self.assertEqual(self.rollup_totals(), {'confirmed': (1, Decimal('10.00'))})
+
+        self.client.put(f'/order/{order.id}/', {'status': 'pending'}, format='json')
+        self.client.delete(f'/order/{order.id}/')
+        self.assertEqual(self.rollup_totals(), {})
+        self.assertEqual(OrderDailyRollup.objects.differences(), {})
+
+    def test_queryset_and_cascade_deletes_leave_rollups_in_step(self):
+        product, = self.make_products(1, stock=50)
+        for _ in range(3):
+            self.client.post('/order/', self.order_payload([
+                {'product_id': str(product.id), 'quantity': 1},
+            ]), format='json')
+
+        Order.objects.filter(pk__in=list(Order.objects.values_list('pk', flat=True)[:2])).delete()
+        self.assertEqual(self.rollup_totals(), {'pending': (1, Decimal('5.00'))})
+        self.user.delete()
+        self.assertFalse(OrderDailyRollup.objects.exists())
+        self.assertEqual(OrderDailyRollup.objects.differences(), {})
+
+    def test_orders_with_deferred_fields_keep_rollups_in_step(self):
+        product, = self.make_products(1, stock=50)
+        for _ in range(2):
+            self.client.post('/order/', self.order_payload([
+                {'product_id': str(product.id), 'quantity': 1},
+            ]), format='json')
+
+        order = Order.objects.defer('status').first()
+        order.status = 'confirmed'
+        order.save()
+        self.assertEqual(self.rollup_totals(), {
+            'pending': (1, Decimal('5.00')), 'confirmed': (1, Decimal('5.00')),
+        })
+        Order.objects.only('id').get(pk=order.pk).delete()
+        self.assertEqual(self.rollup_totals(), {'pending': (1, Decimal('5.00'))})
+        self.assertEqual(OrderDailyRollup.objects.differences(), {})
+
+    def test_stats_do_not_read_orders(self):
+        product, = self.make_products(1)
+        self.client.post('/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': 1},
+        ]), format='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/order/stats/', {'interval': 'month'})
+
+        self.assertEqual(response.data['data']['total_orders'], 1)
+        self.assertFalse([q for q in queries if '"order_manager_order"' in q['sql']])
+
+    def test_rebuild_command_verifies_and_repairs(self):
+        product, = self.make_products(1)
+        self.client.post('/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': 1},
+        ]), format='json')
+        OrderDailyRollup.objects.update(order_count=7)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_order_rollups', '--verify', stdout=StringIO())
+        call_command('rebuild_order_rollups', stdout=StringIO())
+        call_command('rebuild_order_rollups', '--verify', stdout=StringIO())
+        self.assertEqual(self.rollup_totals(), {'pending': (1, Decimal('5.00'))})
+
+
+def full_scans(sql):
+    """Plan steps of ``sql`` that read a whole table instead of using an index"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            steps = {step_id: (parent, detail) for step_id, parent, _, detail in cursor.fetchall()}
+
+            def correlated(parent):
+                while parent in steps:
+                    parent, detail = steps[parent]
+                    if detail.startswith('CORRELATED'):
+                        return True
+                return False
+
+            # Full-text lookups show up as scans of the FTS5 virtual table's index, which
+            # must run once per query rather than once per row of a correlated subquery
+            return [
+                detail for parent, detail in steps.values()
+                if detail.startswith('SCAN ') and 'CONSTANT ROW' not in detail
+                and ('VIRTUAL TABLE INDEX' not in detail or correlated(parent))
+            ]
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are cheaper to seq scan; ask whether an index path exists
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall() if 'Seq Scan' in row[0]]
+    return []
+
+
+class QueryPlanTests(OrderTestMixin, APITestCase):
+    """Every query the viewsets issue must be served by an index"""
+
+    def setUp(self):
+        super().setUp()
+        self.products = self.make_products(3)
+        for _ in range(2):
+            self.client.post('/order/', self.order_payload([
+                {'product_id': str(product.id), 'quantity': 1} for product in self.products
+            ]), format='json')
+        self.order = Order.objects.first()
+
+    def assertIndexed(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json' if method != 'get' else None)
+        self.assertLess(response.status_code, 400, response.data)
+        for query in queries:
+            sql = query['sql']
+            if sql.split(' ', 1)[0] in ('SELECT', 'UPDATE', 'DELETE'):
+                self.assertEqual(full_scans(sql), [], sql)
+
+    def test_product_queries_use_indexes(self):
+        product = self.products[0]
+        first_page = self.client.get('/product/', {'page_size': 1})
+        self.assertIndexed('get', '/product/', {'page_size': 1, 'cursor': first_page.data['meta']['next']})
+        self.assertIndexed('get', '/product/', {'category': 'other'})
+        self.assertIndexed('get', '/product/', {'search': 'prod'})
+        first_match = self.client.get('/product/', {'search': 'prod', 'page_size': 1})
+        self.assertIndexed('get', '/product/', {
+            'search': 'prod', 'page_size': 1, 'cursor': first_match.data['meta']['next'],
+        })
+        self.assertIndexed('get', f'/product/{product.id}/')
+        self.assertIndexed('put', f'/product/{product.id}/', {'stock_available': 20})
+        self.assertIndexed('post', '/product/reserve/', {'items': [{'product_id': str(product.id), 'quantity': 1}]})
+
+    def test_order_queries_use_indexes(self):
+        first_page = self.client.get('/order/', {'page_size': 1})
+        self.assertIndexed('get', '/order/', {'page_size': 1, 'cursor': first_page.data['meta']['next']})
+        self.assertIndexed('get', '/order/', {'status': 'pending'})
+        self.assertIndexed('get', '/order/', {'search': 'jane example'})
+        self.assertIndexed('get', '/order/', {'search': 'jane example', 'page_size': 1})
+        self.assertIndexed('get', f'/order/{self.order.id}/')
+        self.assertIndexed('put', f'/order/{self.order.id}/', {'notes': 'Leave at the door'})
+        self.assertIndexed('get', '/order/stats/', {'date_from': '2025-01-01', 'interval': 'week'})
+        self.assertIndexed('post', '/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': 1} for product in self.products
+        ]))
+        self.assertIndexed('delete', f'/order/{self.order.id}/')
+
+
+def allocate_order_numbers(count, block_size):
+    # Runs in a forked worker, which must not use the parent's connection
+    connections.close_all()
+    allocator = OrderNumberAllocator(block_size=block_size)
+    return [allocator.next() for _ in range(count)]
+
+
+class OrderNumberTests(OrderTestMixin, APITestCase):
+    def test_numbers_are_sequential_per_day(self):
+        product, = self.make_products(1)
+        for _ in range(3):
+            self.client.post('/order/', self.order_payload([
+                {'product_id': str(product.id), 'quantity': 1},
+            ]), format='json')
+
+        today = timezone.localdate().strftime('%Y%m%d')
+        self.assertEqual(
+            list(Order.objects.order_by('order_number').values_list('order_number', flat=True)),
+            [f'ORD-{today}-000000{i}' for i in (1, 2, 3)],
+        )
+
+    def test_sequence_restarts_each_day(self):
+        allocator = OrderNumberAllocator(block_size=10)
+        with mock.patch('order_manager.numbers.timezone.localdate', return_value=date(2025, 1, 1)):
+            self.assertEqual(allocator.next(), 'ORD-20250101-0000001')
+            self.assertEqual(allocator.next(), 'ORD-20250101-0000002')
+        with mock.patch('order_manager.numbers.timezone.localdate', return_value=date(2025, 1, 2)):
+            self.assertEqual(allocator.next(), 'ORD-20250102-0000001')
+
+
+class OrderNumberConcurrencyTests(TransactionTestCase):
+    PROCESSES = 8
+    NUMBERS = 1_000_000
+
+    def test_blocks_are_reserved_outside_transactions(self):
+        allocator = OrderNumberAllocator(block_size=100)
+        first = allocator.next()
+        try:
+            with transaction.atomic():
+                # Still served from the block reserved before the transaction
+                second = allocator.next()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(OrderNumberSequence.objects.get().last_value, 100)
+        self.assertEqual((first[-3:], second[-3:]), ('001', '002'))
+
+    def test_block_running_out_in_a_transaction_takes_single_numbers(self):
+        allocator = OrderNumberAllocator(block_size=1)
+        allocator.next()
+        try:
+            with transaction.atomic():
+                self.assertTrue(allocator.next().endswith('0000002'))
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # Rolled back with the transaction, so handed out again
+        self.assertTrue(allocator.next().endswith('0000002'))
+
+    def test_a_million_numbers_across_processes_never_collide(self):
+        per_process = self.NUMBERS // self.PROCESSES
+        connection.close()
+        with multiprocessing.get_context('fork').Pool(self.PROCESSES) as pool:
+            batches = pool.starmap(allocate_order_numbers, [(per_process, 1000)] * self.PROCESSES)
+
+        numbers = [number for batch in batches for number in batch]
+        self.assertEqual(len(numbers), self.NUMBERS)
+        self.assertEqual(len(set(numbers)), self.NUMBERS)
+        for batch in batches:
+            self.assertEqual(batch, sorted(batch))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(OrderTestMixin, APITransactionTestCase):
+    """
+    The replica is a SQLite stand-in: a second connection to the test database,
+    added once the test database exists, and flushed along with ``default``.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.settings['replica_1'] = {**connections['default'].settings_dict}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica_1'].close()
+        del connections.settings['replica_1']
+        delattr(connections._connections, 'replica_1')
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        caches[settings.DATABASE_STICKY_CACHE_ALIAS].clear()
+
+    def queries(self, method, *args, **kwargs):
+        """Run a request; returns its response and the number of queries per database"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica_1']) as replica:
+            response = method(*args, **kwargs)
+        return response, len(primary), len(replica)
+
+    def place_order(self):
+        product, = self.make_products(1)
+        return self.client.post('/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': 1},
+        ]), format='json')
+
+    def test_reads_go_to_the_replica(self):
+        self.make_products(2)
+
+        response, primary, replica = self.queries(self.client.get, '/product/')
+        self.assertEqual(len(response.data['data']), 2)
+        self.assertEqual((primary, replica > 0), (0, True))
+
+        _, primary, replica = self.queries(self.client.get, '/order/stats/')
+        self.assertEqual((primary, replica > 0), (0, True))
+
+    def test_writes_go_to_the_primary_and_stick_reads_there(self):
+        response, primary, replica = self.queries(self.place_order)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((primary > 0, replica), (True, 0))
+
+        response, primary, replica = self.queries(self.client.get, '/order/')
+        self.assertEqual(len(response.data['data']), 1)
+        self.assertEqual((primary > 0, replica), (True, 0))
+
+    def test_writes_served_by_another_worker_stick_reads_to_the_primary(self):
+        self.make_products(1)
+        sticky = settings.CACHES[settings.DATABASE_STICKY_CACHE_ALIAS]
+        other_worker = import_string(sticky['BACKEND'])(sticky['LOCATION'], {})
+
+        with mock.patch('backend.routers.caches', {settings.DATABASE_STICKY_CACHE_ALIAS: other_worker}):
+            mark_write(self.user.pk)
+        _, primary, replica = self.queries(self.client.get, '/product/')
+        self.assertEqual((primary > 0, replica), (True, 0))
+
+    def test_stickiness_is_per_user_and_expires(self):
+        self.place_order()
+        other = User.objects.create_user(username='other', password='secret-pass')
+        self.client.force_authenticate(other)
+        _, primary, replica = self.queries(self.client.get, '/order/')
+        self.assertEqual((primary, replica > 0), (0, True))
+
+        self.client.force_authenticate(self.user)
+        with self.settings(DATABASE_STICKY_SECONDS=0):
+            self.place_order()
+        _, primary, replica = self.queries(self.client.get, '/order/', {'status': 'pending'})
+        self.assertEqual((primary, replica > 0), (0, True))
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class AsyncReadViewTests(OrderTestMixin, APITestCase):
+    def place_orders(self, count):
+        products = self.make_products(2)
+        return [
+            self.client.post('/order/', self.order_payload([
+                {'product_id': str(product.id), 'quantity': 2} for product in products
+            ]), format='json').data['data']['id']
+            for _ in range(count)
+        ]
+
+    def assertSameResponses(self, path, **headers):
+        sync = self.client.get(path, **headers)
+        with self.settings(ROOT_URLCONF='backend.async_urls'):
+            response = self.client.get(path, **headers)
+        self.assertEqual(
+            (response.status_code, response.content, response.get('WWW-Authenticate')),
+            (sync.status_code, sync.content, sync.get('WWW-Authenticate')),
+            path,
+        )
+        return response
+
+    def test_read_endpoints_match_the_viewset(self):
+        order_id, _ = self.place_orders(2)
+        for path in [
+            '/order/', '/order/?page_size=1', '/order/?status=shipped', '/order/?cursor=bad',
+            f'/order/{order_id}/', f'/order/{uuid7()}/',
+            '/order/stats/', '/order/stats/?interval=day', '/order/stats/?interval=year',
+        ]:
+            self.assertSameResponses(path)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.assertSameResponses('/order/').status_code, 401)
+
+    def test_reads_are_async_and_writes_go_to_the_viewset(self):
+        for path in ('/order/', f'/order/{uuid7()}/', '/order/stats/'):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(path, 'backend.async_urls').func))
+
+        with self.settings(ROOT_URLCONF='backend.async_urls'):
+            order_id, = self.place_orders(1)
+            response = self.client.put(f'/order/{order_id}/', {'status': 'confirmed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'confirmed')
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_shares_cache_entries_with_the_viewset(self):
+        etag = self.client.get('/order/stats/')['ETag']
+        with self.settings(ROOT_URLCONF='backend.async_urls'):
+            response = self.client.get('/order/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+def read_then_write(count):
+    """Order creation in miniature: read, then write in the same transaction"""
+    for _ in range(count):
+        with transaction.atomic(using='concurrent'), connections['concurrent'].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM counter')
+            cursor.execute('INSERT INTO counter (seen) VALUES (%s)', [cursor.fetchone()[0]])
+
+
+class ConcurrentSQLiteTests(SimpleTestCase):
+    PROCESSES = 4
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/concurrent.sqlite3'
+        connections.settings['concurrent'] = {
+            **connections['default'].settings_dict,
+            'ENGINE': 'backend.concurrent_sqlite',
+            'NAME': self.path,
+            'PRAGMAS': {**connections['default'].settings_dict['PRAGMAS'], 'busy_timeout': 10000},
+        }
+        self.addCleanup(connections.settings.pop, 'concurrent')
+        self.addCleanup(connections.__delitem__, 'concurrent')
+        self.addCleanup(connections['concurrent'].close)
+        with connections['concurrent'].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, seen INTEGER)')
+
+    def pragma(self, name):
+        with connections['concurrent'].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 10000)
+        self.assertEqual(self.pragma('cache_size'), connections['concurrent'].settings_dict['PRAGMAS']['cache_size'])
+
+    def test_write_transactions_take_the_write_lock_up_front(self):
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with transaction.atomic(using='concurrent'):
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+            # Readers are not blocked in WAL mode
+            self.assertEqual(other.execute('SELECT COUNT(*) FROM counter').fetchone(), (0,))
+
+    def test_processes_writing_at_once_wait_for_each_other(self):
+        connections['concurrent'].close()
+        with multiprocessing.get_context('fork').Pool(self.PROCESSES) as pool:
+            pool.map(read_then_write, [50] * self.PROCESSES)
+
+        with connections['concurrent'].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*), COUNT(DISTINCT seen) FROM counter')
+            self.assertEqual(cursor.fetchone(), (200, 200))
+
+
+class OrderQueryCountTests(OrderTestMixin, APITestCase):
+    """
+    Each action runs a fixed number of queries, whatever the order and item counts.
+    The counts include the SAVEPOINT/RELEASE pairs of atomic blocks nested in the
+    test transaction.
+    """
+
+    def place_orders(self, orders, items):
+        products = self.make_products(items, stock=1000)
+        for _ in range(orders):
+            self.client.post('/order/', self.order_payload([
+                {'product_id': str(product.id), 'quantity': 1} for product in products
+            ]), format='json')
+        return products
+
+    def test_list(self):
+        self.place_orders(1, 1)
+        with self.assertNumQueries(2):
+            self.client.get('/order/')
+        self.place_orders(10, 20)
+        with self.assertNumQueries(2):
+            response = self.client.get('/order/')
+        self.assertEqual(response.data['data'][0]['items_count'], 20)
+
+    def test_retrieve(self):
+        self.place_orders(1, 20)
+        order = Order.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/order/{order.id}/')
+        self.assertEqual(len(response.data['data']['items']), 20)
+
+    def test_update(self):
+        self.place_orders(1, 20)
+        order = Order.objects.get()
+        with self.assertNumQueries(5):
+            self.client.put(f'/order/{order.id}/', {'notes': 'Fragile'}, format='json')
+        # Moving to a new status also creates that day's rollup row
+        with self.assertNumQueries(10):
+            self.client.put(f'/order/{order.id}/', {'status': 'confirmed'}, format='json')
+        with self.assertNumQueries(7):
+            self.client.put(f'/order/{order.id}/', {'status': 'pending'}, format='json')
+
+    def test_create(self):
+        products = self.place_orders(1, 20)
+        # Inside the test transaction the order number is taken from the sequence
+        # row (4 queries); outside transactions it comes from a reserved block.
+        # One more inserts the confirmation email into the outbox
+        with self.assertNumQueries(18):
+            self.client.post('/order/', self.order_payload([
+                {'product_id': str(product.id), 'quantity': 1} for product in products
+            ]), format='json')
+
+    def test_destroy(self):
+        self.place_orders(1, 20)
+        order = Order.objects.get()
+        # Including the delete of its outbox emails; the rollup row is updated
+        # by a post_delete receiver, within the delete's own transaction
+        with self.assertNumQueries(9):
+            self.client.delete(f'/order/{order.id}/')
+
+    def test_stats(self):
+        self.place_orders(10, 2)
+        with self.assertNumQueries(2):
+            self.client.get('/order/stats/', {'interval': 'day'})
+
+
+class OrderEmailTests(OrderTestMixin, APITestCase):
+    def place_order(self, product, quantity=1):
+        return self.client.post('/order/', self.order_payload([
+            {'product_id': str(product.id), 'quantity': quantity},
+        ]), format='json')
+
+    def test_checkout_queues_the_email_for_the_worker(self):
+        product, = self.make_products(1)
+        response = self.place_order(product, quantity=2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+
+        email = OrderEmail.objects.get()
+        self.assertEqual(str(email.order_id), response.data['data']['id'])
+        self.assertEqual(email.status, 'pending')
+
+        self.assertEqual(OrderEmailSender().send_due(), {'claimed': 1, 'sent': 1, 'retried': 0, 'failed': 0})
+        message, = mail.outbox
+        self.assertEqual(message.to, ['jane@example.com'])
+        self.assertIn(response.data['data']['order_number'], message.subject)
+        self.assertIn('Product 0 x 2 at 5.00: 10.00', message.body)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+        self.assertEqual(OrderEmailSender().send_due()['claimed'], 0)
+
+    def test_failed_checkout_queues_nothing(self):
+        product, = self.make_products(1, stock=1)
+        self.assertEqual(self.place_order(product, quantity=2).status_code, 400)
+        self.assertFalse(OrderEmail.objects.exists())
+
+    @override_settings(ORDER_EMAIL_BATCH_SIZE=2)
+    def test_batches_share_one_connection(self):
+        product, = self.make_products(1)
+        for _ in range(3):
+            self.place_order(product)
+        sender = OrderEmailSender()
+        with mock.patch.object(sender.connection, 'open', wraps=sender.connection.open) as opened:
+            self.assertEqual(sender.send_due()['sent'], 2)
+            self.assertEqual(sender.send_due()['sent'], 1)
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(ORDER_EMAIL_RETRY_DELAY=30, ORDER_EMAIL_MAX_ATTEMPTS=3)
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        product, = self.make_products(1)
+        self.place_order(product)
+        sender = OrderEmailSender()
+        now = timezone.now()
+        with mock.patch.object(
+            sender.connection, 'send_messages', side_effect=smtplib.SMTPServerDisconnected('gone')
+        ), self.assertLogs('order_manager.emails', 'WARNING'):
+            self.assertEqual(sender.send_due(now)['retried'], 1)
+            email = OrderEmail.objects.get()
+            self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'gone'))
+            self.assertTrue(now + timedelta(seconds=15) <= email.next_attempt_at <= now + timedelta(seconds=30))
+            self.assertEqual(sender.send_due(now)['claimed'], 0)
+
+            self.assertEqual(sender.send_due(now + timedelta(seconds=30))['retried'], 1)
+            email.refresh_from_db()
+            self.assertTrue(
+                now + timedelta(seconds=60) <= email.next_attempt_at <= now + timedelta(seconds=90)
+            )
+            self.assertEqual(sender.send_due(now + timedelta(seconds=90))['failed'], 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 3))
+        self.assertEqual(sender.send_due(now + timedelta(days=1))['claimed'], 0)
+
+    def test_claimed_emails_are_passed_over_until_their_lease_runs_out(self):
+        product, = self.make_products(1)
+        self.place_order(product)
+        now = timezone.now()
+        self.assertEqual(len(OrderEmailSender().claim(now)), 1)
+        self.assertEqual(OrderEmailSender().send_due(now)['claimed'], 0)
+        later = now + timedelta(seconds=settings.ORDER_EMAIL_LEASE)
+        self.assertEqual(OrderEmailSender().send_due(later)['sent'], 1)
+
+    def test_worker_command_sends_what_is_due(self):
+        product, = self.make_products(1)
+        self.place_order(product)
+        self.place_order(product)
+        out = StringIO()
+        call_command('send_order_emails', '--once', stdout=out)
+        self.assertIn('Done: 2 sent, 0 to retry, 0 failed', out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
@@ -1,7 +1,16 @@
-from product_manager.views import ProductViewSet
+from backend.async_views import async_reads
+from order_manager.async_views import order_list, order_retrieve, order_stats
+from order_manager.views import OrderViewSet
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
-router.register(r"", ProductViewSet, basename="order")
+router.register(r"", OrderViewSet, basename="order")
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls
+
+# For backend.async_urls
+async_urlpatterns = async_reads(router.urls, {
+    "order-list": order_list,
+    "order-detail": order_retrieve,
+    "order-stats": order_stats,
+})
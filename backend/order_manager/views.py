@@ -3,40 +3,128 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import DateField, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, Trunc
+from django.conf import settings
 from django.db import transaction
+from django.utils.dateparse import parse_date
+from decimal import Decimal
 
-from product_manager.models import Product
-from .models import Order, OrderItem
-from .serializers import OrderSerializer, OrderCreateSerializer
+from backend.pagination import InvalidCursor, KeysetPaginator
+from backend.response_cache import cached_response, invalidate
+from backend.routers import ReplicaReadsMixin
+from product_manager.models import Product, StockReservation
+from product_manager.serializers import quantities_by_product
+from .models import Order, OrderDailyRollup, OrderEmail, OrderItem, OrderTransitionConflict
+from .numbers import order_numbers
+from .search import order_search
+from .serializers import (
+    ORDER_VALUES, OrderCreateSerializer, OrderSerializer, OrderTransitionSerializer, serialize_order_rows,
+)
 
+STATS_STATUSES = ['pending', 'confirmed', 'shipped', 'delivered', 'cancelled']
+STATS_INTERVALS = ['day', 'week', 'month']
 
-class OrderViewSet(ViewSet):
+
+def _parse_day(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def order_list_query(request):
+    """The orders ``list`` pages through, as values() rows, and the paginator for their order"""
+    orders = Order.objects.filter(created_by=request.user)
+    
+    # Optional filtering
+    status_filter = request.query_params.get('status', None)
+    search = request.query_params.get('search', None)
+    
+    if status_filter and status_filter != 'all':
+        orders = orders.filter(status=status_filter)
+        
+    # Search results come best match first
+    paginator = KeysetPaginator()
+    if search:
+        orders = order_search.search(orders, search)
+        paginator = KeysetPaginator(order_search.ordering(orders))
+    
+    # Plain rows serialized by a precompiled function, same payload as OrderSerializer
+    return orders.values(*ORDER_VALUES, *orders.query.annotations), paginator
+
+
+def order_stats_query(request):
+    """
+    The rollups ``stats`` aggregates, the requested series ``interval``, and
+    the errors of the query parameters (the rollups are None if there are any)
+    """
+    errors = {}
+    dates = {}
+    for param in ('date_from', 'date_to'):
+        value = request.query_params.get(param)
+        if value:
+            dates[param] = _parse_day(value)
+            if not dates[param]:
+                errors[param] = "Enter a valid date in YYYY-MM-DD format."
+    interval = request.query_params.get('interval')
+    if interval and interval not in STATS_INTERVALS:
+        errors['interval'] = f"Choose one of: {', '.join(STATS_INTERVALS)}."
+    if errors:
+        return None, interval, errors
+    
+    rollups = OrderDailyRollup.objects.filter(created_by=request.user).exclude(order_count=0)
+    if 'date_from' in dates:
+        rollups = rollups.filter(day__gte=dates['date_from'])
+    if 'date_to' in dates:
+        rollups = rollups.filter(day__lte=dates['date_to'])
+    return rollups, interval, errors
+
+
+_order_count = Coalesce(Sum('order_count'), 0)
+_revenue = Coalesce(Sum('revenue'), Value(Decimal('0')), output_field=DecimalField())
+
+# The totals of ``stats``, in one aggregate query over the rollups
+STATS_AGGREGATES = {
+    'total_orders': _order_count,
+    **{
+        f'{order_status}_orders': Coalesce(Sum('order_count', filter=Q(status=order_status)), 0)
+        for order_status in STATS_STATUSES
+    },
+    'total_revenue': _revenue,
+}
+
+
+def stats_series(rollups, interval):
+    """Orders and revenue of ``rollups`` per day, week or month"""
+    return (
+        rollups.order_by()
+        .annotate(period=Trunc('day', interval, output_field=DateField()))
+        .values('period')
+        .annotate(orders=_order_count, revenue=_revenue)
+        .order_by('period')
+    )
+
+
+class OrderViewSet(ReplicaReadsMixin, ViewSet):
     permission_classes = [IsAuthenticated]
     
+    @cached_response('order-list', ['orders', 'products'])
     def list(self, request):
-        """List all orders for the authenticated user"""
-        orders = Order.objects.filter(created_by=request.user).prefetch_related('items__product')
-        
-        # Optional filtering
-        status_filter = request.query_params.get('status', None)
-        search = request.query_params.get('search', None)
-        
-        if status_filter and status_filter != 'all':
-            orders = orders.filter(status=status_filter)
-            
-        if search:
-            orders = orders.filter(
-                Q(order_number__icontains=search) | 
-                Q(customer_name__icontains=search) |
-                Q(customer_email__icontains=search)
-            )
+        """List the authenticated user's orders, newest first, one cursor page at a time"""
+        orders, paginator = order_list_query(request)
+        try:
+            orders, next_cursor = paginator.paginate(orders, request)
+        except InvalidCursor as e:
+            return Response({
+                "meta": {"message": str(e)},
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = OrderSerializer(orders, many=True)
         return Response({
-            "meta": {"message": "Orders fetched successfully."},
-            "data": serializer.data,
+            "meta": {"message": "Orders fetched successfully.", "next": next_cursor},
+            "data": serialize_order_rows(orders),
         })
     
     def create(self, request):
@@ -44,54 +132,87 @@ class OrderViewSet(ViewSet):
         serializer = OrderCreateSerializer(data=request.data)
         if serializer.is_valid():
             try:
+                # Taken before the transaction so it can come from a reserved block
+                order_number = order_numbers.next()
                 with transaction.atomic():
-                    # Create the order
+                    quantities = quantities_by_product(serializer.validated_data['items'])
+                    
+                    # Fetch every product of the cart in one query
+                    products = Product.objects.filter(created_by=request.user).in_bulk(list(quantities))
+                    if len(products) != len(quantities):
+                        raise Http404("No Product matches the given query.")
+                    
+                    # Units set aside by a reservation are already out of stock
+                    held = {}
+                    if serializer.validated_data.get('reservation'):
+                        held = StockReservation.objects.consume(
+                            request.user, serializer.validated_data['reservation']
+                        )
+                    held_sold = {
+                        product_id: min(quantity, held[product_id])
+                        for product_id, quantity in quantities.items() if product_id in held
+                    }
+                    held_unused = {
+                        product_id: quantity - quantities.get(product_id, 0)
+                        for product_id, quantity in held.items() if quantity > quantities.get(product_id, 0)
+                    }
+                    to_reserve = {
+                        product_id: quantity - held.get(product_id, 0)
+                        for product_id, quantity in quantities.items() if quantity > held.get(product_id, 0)
+                    }
+                    
+                    # Take the rest out of stock with one conditional UPDATE, which
+                    # leaves stock untouched if any line cannot be served
+                    failures = Product.objects.filter(created_by=request.user).reserve_stock(to_reserve)
+                    if failures:
+                        transaction.set_rollback(True)
+                        product_id, available = next(iter(failures.items()))
+                        return Response({
+                            "meta": {"message": "Insufficient stock."},
+                            "errors": {
+                                "stock": f"Only {available} units of {products[product_id].name} available",
+                                "lines": [
+                                    {"product_id": str(product_id), "requested": to_reserve[product_id], "available": available}
+                                    for product_id, available in failures.items()
+                                ],
+                            }
+                        }, status=status.HTTP_400_BAD_REQUEST)
+                    Product.objects.sell_held_stock(held_sold)
+                    Product.objects.release_stock(held_unused, sell=False)
+                    invalidate(request.user.pk, 'products', 'orders')
+                    
+                    order_items = []
+                    for product_id, quantity in quantities.items():
+                        product = products[product_id]
+                        order_items.append(OrderItem(
+                            product=product,
+                            quantity=quantity,
+                            unit_price=product.selling_price,
+                            total_price=quantity * product.selling_price,
+                        ))
+                    
+                    # Create the order once, with its final total
                     order = Order.objects.create(
+                        order_number=order_number,
                         customer_name=serializer.validated_data['customer_name'],
                         customer_email=serializer.validated_data['customer_email'],
                         customer_phone=serializer.validated_data.get('customer_phone', ''),
                         customer_address=serializer.validated_data['customer_address'],
                         notes=serializer.validated_data.get('notes', ''),
-                        total_amount=0,  # Will be calculated below
+                        total_amount=sum(item.total_price for item in order_items),
                         created_by=request.user
                     )
                     
-                    total_amount = 0
-                    items_data = serializer.validated_data['items']
-                    
-                    # Create order items
-                    for item_data in items_data:
-                        product = get_object_or_404(Product, 
-                                                  id=item_data['product_id'], 
-                                                  created_by=request.user)
-                        
-                        # Check stock availability
-                        if product.stock_available < item_data['quantity']:
-                            return Response({
-                                "meta": {"message": "Insufficient stock."},
-                                "errors": {"stock": f"Only {product.stock_available} units of {product.name} available"}
-                            }, status=status.HTTP_400_BAD_REQUEST)
-                        
-                        # Create order item
-                        order_item = OrderItem.objects.create(
-                            order=order,
-                            product=product,
-                            quantity=item_data['quantity'],
-                            unit_price=product.selling_price
-                        )
-                        
-                        # Update product stock and units sold
-                        product.stock_available -= item_data['quantity']
-                        product.units_sold += item_data['quantity']
-                        product.save()
-                        
-                        total_amount += order_item.total_price
+                    # Create order items with one bulk insert
+                    for order_item in order_items:
+                        order_item.order = order
+                    OrderItem.objects.bulk_create(order_items)
                     
-                    # Update order total
-                    order.total_amount = total_amount
-                    order.save()
+                    # Sent by the send_order_emails worker once this commits
+                    OrderEmail.objects.queue_confirmation(order, order_items)
                     
                     # Return the created order
+                    order = Order.objects.with_items().get(pk=order.pk)
                     response_serializer = OrderSerializer(order)
                     return Response({
                         "meta": {"message": "Order created successfully."},
@@ -111,7 +232,7 @@ class OrderViewSet(ViewSet):
     
     def retrieve(self, request, pk=None):
         """Get a single order"""
-        order = get_object_or_404(Order, pk=pk, created_by=request.user)
+        order = get_object_or_404(Order.objects.with_items(), pk=pk, created_by=request.user)
         serializer = OrderSerializer(order)
         return Response({
             "meta": {"message": "Order fetched successfully."},
@@ -120,7 +241,7 @@ class OrderViewSet(ViewSet):
     
     def update(self, request, pk=None):
         """Update an order (mainly status)"""
-        order = get_object_or_404(Order, pk=pk, created_by=request.user)
+        order = get_object_or_404(Order.objects.with_items(), pk=pk, created_by=request.user)
         
         # Only allow status, notes, and customer details updates
         allowed_fields = ['status', 'notes', 'customer_name', 'customer_email', 
@@ -149,34 +270,94 @@ class OrderViewSet(ViewSet):
         
         # Restore product stock when deleting order
         with transaction.atomic():
-            for item in order.items.all():
-                product = item.product
-                product.stock_available += item.quantity
-                product.units_sold -= item.quantity
-                product.save()
-            
+            Product.objects.release_stock(dict(order.items.values_list('product_id', 'quantity')))
+            invalidate(request.user.pk, 'products', 'orders')
             order.delete()
         
         return Response({
             "meta": {"message": "Order deleted successfully."}
         }, status=status.HTTP_204_NO_CONTENT)
     
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """
+        Move many orders to ``status`` at once: the orders listed in ``ids``, or
+        up to ORDER_TRANSITION_BATCH_SIZE of the oldest orders matching ``filter``
+        (``status``, ``date_from``, ``date_to``) that may move there; ``more``
+        tells whether matching orders are left for another call.
+        """
+        serializer = OrderTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                "meta": {"message": "Validation failed."},
+                "errors": serializer.errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        target = serializer.validated_data['status']
+        orders = Order.objects.filter(created_by=request.user)
+        more = False
+        if 'ids' in serializer.validated_data:
+            order_ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        else:
+            criteria = serializer.validated_data['filter']
+            orders = orders.filter(status__in=[
+                source for source, targets in Order.STATUS_TRANSITIONS.items() if target in targets
+            ])
+            if 'status' in criteria:
+                orders = orders.filter(status=criteria['status'])
+            if 'date_from' in criteria:
+                orders = orders.filter(created_at__date__gte=criteria['date_from'])
+            if 'date_to' in criteria:
+                orders = orders.filter(created_at__date__lte=criteria['date_to'])
+            batch_size = settings.ORDER_TRANSITION_BATCH_SIZE
+            order_ids = list(orders.order_by('created_at', 'id').values_list('id', flat=True)[:batch_size + 1])
+            more = len(order_ids) > batch_size
+            order_ids = order_ids[:batch_size]
+        
+        try:
+            results = orders.filter(pk__in=order_ids).transition(target)
+        except OrderTransitionConflict:
+            return Response({
+                "meta": {"message": "Some orders changed status meanwhile, please retry."},
+            }, status=status.HTTP_409_CONFLICT)
+        
+        outcomes = [
+            {"id": str(order_id), "from_status": results[order_id][0], "result": results[order_id][1]}
+            if order_id in results else
+            {"id": str(order_id), "from_status": None, "result": "not_found"}
+            for order_id in order_ids
+        ]
+        return Response({
+            "meta": {"message": "Order statuses updated."},
+            "data": {
+                "status": target,
+                "updated": sum(1 for outcome in outcomes if outcome["result"] == "updated"),
+                "more": more,
+                "results": outcomes,
+            },
+        })
+    
     @action(detail=False, methods=['get'])
+    @cached_response('order-stats', ['orders'])
     def stats(self, request):
-        """Get order statistics"""
-        orders = Order.objects.filter(created_by=request.user)
+        """
+        Get order statistics from the daily rollups, in one aggregate query.
+        
+        Optional ``date_from``/``date_to`` (YYYY-MM-DD, inclusive) narrow the range and
+        ``interval`` (day, week or month) adds a bucketed ``series`` for charting.
+        """
+        rollups, interval, errors = order_stats_query(request)
+        if errors:
+            return Response({
+                "meta": {"message": "Validation failed."},
+                "errors": errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        stats = {
-            'total_orders': orders.count(),
-            'pending_orders': orders.filter(status='pending').count(),
-            'confirmed_orders': orders.filter(status='confirmed').count(),
-            'shipped_orders': orders.filter(status='shipped').count(),
-            'delivered_orders': orders.filter(status='delivered').count(),
-            'cancelled_orders': orders.filter(status='cancelled').count(),
-            'total_revenue': sum([order.total_amount for order in orders])
-        }
+        stats = rollups.aggregate(**STATS_AGGREGATES)
+        if interval:
+            stats['series'] = list(stats_series(rollups, interval))
         
         return Response({
             "meta": {"message": "Order statistics fetched successfully."},
             "data": stats,
-        })
\ No newline at end of file
+        })
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProductManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'product_manager'
+
+    def ready(self):
+        from backend.response_cache import invalidate_on_write
+        from .models import Product
+        from .search import product_search
+        post_migrate.connect(product_search.install_after_migrate, sender=self)
+        # Order items show product names, so product writes stale the order lists too
+        invalidate_on_write(Product, 'products', 'orders')
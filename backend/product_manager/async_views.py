@@ -0,0 +1,44 @@
+from django.http import Http404
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.pagination import InvalidCursor
+from backend.response_cache import acached_response
+from .models import Product
+from .serializers import ProductSerializer, serialize_product_rows
+from .views import product_list_query
+
+
+@acached_response('product-list', ['products'])
+async def product_list(request):
+    """ProductViewSet.list on the async ORM"""
+    products, paginator, errors = product_list_query(request)
+    if errors:
+        return Response({
+            "meta": {"message": "Validation failed."},
+            "errors": errors,
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        products, next_cursor = await paginator.apaginate(products, request)
+    except InvalidCursor as e:
+        return Response({
+            "meta": {"message": str(e)},
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        "meta": {"message": "Products fetched successfully.", "next": next_cursor},
+        "data": serialize_product_rows(products),
+    })
+
+
+async def product_retrieve(request, pk=None):
+    """ProductViewSet.retrieve on the async ORM"""
+    try:
+        product = await Product.objects.aget(pk=pk, created_by=request.user)
+    except Product.DoesNotExist:
+        raise Http404("No Product matches the given query.")
+    serializer = ProductSerializer(product)
+    return Response({
+        "meta": {"message": "Product fetched successfully."},
+        "data": serializer.data,
+    })
@@ -0,0 +1,174 @@
+"""
+Bulk product import and export for catalog syncs.
+
+Imports stream-parse CSV or JSON Lines, validate every row with the
+ProductSerializer rules and upsert a batch at a time on the owner's SKU, so
+memory stays flat whatever the file size. Invalid rows are skipped and
+reported with their line number; the rest of their batch is still written.
+
+Exports stream the same payload as the list endpoint, one row per CSV line or
+JSON line, reading the table with a chunked iterator.
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from backend.renderers import FastJSONRenderer
+from backend.response_cache import invalidate
+from .models import Product
+from .serializers import PRODUCT_VALUES, ProductSerializer, serialize_product_rows
+
+FORMATS = ('csv', 'jsonl')
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+EXPORT_FIELDS = list(ProductSerializer.Meta.fields)
+EXPORT_CHUNK_SIZE = 2000
+# The report lists this many failed rows; the count covers all of them
+MAX_REPORTED_ERRORS = 1000
+
+# CSV has no null: an empty cell clears these columns
+_NULLABLE_FIELDS = {field.name for field in Product._meta.fields if field.null}
+# The columns each derived column is computed from
+_DERIVED_FROM = {
+    'profit_margin': {'cost_price', 'selling_price'},
+    'sell_through_rate': {'stock_available', 'units_sold'},
+}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def format_for(name, requested=None):
+    """The format asked for, or the one the file name ends with"""
+    file_format = requested or (name or '').rsplit('.', 1)[-1].lower()
+    if file_format == 'ndjson':
+        file_format = 'jsonl'
+    if file_format not in FORMATS:
+        raise ImportFormatError(f"Unsupported format, use one of: {', '.join(FORMATS)}.")
+    return file_format
+
+
+def read_rows(binary_file, file_format):
+    """
+    Yield ``(line_number, row)`` from an uploaded file; ``row`` is None
+    when the line could not be parsed
+    """
+    lines = codecs.iterdecode(binary_file, 'utf-8-sig')
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None
+                continue
+            yield reader.line_num, {
+                name: (None if value == '' and name in _NULLABLE_FIELDS else value)
+                for name, value in row.items()
+            }
+        return
+
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _upsert(user, products, report):
+    """Write one validated batch, matching existing products on (created_by, sku)"""
+    existing = set(
+        Product.objects.filter(created_by=user, sku__in=list(products)).values_list('sku', flat=True)
+    )
+    # Rows that set different columns only update their own columns
+    groups = {}
+    for product, fields in products.values():
+        groups.setdefault(fields, []).append(product)
+    for fields, batch in groups.items():
+        # An updated row's derived columns follow from the columns it sets, or else are recomputed below
+        derived = [name for name, inputs in _DERIVED_FROM.items() if inputs <= fields]
+        Product.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['created_by', 'sku'],
+            update_fields=[*sorted(fields), *derived, 'updated_at'],
+        )
+        if len(derived) < len(_DERIVED_FROM) and existing:
+            Product.objects.filter(
+                created_by=user, sku__in=[product.sku for product in batch if product.sku in existing]
+            ).refresh_metrics()
+    report['updated'] += len(existing)
+    report['created'] += len(products) - len(existing)
+
+
+def _fail(report, line_number, errors):
+    report['failed'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'line': line_number, 'errors': errors})
+
+
+def import_products(user, rows, batch_size=None):
+    """
+    Validate and upsert ``(line_number, row)`` pairs from ``read_rows`` for
+    ``user``. Returns ``{created, updated, failed, errors}``.
+    """
+    batch_size = batch_size or settings.PRODUCT_IMPORT_BATCH_SIZE
+    serializer = ProductSerializer()
+    report = {'created': 0, 'updated': 0, 'failed': 0, 'errors': []}
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        # Later rows with the same SKU win, as they would across batches
+        products = {}
+        for line_number, row in chunk:
+            if row is None:
+                _fail(report, line_number, {'non_field_errors': ['Malformed row.']})
+                continue
+            try:
+                data = serializer.run_validation(row)
+            except serializers.ValidationError as e:
+                _fail(report, line_number, e.detail)
+                continue
+            if not data.get('sku'):
+                _fail(report, line_number, {'sku': ['This field is required.']})
+                continue
+            products[data['sku']] = (
+                Product(created_by=user, **data),
+                frozenset(name for name in data if name != 'sku'),
+            )
+        if products:
+            with transaction.atomic():
+                _upsert(user, products, report)
+    invalidate(user.pk, 'products', 'orders')
+    return report
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes to it"""
+    def write(self, value):
+        return value
+
+
+def export_products(queryset, file_format):
+    """Yield the UTF-8 export of ``queryset`` one chunk of rows at a time"""
+    rows = queryset.order_by('created_at', 'id').values(*PRODUCT_VALUES).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS).encode()
+    renderer = FastJSONRenderer()
+    while True:
+        chunk = serialize_product_rows(list(islice(rows, EXPORT_CHUNK_SIZE)))
+        if not chunk:
+            return
+        if file_format == 'csv':
+            yield ''.join(writer.writerow([row[name] for name in EXPORT_FIELDS]) for row in chunk).encode()
+        else:
+            yield b''.join(renderer.render(row) + b'\n' for row in chunk)
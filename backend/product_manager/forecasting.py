@@ -0,0 +1,157 @@
+"""
+Demand forecasts: ``Product.demand_forecast`` from each product's daily sales.
+
+A product's daily rate is the exponentially smoothed units it sold per day
+over the last FORECAST_HISTORY_DAYS full days (cancelled orders left out),
+every day weighing half as much as one FORECAST_HALF_LIFE_DAYS more recent;
+products younger than the history are smoothed over the days they have
+existed. The forecast is that rate over FORECAST_HORIZON_DAYS, rounded.
+
+Sales are read with one aggregated query, a row per product and day with
+sales, and the whole batch is forecast at once with NumPy: the smoothed sum
+is a weighted ``bincount`` of those rows, no per-product loop and no dense
+products x days matrix. Forecasts are written back with one UPDATE per
+distinct value (and chunk of ids), only where they changed.
+
+A run forecasts the products with sales since the start of the day the last
+finished run forecast from (``DemandForecastRun.day``): that run read sales
+up to then, so later ones, also those made earlier on its own day, are new.
+Every product is forecast if there is no such run or ``full`` is asked for. Products without new sales keep their forecast, although their
+rate decays as days pass; a regular full run (e.g. nightly) refreshes them
+and takes in cancellations of older orders.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from backend.response_cache import invalidate
+from order_manager.models import OrderItem
+from .models import DemandForecastRun, Product
+
+# Orders can commit a little after the time they were created at
+CHECKPOINT_OVERLAP = timedelta(minutes=5)
+# Ids per UPDATE, within SQLite's parameter limit
+UPDATE_CHUNK = 900
+
+
+def decay_per_day(half_life):
+    return 0.5 ** (1 / half_life)
+
+
+def daily_rates(sale_products, sale_ages, sale_units, product_ages, half_life, history_days):
+    """
+    Smoothed units per day of each product, as an array.
+
+    ``sale_products``, ``sale_ages`` and ``sale_units`` are parallel arrays,
+    one entry per product and day with sales: the product's index, the day's
+    age in days (0 is yesterday) and the units sold. ``product_ages`` is the
+    number of full days each product has existed.
+    """
+    decay = decay_per_day(half_life)
+    weights = (1 - decay) * decay ** np.asarray(sale_ages, dtype=np.float64)
+    smoothed = np.bincount(
+        sale_products, weights=weights * np.asarray(sale_units, dtype=np.float64), minlength=len(product_ages)
+    )
+    # The weights of the days a product existed sum to this; days before add nothing
+    observed = np.clip(np.asarray(product_ages), 1, history_days)
+    return smoothed / (1 - decay ** observed)
+
+
+def forecast(rates, horizon):
+    return np.rint(rates * horizon).astype(np.int64)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def load_sales(today, history_days, since=None):
+    """
+    The products to forecast, every product or those with sales since
+    ``since``, and their sales, as arrays.
+
+    Returns ``(ids, owners, current forecasts, product ages)`` and
+    ``(sale products, sale ages, sale units)`` as ``daily_rates`` takes them.
+    """
+    products = Product.objects.order_by()
+    if since is not None:
+        products = products.filter(id__in=OrderItem.objects.filter(created_at__gte=since).values('product_id'))
+    first_day = today - timedelta(days=history_days)
+    ids, owners, current, product_ages, index = [], [], [], [], {}
+    # Looked up once, not per product as localdate() does
+    tz = timezone.get_current_timezone()
+    for product_id, owner_id, demand_forecast, created_at in products.values_list(
+        'id', 'created_by_id', 'demand_forecast', 'created_at'
+    ).iterator(chunk_size=10000):
+        index[product_id] = len(ids)
+        ids.append(product_id)
+        owners.append(owner_id)
+        current.append(-1 if demand_forecast is None else demand_forecast)
+        product_ages.append((today - created_at.astimezone(tz).date()).days)
+
+    sales = (
+        OrderItem.objects
+        .filter(order__created_at__gte=_day_start(first_day), order__created_at__lt=_day_start(today))
+        .exclude(order__status='cancelled')
+        .annotate(day=TruncDate('order__created_at'))
+        .values_list('product_id', 'day')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+    if since is not None:
+        sales = sales.filter(product__in=products.values('id'))
+    sale_products, sale_ages, sale_units = [], [], []
+    yesterday = today - timedelta(days=1)
+    for product_id, day, units in sales.iterator(chunk_size=10000):
+        position = index.get(product_id)
+        if position is not None:
+            sale_products.append(position)
+            sale_ages.append((yesterday - day).days)
+            sale_units.append(units)
+
+    return (
+        (ids, np.array(owners), np.array(current, dtype=np.int64), np.array(product_ages, dtype=np.int64)),
+        (np.array(sale_products, dtype=np.int64), np.array(sale_ages, dtype=np.int64), np.array(sale_units)),
+    )
+
+
+def write_forecasts(ids, forecasts):
+    """Set ``demand_forecast`` of products ``ids`` to ``forecasts``, one UPDATE per value and chunk"""
+    ids = np.array(ids, dtype=object)
+    for value in np.unique(forecasts):
+        matching = ids[forecasts == value].tolist()
+        for start in range(0, len(matching), UPDATE_CHUNK):
+            Product.objects.filter(id__in=matching[start:start + UPDATE_CHUNK]).update(demand_forecast=int(value))
+
+
+def run_forecast(full=False, today=None):
+    """Forecast the products with new sales (every product with ``full``); returns the finished run"""
+    today = today or timezone.localdate()
+    last = DemandForecastRun.objects.filter(finished_at__isnull=False).first()
+    run = DemandForecastRun.objects.create(day=today, full=full or last is None)
+
+    since = None
+    if not run.full:
+        # Runs from before ``day`` was recorded forecast from the day they started
+        since = _day_start(last.day or timezone.localdate(last.started_at)) - CHECKPOINT_OVERLAP
+    (ids, owners, current, product_ages), sales = load_sales(today, settings.FORECAST_HISTORY_DAYS, since)
+    forecasts = forecast(
+        daily_rates(*sales, product_ages, settings.FORECAST_HALF_LIFE_DAYS, settings.FORECAST_HISTORY_DAYS),
+        settings.FORECAST_HORIZON_DAYS,
+    )
+
+    changed = forecasts != current
+    with transaction.atomic():
+        write_forecasts([ids[i] for i in np.flatnonzero(changed)], forecasts[changed])
+        for owner_id in np.unique(owners[changed]).tolist():
+            invalidate(owner_id, 'products')
+        run.products_forecast = len(ids)
+        run.products_updated = int(changed.sum())
+        run.finished_at = timezone.now()
+        run.save()
+    return run
@@ -0,0 +1,160 @@
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from order_manager.models import Order, OrderItem
+from product_manager.forecasting import daily_rates, decay_per_day, forecast, run_forecast
+from product_manager.models import Product
+
+
+def _forecast_per_product(sale_products, sale_ages, sale_units, product_ages, half_life, history_days, horizon):
+    """The same forecast with a Python loop over each product's daily series, for comparison"""
+    decay = decay_per_day(half_life)
+    series = {}
+    for product, age, units in zip(sale_products.tolist(), sale_ages.tolist(), sale_units.tolist()):
+        series.setdefault(product, [0] * history_days)[history_days - 1 - age] = units
+    forecasts = []
+    for product, product_age in enumerate(product_ages.tolist()):
+        observed = min(max(product_age, 1), history_days)
+        level = 0.0
+        for units in series.get(product, [0] * history_days)[history_days - observed:]:
+            level = decay * level + (1 - decay) * units
+        forecasts.append(round(level / (1 - decay ** observed) * horizon))
+    return forecasts
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the demand forecast at catalog scale: the NumPy computation against a per-product "
+        "loop, then full and incremental runs on a throwaway SQLite database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100000, help="Products (default: 100000)")
+        parser.add_argument("--days", type=int, default=365, help="Days of sales history (default: 365)")
+        parser.add_argument(
+            "--density", type=float, default=0.01,
+            help="Share of product x day pairs with sales in the database (default: 0.01)",
+        )
+        parser.add_argument(
+            "--loop-sample", type=int, default=2000,
+            help="Products the per-product loop forecasts, scaled up to the catalog (default: 2000)",
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        self._compute(rng, options)
+        self._end_to_end(rng, options)
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    def _compute(self, rng, options):
+        """Every product with a sale on every day: the most work the arrays can take"""
+        products, days = options["products"], options["days"]
+        sale_products = np.repeat(np.arange(products, dtype=np.int32), days)
+        sale_ages = np.tile(np.arange(days, dtype=np.int32), products)
+        sale_units = rng.poisson(3, products * days).astype(np.int32)
+        product_ages = rng.integers(days, 2 * days, products)
+        args = (settings.FORECAST_HALF_LIFE_DAYS, days)
+
+        start = time.perf_counter()
+        vectorized = forecast(daily_rates(sale_products, sale_ages, sale_units, product_ages, *args), 30)
+        vectorized_time = time.perf_counter() - start
+
+        sample = options["loop_sample"]
+        start = time.perf_counter()
+        looped = _forecast_per_product(
+            sale_products[:sample * days], sale_ages[:sample * days], sale_units[:sample * days],
+            product_ages[:sample], *args, 30,
+        )
+        loop_time = (time.perf_counter() - start) * products / sample
+        if looped != vectorized[:sample].tolist():
+            self.stdout.write(self.style.WARNING("The loop and NumPy forecasts differ"))
+        self.stdout.write(
+            f"{products} products x {days} days ({products * days} daily sales): NumPy {vectorized_time:.2f} s, "
+            f"per-product loop {loop_time:.1f} s (from {sample} products), {loop_time / vectorized_time:.0f}x"
+        )
+
+    @contextmanager
+    def _throwaway_database(self):
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        with tempfile.TemporaryDirectory() as directory:
+            connections[DEFAULT_DB_ALIAS].close()
+            del connections[DEFAULT_DB_ALIAS]
+            connections.settings[DEFAULT_DB_ALIAS] = {
+                **settings_dict, "ENGINE": "django.db.backends.sqlite3", "NAME": Path(directory) / "forecast.sqlite3",
+            }
+            try:
+                call_command("migrate", verbosity=0)
+                yield
+            finally:
+                connections[DEFAULT_DB_ALIAS].close()
+                del connections[DEFAULT_DB_ALIAS]
+                connections.settings[DEFAULT_DB_ALIAS] = settings_dict
+
+    def _sell(self, user, products, day, lines, rng, number):
+        """One order on ``day`` of one unit or more of ``lines`` distinct products"""
+        created_at = timezone.now() - timedelta(days=day)
+        order = Order.objects.bulk_create([Order(
+            order_number=f"BENCH-{number:08d}",
+            customer_name="Jane Doe",
+            customer_email="jane@example.com",
+            customer_address="1 Main Street",
+            total_amount=Decimal("0.00"),
+            created_by=user,
+        )])[0]
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, product=products[i], quantity=quantity,
+                unit_price=Decimal("1.00"), total_price=Decimal(quantity),
+            )
+            for i, quantity in zip(
+                rng.choice(len(products), lines, replace=False).tolist(), rng.integers(1, 6, lines).tolist()
+            )
+        ], batch_size=1000)
+        # Both are set to now on insert
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        OrderItem.objects.filter(order=order).update(created_at=created_at)
+
+    def _end_to_end(self, rng, options):
+        products, days = options["products"], options["days"]
+        lines = max(1, int(products * options["density"]))
+        with self._throwaway_database():
+            start = time.perf_counter()
+            user = User.objects.create_user(username="benchmark")
+            catalog = Product.objects.bulk_create([
+                Product(
+                    name=f"Product {i}", cost_price=Decimal("1.00"), selling_price=Decimal("2.00"), created_by=user,
+                )
+                for i in range(products)
+            ], batch_size=1000)
+            Product.objects.update(created_at=timezone.now() - timedelta(days=days))
+            with transaction.atomic():
+                for day in range(1, days + 1):
+                    self._sell(user, catalog, day, lines, rng, day)
+            self.stdout.write(
+                f"Seeded {products} products and {lines * days} order lines over {days} days "
+                f"in {time.perf_counter() - start:.0f} s"
+            )
+
+            for name, new_sales in [("full", None), ("incremental, no new sales", 0), ("incremental, 1% sold", 1)]:
+                if new_sales:
+                    self._sell(user, catalog, 1, max(1, products // 100), rng, days + 1)
+                    # Recorded since the last run, although sold yesterday
+                    OrderItem.objects.filter(order__order_number=f"BENCH-{days + 1:08d}").update(created_at=timezone.now())
+                start = time.perf_counter()
+                run = run_forecast(full=new_sales is None, today=timezone.localdate())
+                self.stdout.write(
+                    f"{name:>26}: {time.perf_counter() - start:6.2f} s, {run.products_forecast} forecast, "
+                    f"{run.products_updated} updated"
+                )
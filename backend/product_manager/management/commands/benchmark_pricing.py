@@ -0,0 +1,115 @@
+import tempfile
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from order_manager.models import Order, OrderItem
+from product_manager.models import Product
+from product_manager.pricing import run_price_optimization
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the price optimization of a large catalog on a throwaway SQLite database, with sales "
+        "drawn from known elasticities per category to compare the fitted ones against"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000000, help="Products (default: 1000000)")
+        parser.add_argument("--lines", type=int, default=200000, help="Order lines of history (default: 200000)")
+        parser.add_argument(
+            "--workers", type=int, default=None, help="Processes pricing categories (default: PRICING_WORKERS)",
+        )
+
+    @contextmanager
+    def _throwaway_database(self):
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        with tempfile.TemporaryDirectory() as directory:
+            connections[DEFAULT_DB_ALIAS].close()
+            del connections[DEFAULT_DB_ALIAS]
+            connections.settings[DEFAULT_DB_ALIAS] = {
+                **settings_dict, "ENGINE": "django.db.backends.sqlite3", "NAME": Path(directory) / "pricing.sqlite3",
+            }
+            try:
+                call_command("migrate", verbosity=0)
+                yield
+            finally:
+                connections[DEFAULT_DB_ALIAS].close()
+                del connections[DEFAULT_DB_ALIAS]
+                connections.settings[DEFAULT_DB_ALIAS] = settings_dict
+
+    def _seed(self, rng, products, lines):
+        """Products in every category, and order lines at prices up to 20% off the selling price"""
+        categories = [category for category, _ in Product.CATEGORY_CHOICES]
+        elasticities = dict(zip(categories, np.linspace(-3.0, -1.2, len(categories)).tolist()))
+        user = User.objects.create_user(username="benchmark")
+        product_categories = rng.integers(0, len(categories), products)
+        cost = np.round(rng.uniform(1, 100, products), 2)
+        selling = np.round(cost * rng.uniform(1.2, 2.5, products), 2)
+        with transaction.atomic():
+            catalog = Product.objects.bulk_create([
+                Product(
+                    name=f"Product {i}", category=categories[product_categories[i]],
+                    cost_price=Decimal(f"{cost[i]:.2f}"), selling_price=Decimal(f"{selling[i]:.2f}"), created_by=user,
+                )
+                for i in range(products)
+            ], batch_size=5000)
+
+        # An order holds a product once: orders of up to 100 distinct products
+        order_sizes = [min(100, lines - start) for start in range(0, lines, 100)]
+        sold = np.concatenate([rng.choice(products, size, replace=False) for size in order_sizes])
+        discount = rng.uniform(0.8, 1.0, lines)
+        prices = np.round(selling[sold] * discount, 2)
+        e = np.array(list(elasticities.values()))[product_categories[sold]]
+        quantities = np.maximum(rng.poisson(5 * discount ** e), 1)
+        with transaction.atomic():
+            orders = Order.objects.bulk_create([
+                Order(
+                    order_number=f"BENCH-{number:08d}",
+                    customer_name="Jane Doe",
+                    customer_email="jane@example.com",
+                    customer_address="1 Main Street",
+                    total_amount=Decimal("0.00"),
+                    created_by=user,
+                )
+                for number in range(len(order_sizes))
+            ], batch_size=5000)
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=orders[i // 100], product=catalog[sold[i]], quantity=int(quantities[i]),
+                    unit_price=Decimal(f"{prices[i]:.2f}"), total_price=Decimal(f"{prices[i] * quantities[i]:.2f}"),
+                )
+                for i in range(lines)
+            ], batch_size=5000)
+        return elasticities
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        with self._throwaway_database():
+            start = time.perf_counter()
+            elasticities = self._seed(rng, options["products"], options["lines"])
+            self.stdout.write(
+                f"Seeded {options['products']} products and {options['lines']} order lines "
+                f"in {time.perf_counter() - start:.0f} s"
+            )
+
+            for name in ["first run", "second run, unchanged"]:
+                start = time.perf_counter()
+                run = run_price_optimization(restart=True, workers=options["workers"])
+                self.stdout.write(
+                    f"{name:>22}: {time.perf_counter() - start:6.1f} s, {run.products_priced} priced, "
+                    f"{run.products_updated} updated"
+                )
+            for progress in run.categories.order_by("category"):
+                self.stdout.write(
+                    f"{progress.category:>12}: elasticity {progress.elasticity:5.2f} "
+                    f"(drawn from {elasticities[progress.category]:5.2f})"
+                )
+        self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,77 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+
+from backend.ids import uuid7
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare insert throughput and primary key index size of random (v4) and "
+        "time-ordered (v7) UUID keys, in scratch tables that are dropped afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Rows per table (default: 100000)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction (default: 1000)")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Database to run on (SQLite or PostgreSQL)")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor not in ("sqlite", "postgresql"):
+            raise CommandError("Index sizes can only be read on SQLite and PostgreSQL.")
+        self.stdout.write(f"{connection.vendor}, {options['rows']} rows, {options['batch_size']} per transaction")
+        for name, generator in GENERATORS.items():
+            table = f"benchmark_pk_{name}"
+            self._create(connection, table)
+            try:
+                elapsed = self._insert(connection, table, generator, options["rows"], options["batch_size"])
+                index_size, table_size = self._sizes(connection, table)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE "{table}"')
+            self.stdout.write(
+                f"{name}: {options['rows'] / elapsed:9.0f} rows/s, "
+                f"key index {index_size / 1024:9.0f} KiB, table {table_size / 1024:9.0f} KiB"
+            )
+
+    def _create(self, connection, table):
+        # The key column as Django creates it for a UUIDField primary key
+        key_type = models.UUIDField().db_type(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS "{table}"')
+            cursor.execute(
+                f'CREATE TABLE "{table}" ("id" {key_type} NOT NULL PRIMARY KEY, "name" varchar(255) NOT NULL)'
+            )
+
+    def _insert(self, connection, table, generator, rows, batch_size):
+        field = models.UUIDField()
+        sql = f'INSERT INTO "{table}" ("id", "name") VALUES (%s, %s)'
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            batch = [
+                (field.get_db_prep_value(generator(), connection), f"Product {offset + i}")
+                for i in range(min(batch_size, rows - offset))
+            ]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+        return time.perf_counter() - start
+
+    def _sizes(self, connection, table):
+        """Bytes used by the primary key index and by the table"""
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN (%s, %s) GROUP BY name",
+                    [table, f"sqlite_autoindex_{table}_1"],
+                )
+                sizes = dict(cursor.fetchall())
+                return sizes[f"sqlite_autoindex_{table}_1"], sizes[table]
+            cursor.execute(
+                "SELECT pg_relation_size(%s), pg_relation_size(%s)", [f"{table}_pkey", table]
+            )
+            return cursor.fetchone()
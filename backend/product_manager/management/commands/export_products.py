@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from product_manager.bulk import ImportFormatError, export_products, format_for
+from product_manager.models import Product
+
+
+class Command(BaseCommand):
+    help = "Write a user's products as CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Username owning the products")
+        parser.add_argument("--format", dest="file_format", help="csv or jsonl (default: from --output, else csv)")
+        parser.add_argument("--output", help="File to write (default: standard output)")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}.")
+        try:
+            file_format = format_for(options["output"] or "products.csv", options["file_format"])
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+
+        chunks = export_products(Product.objects.filter(created_by=user), file_format)
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending="")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from product_manager.forecasting import run_forecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast Product.demand_forecast from daily sales, for the products with sales since "
+        "the last run (all products on the first run or with --full)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Forecast every product, also those without new sales (e.g. nightly)",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        run = run_forecast(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {run.products_forecast} product(s){' (full run)' if run.full else ''}, "
+            f"{run.products_updated} changed, in {time.perf_counter() - start:.1f} s."
+        ))
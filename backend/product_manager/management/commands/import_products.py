@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from product_manager.bulk import ImportFormatError, format_for, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = "Create or update a user's products from a CSV or JSON Lines file, matched on SKU"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import")
+        parser.add_argument("--user", required=True, help="Username owning the products")
+        parser.add_argument("--format", dest="file_format", help="csv or jsonl (default: from the file extension)")
+        parser.add_argument("--batch-size", type=int, help="Rows per transaction (default: PRODUCT_IMPORT_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}.")
+        try:
+            file_format = format_for(options["path"], options["file_format"])
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+
+        with open(options["path"], "rb") as binary_file:
+            report = import_products(user, read_rows(binary_file, file_format), options["batch_size"])
+
+        for failure in report["errors"]:
+            self.stderr.write(f"line {failure['line']}: {failure['errors']}")
+        if report["failed"] > len(report["errors"]):
+            self.stderr.write(f"... and {report['failed'] - len(report['errors'])} more failed row(s).")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']}, updated {report['updated']}, failed {report['failed']} product(s)."
+        ))
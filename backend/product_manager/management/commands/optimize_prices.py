@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from product_manager.pricing import run_price_optimization
+
+
+class Command(BaseCommand):
+    help = (
+        "Set Product.optimized_price from the price elasticity fitted per category, resuming "
+        "the last run if it did not finish"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--restart", action="store_true",
+            help="Start a new run even if the last one did not finish",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=None,
+            help="Processes pricing categories side by side (default: PRICING_WORKERS)",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        run = run_price_optimization(restart=options["restart"], workers=options["workers"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Priced {run.products_priced} product(s), {run.products_updated} changed, "
+            f"in {time.perf_counter() - start:.1f} s."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from backend.search import registry
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product and order full-text search indexes from their tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Database alias to rebuild")
+
+    def handle(self, *args, **options):
+        for index in registry:
+            index.install(options["database"])
+            index.rebuild(options["database"])
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt search index for {index.table}."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from product_manager.models import StockReservation
+
+
+class Command(BaseCommand):
+    help = "Return the stock of expired reservation holds"
+
+    def handle(self, *args, **options):
+        released = StockReservation.objects.release_expired()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation(s)."))
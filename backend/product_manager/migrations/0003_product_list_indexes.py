@@ -0,0 +1,21 @@
+# Generated by Django 4.2.4 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_manager', '0002_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='product_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_by', 'category', '-created_at', '-id'], name='product_owner_cat_created_idx'),
+        ),
+    ]
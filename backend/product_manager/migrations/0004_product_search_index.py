@@ -0,0 +1,52 @@
+from django.db import migrations
+
+# Frozen copy of the DDL backend/search.py issued when this migration was
+# written; later changes to the index go in migrations of their own.
+INSTALL = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "product_manager_product_fts" USING fts5(name, description, content=\'product_manager_product\', content_rowid=\'rowid\', prefix=\'2 3\')',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_ai" AFTER INSERT ON "product_manager_product" BEGIN INSERT INTO "product_manager_product_fts"(rowid, name, description) VALUES (new.rowid, new.name, new.description); END',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_ad" AFTER DELETE ON "product_manager_product" BEGIN INSERT INTO "product_manager_product_fts"("product_manager_product_fts", rowid, name, description) VALUES (\'delete\', old.rowid, old.name, old.description); END',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_au" AFTER UPDATE OF name, description ON "product_manager_product" BEGIN INSERT INTO "product_manager_product_fts"("product_manager_product_fts", rowid, name, description) VALUES (\'delete\', old.rowid, old.name, old.description); INSERT INTO "product_manager_product_fts"(rowid, name, description) VALUES (new.rowid, new.name, new.description); END',
+        'INSERT INTO "product_manager_product_fts"("product_manager_product_fts") VALUES (\'rebuild\')',
+    ],
+    'postgresql': [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'ALTER TABLE "product_manager_product" ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (setweight(to_tsvector(\'simple\', coalesce(name, \'\')), \'A\') || setweight(to_tsvector(\'simple\', coalesce(description, \'\')), \'B\')) STORED',
+        'CREATE INDEX IF NOT EXISTS "product_manager_product_search_idx" ON "product_manager_product" USING GIN (search_vector)',
+        'CREATE INDEX IF NOT EXISTS "product_manager_product_trgm_idx" ON "product_manager_product" USING GIN ("name" gin_trgm_ops)',
+    ],
+}
+
+UNINSTALL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_ai"',
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_ad"',
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_au"',
+        'DROP TABLE IF EXISTS "product_manager_product_fts"',
+    ],
+    'postgresql': [
+        'ALTER TABLE "product_manager_product" DROP COLUMN IF EXISTS search_vector',
+        'DROP INDEX IF EXISTS "product_manager_product_trgm_idx"',
+    ],
+}
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements.get(vendor, []):
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_manager', '0003_product_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(INSTALL), _run(UNINSTALL)),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.4 on 2026-10-17 22:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_manager', '0007_demandforecastrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceOptimizationCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('stationary', 'Stationary'), ('electronics', 'Electronics'), ('clothing', 'Clothing'), ('books', 'Books'), ('home', 'Home & Garden'), ('sports', 'Sports'), ('other', 'Other')], max_length=50)),
+                ('elasticity', models.FloatField(blank=True, null=True)),
+                ('last_product_id', models.UUIDField(blank=True, null=True)),
+                ('products_priced', models.PositiveIntegerField(default=0)),
+                ('products_updated', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PriceOptimizationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('products_priced', models.PositiveIntegerField(default=0)),
+                ('products_updated', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'id'], name='product_category_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='priceoptimizationcategory',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to='product_manager.priceoptimizationrun'),
+        ),
+        migrations.AddConstraint(
+            model_name='priceoptimizationcategory',
+            constraint=models.UniqueConstraint(fields=('run', 'category'), name='price_run_category_uniq'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.4 on 2026-10-17 22:51
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+
+def _percent(numerator, denominator):
+    return Coalesce(
+        Round(Cast(numerator, FloatField()) * 100 / NullIf(Cast(denominator, FloatField()), Value(0.0)), 2),
+        Value(Decimal('0.00')),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def fill_metrics(apps, schema_editor):
+    Product = apps.get_model('product_manager', 'Product')
+    Product.objects.update(
+        profit_margin=_percent(F('selling_price') - F('cost_price'), F('cost_price')),
+        sell_through_rate=_percent(F('units_sold'), F('units_sold') + F('stock_available')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_manager', '0008_priceoptimization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='profit_margin',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sell_through_rate',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.RunPython(fill_metrics, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_by', 'profit_margin', 'id'], name='product_owner_margin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_by', 'sell_through_rate', 'id'], name='product_owner_sell_through_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_by', 'units_sold', 'id'], name='product_owner_units_sold_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-17 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_manager', '0009_product_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demandforecastrun',
+            name='day',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# The FTS5 table pointed at the implicit rowid of the model table, which
+# VACUUM may renumber as the table is keyed on a UUID. It is replaced by one
+# whose rows carry the primary key, mapped to FTS rowids by a keys table.
+# PostgreSQL indexes the table's own columns and is left as is.
+REKEY = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_ai"',
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_ad"',
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_au"',
+        'DROP TABLE IF EXISTS "product_manager_product_fts"',
+        'DROP TABLE IF EXISTS "product_manager_product_fts_keys"',
+        'CREATE TABLE IF NOT EXISTS "product_manager_product_fts_keys" (rowid INTEGER PRIMARY KEY, row_id TEXT NOT NULL UNIQUE)',
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "product_manager_product_fts" USING fts5(row_id UNINDEXED, name, description, prefix=\'2 3\')',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_ai" AFTER INSERT ON "product_manager_product" BEGIN INSERT INTO "product_manager_product_fts_keys"(row_id) VALUES (new.id); INSERT INTO "product_manager_product_fts"(rowid, row_id, name, description) VALUES (last_insert_rowid(), new.id, new.name, new.description); END',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_ad" AFTER DELETE ON "product_manager_product" BEGIN DELETE FROM "product_manager_product_fts" WHERE rowid = (SELECT rowid FROM "product_manager_product_fts_keys" WHERE row_id = old.id); DELETE FROM "product_manager_product_fts_keys" WHERE row_id = old.id; END',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_au" AFTER UPDATE OF name, description ON "product_manager_product" BEGIN UPDATE "product_manager_product_fts" SET name = new.name, description = new.description WHERE rowid = (SELECT rowid FROM "product_manager_product_fts_keys" WHERE row_id = old.id); END',
+        'INSERT INTO "product_manager_product_fts_keys"(row_id) SELECT id FROM "product_manager_product"',
+        'INSERT INTO "product_manager_product_fts"(rowid, row_id, name, description) SELECT k.rowid, k.row_id, t.name, t.description FROM "product_manager_product" t JOIN "product_manager_product_fts_keys" k ON k.row_id = t.id',
+    ],
+}
+
+RESTORE = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_ai"',
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_ad"',
+        'DROP TRIGGER IF EXISTS "product_manager_product_fts_au"',
+        'DROP TABLE IF EXISTS "product_manager_product_fts"',
+        'DROP TABLE IF EXISTS "product_manager_product_fts_keys"',
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "product_manager_product_fts" USING fts5(name, description, content=\'product_manager_product\', content_rowid=\'rowid\', prefix=\'2 3\')',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_ai" AFTER INSERT ON "product_manager_product" BEGIN INSERT INTO "product_manager_product_fts"(rowid, name, description) VALUES (new.rowid, new.name, new.description); END',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_ad" AFTER DELETE ON "product_manager_product" BEGIN INSERT INTO "product_manager_product_fts"("product_manager_product_fts", rowid, name, description) VALUES (\'delete\', old.rowid, old.name, old.description); END',
+        'CREATE TRIGGER IF NOT EXISTS "product_manager_product_fts_au" AFTER UPDATE OF name, description ON "product_manager_product" BEGIN INSERT INTO "product_manager_product_fts"("product_manager_product_fts", rowid, name, description) VALUES (\'delete\', old.rowid, old.name, old.description); INSERT INTO "product_manager_product_fts"(rowid, name, description) VALUES (new.rowid, new.name, new.description); END',
+        'INSERT INTO "product_manager_product_fts"("product_manager_product_fts") VALUES (\'rebuild\')',
+    ],
+}
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements.get(vendor, []):
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_manager', '0010_demandforecastrun_day'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(REKEY), _run(RESTORE)),
+    ]
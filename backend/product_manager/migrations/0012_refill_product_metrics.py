@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Cast, Coalesce, NullIf, Round, Sign
+
+
+def _percent(numerator, denominator):
+    # Whole hundredths of a percent, halves rounded away from zero as Python's ROUND_HALF_UP does
+    numerator = Cast(Round(numerator * 100), models.BigIntegerField())
+    denominator = NullIf(Cast(Round(denominator * 100), models.BigIntegerField()), Value(0))
+    hundredths = Sign(numerator) * ((Abs(numerator) * 20000 + denominator) / (denominator * 2))
+    return Coalesce(
+        Cast(hundredths, FloatField()) / Value(100.0),
+        Value(Decimal('0.00')),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def refill_metrics(apps, schema_editor):
+    """0009 filled the columns with floating point arithmetic, a cent off some halves"""
+    Product = apps.get_model('product_manager', 'Product')
+    Product.objects.update(
+        profit_margin=_percent(F('selling_price') - F('cost_price'), F('cost_price')),
+        sell_through_rate=_percent(F('units_sold'), F('units_sold') + F('stock_available')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_manager', '0011_product_search_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(refill_metrics, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,155 @@
-
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Abs, Cast, Coalesce, NullIf, Round, Sign
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 import uuid
 
+from backend.ids import uuid7
+from backend.response_cache import invalidate
+
+
+def percent(numerator, denominator):
+    """``numerator`` as a percentage of ``denominator``, to the cent; 0 if ``denominator`` is not positive"""
+    if denominator > 0:
+        return (Decimal(numerator) * 100 / Decimal(denominator)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+    return Decimal('0.00')
+
+
+def percent_expression(numerator, denominator):
+    """
+    ``percent`` in SQL, for updates that change its inputs in the database.
+    Worked in whole hundredths of a percent with integer division, so that it
+    rounds halves away from zero as ``percent`` does, where floating point
+    would land either side of them.
+    """
+    # Inputs have at most two decimal places
+    numerator = Cast(Round(numerator * 100), models.BigIntegerField())
+    denominator = NullIf(Cast(Round(denominator * 100), models.BigIntegerField()), Value(0))
+    hundredths = Sign(numerator) * ((Abs(numerator) * 20000 + denominator) / (denominator * 2))
+    return Coalesce(
+        Cast(hundredths, FloatField()) / Value(100.0),
+        Value(Decimal('0.00')),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def sell_through_rate_expression(units_sold=F('units_sold'), stock_available=F('stock_available')):
+    return percent_expression(units_sold, units_sold + stock_available)
+
+
+def profit_margin_expression():
+    return percent_expression(F('selling_price') - F('cost_price'), F('cost_price'))
+
+
+class DerivedDecimalField(models.DecimalField):
+    """
+    A column holding a function of other columns of the row, set from
+    ``derive(instance)`` whenever the instance is saved or bulk created, so
+    the database can filter, sort and index on it. Updates that change its
+    inputs in SQL set it with the matching expression.
+    """
+
+    def __init__(self, *args, derive=None, **kwargs):
+        self.derive = derive
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        # How it is derived is no concern of migrations
+        return name, 'django.db.models.DecimalField', args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = self.derive(model_instance)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class _StockShortage(Exception):
+    """Raised inside reserve_stock to roll back a partially applied UPDATE"""
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    Stock changes are applied with conditional UPDATEs (``stock_available >= qty``
+    is checked by the database), so concurrent checkouts can never oversell.
+    ``quantities`` is always a ``{product_id: quantity}`` mapping.
+    """
+
+    def _adjust_stock(self, quantities, stock_sign, sold_sign):
+        changes = {'updated_at': timezone.now()}
+        stock_available, units_sold = F('stock_available'), F('units_sold')
+        if stock_sign:
+            stock_available = changes['stock_available'] = Case(*[
+                When(id=product_id, then=F('stock_available') + stock_sign * quantity)
+                for product_id, quantity in quantities.items()
+            ])
+        if sold_sign:
+            units_sold = changes['units_sold'] = Case(*[
+                When(id=product_id, then=F('units_sold') + sold_sign * quantity)
+                for product_id, quantity in quantities.items()
+            ])
+        # From the new counts: the right-hand sides of an UPDATE all read the old row
+        changes['sell_through_rate'] = sell_through_rate_expression(units_sold, stock_available)
+        return changes
+
+    def refresh_metrics(self):
+        """Set the derived columns from the row's other columns, for writes that bypassed save()"""
+        return self.update(
+            profit_margin=profit_margin_expression(), sell_through_rate=sell_through_rate_expression(),
+        )
+
+    def reserve_stock(self, quantities, sell=True):
+        """
+        Take ``quantities`` out of stock, all lines or none.
+
+        Returns ``{product_id: units_available}`` for every line that could not be
+        served; an empty dict means the stock was taken. With ``sell`` the units
+        are also counted in ``units_sold``.
+        """
+        if not quantities:
+            return {}
+        in_stock = Q()
+        for product_id, quantity in quantities.items():
+            in_stock |= Q(id=product_id, stock_available__gte=quantity)
+        try:
+            with transaction.atomic():
+                updated = self.filter(in_stock).update(
+                    **self._adjust_stock(quantities, -1, 1 if sell else 0)
+                )
+                if updated != len(quantities):
+                    raise _StockShortage
+        except _StockShortage:
+            available = dict(
+                self.filter(id__in=list(quantities)).values_list('id', 'stock_available')
+            )
+            return {
+                product_id: available.get(product_id, 0)
+                for product_id, quantity in quantities.items()
+                if available.get(product_id, 0) < quantity
+            }
+        return {}
+
+    def release_stock(self, quantities, sell=True):
+        """Put ``quantities`` back in stock, undoing ``reserve_stock``"""
+        if not quantities:
+            return 0
+        return self.filter(id__in=list(quantities)).update(
+            **self._adjust_stock(quantities, 1, -1 if sell else 0)
+        )
+
+    def sell_held_stock(self, quantities):
+        """Count units already taken out of stock by a hold as sold"""
+        if not quantities:
+            return 0
+        return self.filter(id__in=list(quantities)).update(
+            **self._adjust_stock(quantities, 0, 1)
+        )
+
 
 class Product(models.Model):
     CATEGORY_CHOICES = [
@@ -16,11 +162,13 @@ class Product(models.Model):
         ('other', 'Other'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=255)
+    # Seller's own stock keeping unit, the key bulk imports match products on
+    sku = models.CharField(max_length=64, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
-    cost_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
-    selling_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0'))])
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0'))])
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='other')
     stock_available = models.PositiveIntegerField(default=0)
     units_sold = models.PositiveIntegerField(default=0)
@@ -29,7 +177,7 @@ class Product(models.Model):
         decimal_places=2, 
         null=True, 
         blank=True,
-        validators=[MinValueValidator(0), MaxValueValidator(5)]
+        validators=[MinValueValidator(Decimal('0')), MaxValueValidator(Decimal('5'))]
     )
     demand_forecast = models.PositiveIntegerField(null=True, blank=True)
     optimized_price = models.DecimalField(
@@ -37,20 +185,192 @@ class Product(models.Model):
         decimal_places=2, 
         null=True, 
         blank=True,
-        validators=[MinValueValidator(0)]
+        validators=[MinValueValidator(Decimal('0'))]
+    )
+    # Percentages kept in step with the columns they derive from, see DerivedDecimalField
+    profit_margin = DerivedDecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        derive=lambda product: percent(product.selling_price - product.cost_price, product.cost_price),
+    )
+    sell_through_rate = DerivedDecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        derive=lambda product: percent(product.units_sold, product.units_sold + product.stock_available),
     )
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='products')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Product list: per owner, newest first, optionally per category
+            models.Index(fields=['created_by', '-created_at', '-id'], name='product_owner_created_idx'),
+            models.Index(fields=['created_by', 'category', '-created_at', '-id'], name='product_owner_cat_created_idx'),
+            # Product list sorted by an analytics column, see product_list_query()
+            models.Index(fields=['created_by', 'profit_margin', 'id'], name='product_owner_margin_idx'),
+            models.Index(fields=['created_by', 'sell_through_rate', 'id'], name='product_owner_sell_through_idx'),
+            models.Index(fields=['created_by', 'units_sold', 'id'], name='product_owner_units_sold_idx'),
+            # Price optimization: a category at a time, in id order
+            models.Index(fields=['category', 'id'], name='product_category_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['created_by', 'sku'], name='product_owner_sku_uniq'),
+        ]
         
     def __str__(self):
         return self.name
+
+
+class StockReservationQuerySet(models.QuerySet):
+    def hold(self, user, quantities, ttl=None):
+        """
+        Set stock aside for ``user`` until the hold expires or is consumed.
+
+        Returns ``(token, expires_at, failures)``; ``failures`` is the
+        ``reserve_stock`` shortage report and ``token`` is None when it is not empty.
+        """
+        self.release_expired()
+        ttl = ttl or settings.STOCK_RESERVATION_TTL
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        with transaction.atomic():
+            failures = Product.objects.filter(created_by=user).reserve_stock(quantities, sell=False)
+            if failures:
+                return None, None, failures
+            invalidate(user.pk, 'products', 'orders')
+            token = uuid.uuid4()
+            self.bulk_create([
+                StockReservation(
+                    token=token,
+                    product_id=product_id,
+                    quantity=quantity,
+                    created_by=user,
+                    expires_at=expires_at,
+                )
+                for product_id, quantity in quantities.items()
+            ])
+        return token, expires_at, {}
+
+    def _claim(self, rows):
+        """
+        Delete the reservations ``rows`` (id, product id, quantity) and return the
+        quantities of those this call deleted, per product. A row another process
+        deleted first, having read it too, is that process's to account for.
+        """
+        quantities = {}
+        for reservation_id, product_id, quantity in rows:
+            if self.filter(pk=reservation_id).delete()[0]:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+
+    def consume(self, user, token):
+        """
+        Remove the live hold ``token`` and return the quantities it held, per product.
+        Stock held by it stays taken; the caller decides whether it is sold or released.
+        Two checkouts presenting the same token get its quantities once between them.
+        """
+        with transaction.atomic():
+            rows = list(
+                self.select_for_update().filter(created_by=user, token=token, expires_at__gt=timezone.now())
+                .values_list('id', 'product_id', 'quantity')
+            )
+            return self._claim(rows)
+
+    def release_expired(self, now=None):
+        """Return the stock of expired holds. Returns the number of holds released."""
+        now = now or timezone.now()
+        with transaction.atomic():
+            expired = list(
+                self.select_for_update().filter(expires_at__lte=now)
+                .values_list('id', 'product_id', 'quantity', 'created_by_id')
+            )
+            if not expired:
+                return 0
+            # A hold consumed by a checkout that read it just before it expired is sold
+            quantities = self._claim([row[:3] for row in expired])
+            Product.objects.release_stock(quantities, sell=False)
+            for user_id in {user_id for _, _, _, user_id in expired}:
+                invalidate(user_id, 'products', 'orders')
+        return len(expired)
+
+
+class StockReservation(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    token = models.UUIDField(db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_reservations')
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = StockReservationQuerySet.as_manager()
+    
+    def __str__(self):
+        return f"{self.product} x {self.quantity} until {self.expires_at}"
+
+
+class DemandForecastRun(models.Model):
+    """
+    One run of the demand forecast (see product_manager.forecasting). The last
+    finished run is the checkpoint: the next one only forecasts products with
+    sales since the start of its ``day``.
+    """
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # The day forecast from: the sales read end where it starts
+    day = models.DateField(blank=True, null=True)
+    full = models.BooleanField(default=False)
+    products_forecast = models.PositiveIntegerField(default=0)
+    products_updated = models.PositiveIntegerField(default=0)
     
-    @property
-    def profit_margin(self):
-        if self.cost_price > 0:
-            return ((self.selling_price - self.cost_price) / self.cost_price) * 100
-        return 0
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Forecast of {self.started_at:%Y-%m-%d %H:%M} ({self.products_updated} updated)"
+
+
+class PriceOptimizationRun(models.Model):
+    """
+    One run of the price optimization (see product_manager.pricing), done a
+    category at a time. A run that did not finish is resumed by the next one.
+    """
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    products_priced = models.PositiveIntegerField(default=0)
+    products_updated = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Price optimization of {self.started_at:%Y-%m-%d %H:%M} ({self.products_updated} updated)"
+
+
+class PriceOptimizationCategory(models.Model):
+    """
+    A category's progress in a price optimization run: the elasticity fitted
+    for it and the last product priced, committed with each chunk of prices.
+    """
+    run = models.ForeignKey(PriceOptimizationRun, on_delete=models.CASCADE, related_name='categories')
+    category = models.CharField(max_length=50, choices=Product.CATEGORY_CHOICES)
+    elasticity = models.FloatField(blank=True, null=True)
+    last_product_id = models.UUIDField(blank=True, null=True)
+    products_priced = models.PositiveIntegerField(default=0)
+    products_updated = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'category'], name='price_run_category_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_category_display()} in {self.run}"
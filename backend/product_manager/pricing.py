@@ -0,0 +1,219 @@
+"""
+Price optimization: ``Product.optimized_price`` from the prices products
+sold at.
+
+Demand is taken to have a constant price elasticity ``e`` (a 1% higher price
+sells ``e``% fewer units), fitted per category from the last
+PRICING_HISTORY_DAYS of order lines (cancelled orders left out): for each
+product and price it sold at, the log of the units per order line against
+the log of the price, compared within each product, so a category of cheap
+and dear products does not pass for a price sensitive one. Categories with
+little price variation lean on DEFAULT_ELASTICITY, and each product's own
+elasticity leans on its category's the same way.
+
+Under that demand the margin ``(p - cost) * units`` is highest at
+``cost * e / (e + 1)``. The price is then kept within
+PRICING_MAX_CHANGE_PERCENT of ``selling_price``, as the fit says little
+about prices far from those tried, and at least PRICING_MIN_MARGIN_PERCENT
+over ``cost_price``, which wins over the former.
+
+Each category is priced by one of PRICING_WORKERS processes, in id order,
+PRICING_CHUNK_SIZE products at a time: read, priced at once with NumPy, and
+the changed prices written with one executemany UPDATE, in a transaction
+that also records the last product priced (``PriceOptimizationCategory``).
+A run that stops part way (crash, deploy, Ctrl-C) is resumed by the next
+one from those checkpoints, with the elasticities it had fitted.
+"""
+import multiprocessing
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from backend.response_cache import invalidate
+from order_manager.models import OrderItem
+from .models import PriceOptimizationCategory, PriceOptimizationRun, Product
+
+# What a category without price variation is taken to have
+DEFAULT_ELASTICITY = -1.5
+# Weight of the prior elasticity, as much as the (log) price variation of
+# about a hundred order lines at prices 10% apart
+PRIOR_WEIGHT = 1.0
+# The margin has no maximum for less elastic demand; at this the price is 11x the cost
+MAX_ELASTICITY = -1.1
+
+
+def price_moments(sale_products, sale_prices, sale_units, sale_lines, products):
+    """
+    Each product's within-product covariance of log units per line with log
+    price, and variance of log price, weighted by order lines, as arrays.
+
+    ``sale_products``, ``sale_prices``, ``sale_units`` and ``sale_lines`` are
+    parallel arrays, one entry per product and price it sold at: the
+    product's index, the price, the units and the order lines.
+    """
+    lines = np.asarray(sale_lines, dtype=np.float64)
+    x = np.log(np.asarray(sale_prices, dtype=np.float64))
+    y = np.log(np.asarray(sale_units, dtype=np.float64) / lines)
+    weight = np.bincount(sale_products, weights=lines, minlength=products)
+    seen = weight > 0
+    x_mean = np.divide(
+        np.bincount(sale_products, weights=lines * x, minlength=products), weight,
+        out=np.zeros(products), where=seen,
+    )
+    y_mean = np.divide(
+        np.bincount(sale_products, weights=lines * y, minlength=products), weight,
+        out=np.zeros(products), where=seen,
+    )
+    dx = x - x_mean[sale_products]
+    dy = y - y_mean[sale_products]
+    return (
+        np.bincount(sale_products, weights=lines * dx * dy, minlength=products),
+        np.bincount(sale_products, weights=lines * dx * dx, minlength=products),
+    )
+
+
+def elasticity(covariance, variance, prior):
+    """The least squares slope of log units on log price, shrunk towards ``prior``"""
+    return (covariance + PRIOR_WEIGHT * prior) / (variance + PRIOR_WEIGHT)
+
+
+def optimal_prices(cost, selling, elasticities, min_margin, max_change):
+    """
+    Margin maximizing prices in cents, as an int64 array, for arrays of
+    ``cost`` and ``selling`` prices; ``min_margin`` and ``max_change`` are
+    fractions (0.1 is 10%).
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    selling = np.asarray(selling, dtype=np.float64)
+    e = np.minimum(elasticities, MAX_ELASTICITY)
+    prices = np.clip(cost * e / (e + 1), selling * (1 - max_change), selling * (1 + max_change))
+    # Rounded first so 2.00 * 1.1 does not come out a cent up
+    floor = np.ceil(np.round(cost * (1 + min_margin) * 100, 6))
+    return np.maximum(np.rint(prices * 100), floor).astype(np.int64)
+
+
+def _cents(value):
+    return -1 if value is None else int(value * 100)
+
+
+def load_history(category, since):
+    """
+    ``{product id: index}`` and the arrays ``price_moments`` takes, for the
+    products of ``category`` that sold since ``since``
+    """
+    sales = (
+        OrderItem.objects
+        .filter(product__category=category, order__created_at__gte=since, unit_price__gt=0)
+        .exclude(order__status='cancelled')
+        .values_list('product_id', 'unit_price')
+        .annotate(units=Sum('quantity'), lines=Count('id'))
+        .order_by()
+    )
+    index, sale_products, sale_prices, sale_units, sale_lines = {}, [], [], [], []
+    for product_id, unit_price, units, lines in sales.iterator(chunk_size=10000):
+        sale_products.append(index.setdefault(product_id, len(index)))
+        sale_prices.append(unit_price)
+        sale_units.append(units)
+        sale_lines.append(lines)
+    return index, (
+        np.array(sale_products, dtype=np.int64), np.array(sale_prices, dtype=np.float64),
+        np.array(sale_units, dtype=np.float64), np.array(sale_lines, dtype=np.float64),
+    )
+
+
+def write_prices(ids, cents):
+    """Set ``optimized_price`` of products ``ids`` to ``cents`` / 100, with one executemany"""
+    pk = Product._meta.pk
+    field = Product._meta.get_field('optimized_price')
+    quote = connection.ops.quote_name
+    sql = f'UPDATE {quote(Product._meta.db_table)} SET {quote(field.column)} = %s WHERE {quote(pk.column)} = %s'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (field.get_db_prep_save(Decimal(value).scaleb(-2), connection), pk.get_db_prep_value(product_id, connection))
+            for product_id, value in zip(ids, cents.tolist())
+        ])
+
+
+def price_category(progress_id):
+    """
+    Price the products of a run's category from where it left off; returns
+    how many products it priced and updated in all
+    """
+    progress = PriceOptimizationCategory.objects.select_related('run').get(pk=progress_id)
+    index, sales = load_history(
+        progress.category, progress.run.started_at - timedelta(days=settings.PRICING_HISTORY_DAYS)
+    )
+    covariance, variance = price_moments(*sales, len(index))
+    if progress.elasticity is None:
+        progress.elasticity = float(elasticity(covariance.sum(), variance.sum(), DEFAULT_ELASTICITY))
+        progress.save(update_fields=['elasticity'])
+    product_elasticities = np.append(elasticity(covariance, variance, progress.elasticity), progress.elasticity)
+
+    products = Product.objects.filter(category=progress.category).order_by('id')
+    while True:
+        chunk = products
+        if progress.last_product_id is not None:
+            chunk = chunk.filter(id__gt=progress.last_product_id)
+        rows = list(chunk.values_list(
+            'id', 'created_by_id', 'cost_price', 'selling_price', 'optimized_price'
+        )[:settings.PRICING_CHUNK_SIZE])
+        if not rows:
+            break
+        ids, owners, cost, selling, current = zip(*rows)
+        # Products without sales take the category's elasticity, the last entry
+        positions = np.array([index.get(product_id, -1) for product_id in ids])
+        cents = optimal_prices(
+            cost, selling, product_elasticities[positions],
+            settings.PRICING_MIN_MARGIN_PERCENT / 100, settings.PRICING_MAX_CHANGE_PERCENT / 100,
+        )
+        changed = np.flatnonzero(cents != np.array([_cents(value) for value in current]))
+
+        with transaction.atomic():
+            write_prices([ids[i] for i in changed], cents[changed])
+            for owner_id in {owners[i] for i in changed.tolist()}:
+                invalidate(owner_id, 'products')
+            progress.last_product_id = ids[-1]
+            progress.products_priced += len(ids)
+            progress.products_updated += len(changed)
+            progress.save(update_fields=['last_product_id', 'products_priced', 'products_updated'])
+
+    progress.finished_at = timezone.now()
+    progress.save(update_fields=['finished_at'])
+    return progress.products_priced, progress.products_updated
+
+
+def run_price_optimization(restart=False, workers=None):
+    """
+    Price every product, resuming the last unfinished run unless ``restart``;
+    returns the finished run
+    """
+    run = None if restart else PriceOptimizationRun.objects.filter(finished_at__isnull=True).first()
+    if run is None:
+        with transaction.atomic():
+            run = PriceOptimizationRun.objects.create()
+            PriceOptimizationCategory.objects.bulk_create([
+                PriceOptimizationCategory(run=run, category=category) for category, _ in Product.CATEGORY_CHOICES
+            ])
+    pending = list(run.categories.filter(finished_at__isnull=True).values_list('pk', flat=True))
+
+    workers = min(workers or settings.PRICING_WORKERS, len(pending))
+    if workers > 1:
+        # Each process opens its own connection
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            pool.map(price_category, pending, chunksize=1)
+    else:
+        for progress_id in pending:
+            price_category(progress_id)
+
+    totals = run.categories.aggregate(priced=Sum('products_priced'), updated=Sum('products_updated'))
+    run.products_priced = totals['priced'] or 0
+    run.products_updated = totals['updated'] or 0
+    run.finished_at = timezone.now()
+    run.save()
+    return run
@@ -0,0 +1,4 @@
+from backend.search import SearchIndex
+from .models import Product
+
+product_search = SearchIndex(Product, ['name', 'description'], weights=[10.0, 1.0])
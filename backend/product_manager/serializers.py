@@ -1,16 +1,94 @@
+from django.conf import settings
 from rest_framework import serializers
+
+from backend.fast_serializers import (
+    compile_rows_serializer, datetime_to_string, decimal_to_string, nullable,
+)
 from .models import Product
 
 class ProductSerializer(serializers.ModelSerializer):
+    # Numbers, as they were when profit_margin was a property, but rounded to two
+    # decimal places now that it is a stored column
     profit_margin = serializers.ReadOnlyField()
+    sell_through_rate = serializers.ReadOnlyField()
     
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'cost_price', 'selling_price', 
+            'id', 'name', 'sku', 'description', 'cost_price', 'selling_price', 
             'category', 'stock_available', 'units_sold', 'customer_rating',
             'demand_forecast', 'optimized_price', 'profit_margin', 
-            'created_at', 'updated_at'
+            'sell_through_rate', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'profit_margin']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'profit_margin', 'sell_through_rate']
+    
+    def validate_sku(self, value):
+        # Blank is "no SKU"; the owner is passed in the context by the views
+        if not value:
+            return None
+        owner = self.context.get('owner')
+        if owner is not None:
+            duplicates = Product.objects.filter(created_by=owner, sku=value)
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError("You already have a product with this SKU.")
+        return value
+
+
+PRODUCT_VALUES = [
+    'id', 'name', 'sku', 'description', 'cost_price', 'selling_price', 'category', 'stock_available',
+    'units_sold', 'customer_rating', 'demand_forecast', 'optimized_price', 'profit_margin',
+    'sell_through_rate', 'created_at', 'updated_at',
+]
+
+# Read-only twin of ProductSerializer over Product.objects.values(*PRODUCT_VALUES) rows
+serialize_product_rows = compile_rows_serializer([
+    ('id', 'id', str),
+    ('name', 'name', None),
+    ('sku', 'sku', None),
+    ('description', 'description', None),
+    ('cost_price', 'cost_price', decimal_to_string(10, 2)),
+    ('selling_price', 'selling_price', decimal_to_string(10, 2)),
+    ('category', 'category', None),
+    ('stock_available', 'stock_available', None),
+    ('units_sold', 'units_sold', None),
+    ('customer_rating', 'customer_rating', nullable(decimal_to_string(3, 2))),
+    ('demand_forecast', 'demand_forecast', None),
+    ('optimized_price', 'optimized_price', nullable(decimal_to_string(10, 2))),
+    ('profit_margin', 'profit_margin', None),
+    ('sell_through_rate', 'sell_through_rate', None),
+    ('created_at', 'created_at', datetime_to_string),
+    ('updated_at', 'updated_at', datetime_to_string),
+])
+
 
+def quantities_by_product(items):
+    """Merge validated stock lines into a ``{product_id: quantity}`` mapping"""
+    quantities = {}
+    for item in items:
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    return quantities
+
+
+class StockLineSerializer(serializers.Serializer):
+    product_id = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class StockReservationSerializer(serializers.Serializer):
+    items = StockLineSerializer(many=True)
+    ttl_seconds = serializers.IntegerField(min_value=1, required=False)
+    
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one item is required.")
+        return value
+    
+    def validate_ttl_seconds(self, value):
+        # Read here, not at import, so the setting can change; past it stock would be held for good
+        if value > settings.STOCK_RESERVATION_MAX_TTL:
+            raise serializers.ValidationError(
+                f"Ensure this value is less than or equal to {settings.STOCK_RESERVATION_MAX_TTL}."
+            )
+        return value
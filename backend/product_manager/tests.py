@@ -1,3 +1,866 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from backend.ids import uuid7
+from backend.renderers import FastJSONRenderer
+from backend.search import _like_escape
+from order_manager.models import Order, OrderItem
+from .forecasting import daily_rates, forecast, run_forecast
+from .management.commands.benchmark_forecasting import _forecast_per_product
+from .models import (
+    DemandForecastRun, PriceOptimizationRun, Product, StockReservation, StockReservationQuerySet,
+)
+from .pricing import (
+    DEFAULT_ELASTICITY, elasticity, optimal_prices, price_moments, run_price_optimization, write_prices,
+)
+from .search import product_search
+from .serializers import PRODUCT_VALUES, ProductSerializer, serialize_product_rows
+
+
+def make_product(user, stock=10, **kwargs):
+    return Product.objects.create(
+        name=kwargs.pop('name', 'Notebook'),
+        cost_price=kwargs.pop('cost_price', Decimal('2.00')),
+        selling_price=kwargs.pop('selling_price', Decimal('5.00')),
+        stock_available=stock,
+        created_by=user,
+        **kwargs
+    )
+
+
+class TimeOrderedIdTests(TestCase):
+    def test_ids_are_version_7_and_increasing(self):
+        ids = [uuid7() for _ in range(10000)]
+
+        self.assertEqual({value.version for value in ids}, {7})
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_new_products_get_time_ordered_ids(self):
+        user = User.objects.create_user(username='seller', password='secret-pass')
+        first, second = make_product(user), make_product(user)
+
+        self.assertEqual(first.id.version, 7)
+        self.assertLess(first.id.hex, second.id.hex)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+
+    def test_reserve_stock_takes_all_lines(self):
+        first, second = make_product(self.user, 5), make_product(self.user, 5)
+        failures = Product.objects.reserve_stock({first.id: 2, second.id: 5})
+
+        self.assertEqual(failures, {})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock_available, first.units_sold), (3, 2))
+        self.assertEqual((second.stock_available, second.units_sold), (0, 5))
+
+    def test_reserve_stock_reports_short_lines_and_changes_nothing(self):
+        first, second = make_product(self.user, 5), make_product(self.user, 1)
+        failures = Product.objects.reserve_stock({first.id: 2, second.id: 3})
+
+        self.assertEqual(failures, {second.id: 1})
+        first.refresh_from_db()
+        self.assertEqual((first.stock_available, first.units_sold), (5, 0))
+
+    def test_release_stock_undoes_reserve(self):
+        product = make_product(self.user, 5)
+        Product.objects.reserve_stock({product.id: 4})
+        Product.objects.release_stock({product.id: 4})
+
+        product.refresh_from_db()
+        self.assertEqual((product.stock_available, product.units_sold), (5, 0))
+
+    def test_hold_sets_stock_aside_until_consumed(self):
+        product = make_product(self.user, 5)
+        token, _, failures = StockReservation.objects.hold(self.user, {product.id: 3})
+
+        self.assertEqual(failures, {})
+        product.refresh_from_db()
+        self.assertEqual((product.stock_available, product.units_sold), (2, 0))
+        self.assertEqual(StockReservation.objects.consume(self.user, token), {product.id: 3})
+        self.assertEqual(StockReservation.objects.consume(self.user, token), {})
+
+    def test_expired_holds_return_to_stock(self):
+        product = make_product(self.user, 5)
+        token, _, _ = StockReservation.objects.hold(self.user, {product.id: 3}, ttl=60)
+
+        self.assertEqual(StockReservation.objects.release_expired(), 0)
+        released = StockReservation.objects.release_expired(now=timezone.now() + timedelta(seconds=61))
+        self.assertEqual(released, 1)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_available, 5)
+        self.assertEqual(StockReservation.objects.consume(self.user, token), {})
+
+    def test_hold_taken_by_another_process_after_reading_it_is_not_held(self):
+        product = make_product(self.user, 5)
+        token, _, _ = StockReservation.objects.hold(self.user, {product.id: 3}, ttl=60)
+        claim = StockReservationQuerySet._claim
+
+        def taken_first(queryset, rows):
+            # Another process deletes the rows between this one's read and delete
+            StockReservation.objects.filter(pk__in=[row[0] for row in rows]).delete()
+            return claim(queryset, rows)
+
+        with mock.patch.object(StockReservationQuerySet, '_claim', autospec=True, side_effect=taken_first):
+            self.assertEqual(StockReservation.objects.consume(self.user, token), {})
+            StockReservation.objects.hold(self.user, {product.id: 1}, ttl=60)
+            StockReservation.objects.release_expired(now=timezone.now() + timedelta(seconds=61))
+        product.refresh_from_db()
+        # Neither is given back to stock by the losing side
+        self.assertEqual(product.stock_available, 1)
+
+
+class ReserveEndpointTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def test_reserve_returns_token(self):
+        product = make_product(self.user, 5)
+        response = self.client.post('/product/reserve/', {
+            'items': [{'product_id': str(product.id), 'quantity': 2}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(StockReservation.objects.filter(token=response.data['data']['reservation']).exists())
+
+    def test_reserve_reports_failed_lines(self):
+        product = make_product(self.user, 1)
+        response = self.client.post('/product/reserve/', {
+            'items': [{'product_id': str(product.id), 'quantity': 2}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors']['lines'][0]['available'], 1)
+
+    @override_settings(STOCK_RESERVATION_MAX_TTL=3600)
+    def test_reserve_rejects_ttl_over_the_maximum(self):
+        product = make_product(self.user, 5)
+        for ttl in (3601, 10 ** 12):
+            response = self.client.post('/product/reserve/', {
+                'items': [{'product_id': str(product.id), 'quantity': 2}], 'ttl_seconds': ttl,
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('ttl_seconds', response.data['errors'])
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class ProductListPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def walk(self, params):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get('/product/', {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['data']]
+            cursor = response.data['meta']['next']
+            if not cursor:
+                return seen
+
+    @override_settings(API_PAGE_SIZE=2, API_MAX_PAGE_SIZE=3)
+    def test_lists_are_paged_by_default_and_bounded(self):
+        for i in range(5):
+            make_product(self.user, name=f'Pen {i}')
+
+        response = self.client.get('/product/')
+        self.assertEqual(len(response.data['data']), 2)
+        self.assertIsNotNone(response.data['meta']['next'])
+        self.assertEqual(len(self.client.get('/product/', {'page_size': 1000}).data['data']), 3)
+        self.assertEqual(len(self.walk({})), 5)
+
+    def test_pages_cover_every_row_once_in_order(self):
+        products = [make_product(self.user, name=f'Pen {i}') for i in range(7)]
+        # Ties on created_at are broken by id
+        Product.objects.filter(pk__in=[p.pk for p in products[:4]]).update(created_at=timezone.now())
+
+        seen = self.walk({'page_size': 3})
+
+        expected = Product.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, [str(pk) for pk in expected])
+
+    def test_filters_apply_across_pages(self):
+        for i in range(5):
+            make_product(self.user, name=f'Book {i}', category='books')
+        make_product(self.user, name='Lamp', category='home')
+
+        self.assertEqual(len(self.walk({'page_size': 2, 'category': 'books'})), 5)
+        self.assertEqual(len(self.walk({'page_size': 2, 'search': 'lamp'})), 1)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/product/', {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_sorts_and_filters_on_analytics_columns(self):
+        low = make_product(self.user, name='Low', cost_price=Decimal('10.00'), selling_price=Decimal('10.50'), units_sold=10)
+        thin = make_product(self.user, name='Thin', cost_price=Decimal('10.00'), selling_price=Decimal('10.80'), units_sold=30)
+        make_product(self.user, name='Wide', cost_price=Decimal('10.00'), selling_price=Decimal('15.00'), units_sold=100)
+        more_thin = [
+            make_product(self.user, name=f'Thin {i}', cost_price=Decimal('1.00'), selling_price=Decimal('1.05'), units_sold=10)
+            for i in range(3)
+        ]
+
+        # Margin under 10%, best sellers first: ties on units_sold are broken by id
+        seen = self.walk({'profit_margin__lt': 10, 'ordering': '-units_sold', 'page_size': 2})
+        expected = [thin.id, *sorted([low.id, *(p.id for p in more_thin)], reverse=True)]
+        self.assertEqual(seen, [str(pk) for pk in expected])
+
+        rows = self.client.get('/product/', {'ordering': 'profit_margin', 'profit_margin__gte': 5}).data['data']
+        self.assertEqual([row['name'] for row in rows], ['Low', 'Thin 0', 'Thin 1', 'Thin 2', 'Thin', 'Wide'])
+        self.assertEqual([row['profit_margin'] for row in rows], [5.0, 5.0, 5.0, 5.0, 8.0, 50.0])
+        self.assertEqual(len(self.walk({'sell_through_rate__gte': 50, 'units_sold__lte': 30})), 5)
+
+    def test_invalid_ordering_and_ranges_are_rejected(self):
+        response = self.client.get('/product/', {'ordering': 'cost', 'profit_margin__lt': 'abc', 'units_sold__gt': 'NaN'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errors']), {'ordering', 'profit_margin__lt', 'units_sold__gt'})
+
+
+class ProductMetricsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def metrics(self, product):
+        product.refresh_from_db()
+        return product.profit_margin, product.sell_through_rate
+
+    def test_columns_follow_saves_and_stock_changes(self):
+        product = make_product(self.user, stock=10)
+        self.assertEqual(self.metrics(product), (Decimal('150.00'), Decimal('0.00')))
+
+        Product.objects.reserve_stock({product.id: 3})
+        self.assertEqual(self.metrics(product), (Decimal('150.00'), Decimal('30.00')))
+        Product.objects.release_stock({product.id: 1})
+        self.assertEqual(self.metrics(product), (Decimal('150.00'), Decimal('20.00')))
+        # Held, not sold
+        Product.objects.reserve_stock({product.id: 8}, sell=False)
+        self.assertEqual(self.metrics(product), (Decimal('150.00'), Decimal('100.00')))
+
+        response = self.client.put(f'/product/{product.id}/', {'selling_price': '3.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['profit_margin'], Decimal('50.00'))
+        product.cost_price = Decimal('0.00')
+        product.save()
+        self.assertEqual(self.metrics(product)[0], Decimal('0.00'))
+
+    def test_database_and_python_compute_the_same(self):
+        product = make_product(self.user, stock=2, units_sold=1, cost_price=Decimal('3.00'), selling_price=Decimal('4.00'))
+        saved = self.metrics(product)
+        Product.objects.filter(pk=product.pk).refresh_metrics()
+        self.assertEqual(self.metrics(product), saved)
+        self.assertEqual(saved, (Decimal('33.33'), Decimal('33.33')))
+
+    def test_database_and_python_round_halves_alike(self):
+        for cost_price, selling_price, stock, units_sold, expected in [
+            ('8.00', '8.01', 19799, 201, (Decimal('0.13'), Decimal('1.01'))),
+            ('8.00', '7.99', 1999, 1, (Decimal('-0.13'), Decimal('0.05'))),
+            ('0.08', '0.09', 7, 1, (Decimal('12.50'), Decimal('12.50'))),
+        ]:
+            product = make_product(
+                self.user, stock=stock, units_sold=units_sold,
+                cost_price=Decimal(cost_price), selling_price=Decimal(selling_price),
+            )
+            self.assertEqual(self.metrics(product), expected)
+            Product.objects.filter(pk=product.pk).refresh_metrics()
+            self.assertEqual(self.metrics(product), expected)
+
+    def test_bulk_writes_set_the_columns(self):
+        [created] = Product.objects.bulk_create([Product(
+            name='Mug', sku='MUG-1', cost_price=Decimal('4.00'), selling_price=Decimal('5.00'),
+            stock_available=5, units_sold=5, created_by=self.user,
+        )])
+        self.assertEqual(self.metrics(created), (Decimal('25.00'), Decimal('50.00')))
+
+        # Only one of the counts: the other is read from the row
+        line = {'sku': 'MUG-1', 'name': 'Mug', 'cost_price': '2.00', 'selling_price': '3.00', 'stock_available': 15}
+        self.client.post('/product/import/', {
+            'file': SimpleUploadedFile('catalog.jsonl', json.dumps(line).encode()),
+        }, format='multipart')
+        self.assertEqual(self.metrics(created), (Decimal('50.00'), Decimal('25.00')))
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def test_list_and_retrieve_match_the_viewset(self):
+        products = [make_product(self.user, name=f'Lamp {i}', category='home') for i in range(3)]
+        for path in [
+            '/product/', '/product/?page_size=2', '/product/?search=lamp&page_size=1', '/product/?category=books',
+            f'/product/{products[0].id}/', f'/product/{uuid7()}/',
+        ]:
+            sync = self.client.get(path)
+            with self.settings(ROOT_URLCONF='backend.async_urls'):
+                response = self.client.get(path)
+            self.assertEqual((response.status_code, response.content), (sync.status_code, sync.content), path)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        response = self.client.get('/product/', {'search': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def names(self, text):
+        return [row['name'] for row in self.search(text).data['data']]
+
+    def test_prefix_terms_must_all_match(self):
+        make_product(self.user, name='Gaming Laptop', description='Fast and light')
+        make_product(self.user, name='Laptop Sleeve')
+        make_product(self.user, name='Desk Lamp')
+
+        self.assertEqual(sorted(self.names('lapt')), ['Gaming Laptop', 'Laptop Sleeve'])
+        self.assertEqual(self.names('lap fast'), ['Gaming Laptop'])
+        self.assertEqual(self.names('%'), [])
+
+    def test_name_matches_rank_above_description_matches(self):
+        make_product(self.user, name='Notebook', description='Spiral bound, goes with any pen')
+        make_product(self.user, name='Fountain Pen', description='Steel nib')
+
+        self.assertEqual(self.names('pen'), ['Fountain Pen', 'Notebook'])
+
+    def test_index_follows_updates_and_deletes(self):
+        product = make_product(self.user, name='Old Name')
+        self.client.put(f'/product/{product.id}/', {'name': 'Brand New'}, format='json')
+
+        self.assertEqual(self.names('old'), [])
+        self.assertEqual(self.names('brand'), ['Brand New'])
+        self.client.delete(f'/product/{product.id}/')
+        self.assertEqual(self.names('brand'), [])
+
+    def test_index_survives_renumbered_rowids(self):
+        product = make_product(self.user, name='Pencil Case')
+        make_product(self.user, name='Pencil Sharpener')
+        # What VACUUM may do to a table without an INTEGER PRIMARY KEY
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE product_manager_product SET rowid = rowid + 1000')
+
+        self.assertEqual(sorted(self.names('pencil')), ['Pencil Case', 'Pencil Sharpener'])
+        self.client.delete(f'/product/{product.id}/')
+        self.assertEqual(self.names('pencil'), ['Pencil Sharpener'])
+
+    def test_like_patterns_are_escaped(self):
+        self.assertEqual(_like_escape('50%_off\\'), '50\\%\\_off\\\\')
+
+    def test_search_results_paginate(self):
+        for i in range(5):
+            make_product(self.user, name=f'Marker {i}')
+
+        first = self.search('marker', page_size=3)
+        second = self.search('marker', page_size=3, cursor=first.data['meta']['next'])
+
+        ids = [row['id'] for row in first.data['data'] + second.data['data']]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertIsNone(second.data['meta']['next'])
+
+    def test_other_users_products_are_not_searched(self):
+        other = User.objects.create_user(username='other', password='secret-pass')
+        make_product(other, name='Stapler')
+
+        self.assertEqual(self.names('stapler'), [])
+
+    def test_rebuild_command_restores_index(self):
+        make_product(self.user, name='Ruler')
+        product_search.uninstall()
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        self.assertEqual(self.names('rul'), ['Ruler'])
+
+
+class ProductListCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_is_served_from_cache(self):
+        make_product(self.user)
+        first = self.client.get('/product/', {'category': 'all'})
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/product/', {'category': 'all'})
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get('/product/')['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_invalidate(self):
+        product = make_product(self.user, stock=5)
+        etag = self.client.get('/product/')['ETag']
+
+        self.client.put(f'/product/{product.id}/', {'name': 'Renamed'}, format='json')
+        response = self.client.get('/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data'][0]['name'], 'Renamed')
+
+        etag = response['ETag']
+        StockReservation.objects.hold(self.user, {product.id: 2})
+        response = self.client.get('/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['data'][0]['stock_available'], 3)
+
+    def test_writes_in_another_worker_invalidate(self):
+        make_product(self.user)
+        etag = self.client.get('/product/')['ETag']
+
+        # Another process sees the same versions, not this one's cached entries
+        versions = settings.CACHES[settings.RESPONSE_VERSION_CACHE_ALIAS]
+        other_worker = import_string(versions['BACKEND'])(versions['LOCATION'], {})
+        Product.objects.filter(created_by=self.user).update(name='Renamed')
+        other_worker.set(f'response-version:{self.user.pk}:products', time.time_ns(), timeout=None)
+
+        response = self.client.get('/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data'][0]['name'], 'Renamed')
+
+    def test_users_do_not_share_entries(self):
+        make_product(self.user)
+        self.client.get('/product/')
+        other = User.objects.create_user(username='other', password='secret-pass')
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get('/product/').data['data'], [])
+
+
+class FastSerializationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+
+    def test_product_rows_render_like_product_serializer(self):
+        make_product(self.user)
+        make_product(self.user, cost_price=Decimal('0.00'), description=None)
+        make_product(
+            self.user, name='Caf\u00e9 \u2028 "quoted" \U0001F600', description='line\nbreak\u2029',
+            cost_price=Decimal('3.00'), selling_price=Decimal('3.01'), customer_rating=Decimal('4.5'),
+            demand_forecast=12, optimized_price=Decimal('7.10'), category='books',
+        )
+        make_product(self.user, cost_price=Decimal('99999999.99'), selling_price=Decimal('0.01'))
+        products = Product.objects.filter(created_by=self.user)
+
+        expected = JSONRenderer().render(ProductSerializer(products, many=True).data)
+        actual = FastJSONRenderer().render(serialize_product_rows(list(products.values(*PRODUCT_VALUES))))
+        self.assertEqual(actual, expected)
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'decimals': [Decimal('1E-8'), Decimal('150'), Decimal('0.1'), Decimal('-2.50')],
+            'moment': timezone.now(),
+            'day': timezone.now().date(),
+            'id': make_product(self.user).id,
+            'text': '\u2028\u2029 \u00e9 </script>',
+            'numbers': [1, 2.5, 1e20, -0.0, True, None],
+            'large': 2 ** 70,
+            1: 'integer key',
+        }
+        for value in (data, [], {}, 'plain', None):
+            self.assertEqual(FastJSONRenderer().render(value), JSONRenderer().render(value))
+
+
+class BulkImportExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content, **data):
+        return self.client.post('/product/import/', {
+            'file': SimpleUploadedFile(name, content.encode()), **data,
+        }, format='multipart')
+
+    def test_csv_import_upserts_on_sku_and_reports_bad_rows(self):
+        make_product(self.user, name='Old Pen', sku='PEN-1', stock=3)
+        response = self.upload('catalog.csv', (
+            'sku,name,cost_price,selling_price,category,stock_available,customer_rating\n'
+            'PEN-1,Gel Pen,1.00,2.50,books,40,\n'
+            'LAMP-1,Desk Lamp,10.00,25.00,home,5,4.5\n'
+            'BAD-1,Broken,abc,2.00,books,1,\n'
+            ',No Sku,1.00,2.00,books,1,\n'
+            'LAMP-1,Desk Lamp XL,10.00,30.00,home,6,\n'
+        ))
+
+        self.assertEqual(response.status_code, 200)
+        report = response.data['data']
+        self.assertEqual((report['created'], report['updated'], report['failed']), (1, 1, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [4, 5])
+        self.assertIn('cost_price', report['errors'][0]['errors'])
+        pen = Product.objects.get(created_by=self.user, sku='PEN-1')
+        self.assertEqual((pen.name, pen.stock_available, pen.category), ('Gel Pen', 40, 'books'))
+        lamp = Product.objects.get(created_by=self.user, sku='LAMP-1')
+        self.assertEqual((lamp.name, lamp.selling_price, lamp.customer_rating), ('Desk Lamp XL', Decimal('30.00'), None))
+        self.assertEqual(self.client.get('/product/', {'search': 'lamp'}).data['data'][0]['sku'], 'LAMP-1')
+
+    def test_jsonl_import_only_updates_given_columns(self):
+        make_product(self.user, name='Mug', sku='MUG-1', stock=7, description='Ceramic')
+        lines = [
+            {'sku': 'MUG-1', 'name': 'Mug', 'cost_price': '2.00', 'selling_price': '6.00'},
+            {'sku': 'CUP-1', 'name': 'Cup', 'cost_price': '1.00', 'selling_price': '3.00', 'stock_available': 2},
+        ]
+        content = '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n'
+        report = self.upload('catalog.jsonl', content).data['data']
+
+        self.assertEqual((report['created'], report['updated'], report['failed']), (1, 1, 1))
+        mug = Product.objects.get(sku='MUG-1')
+        self.assertEqual((mug.selling_price, mug.stock_available, mug.description), (Decimal('6.00'), 7, 'Ceramic'))
+
+    def test_import_rejects_unknown_format(self):
+        response = self.upload('catalog.xlsx', 'sku,name')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file_format', response.data['errors'])
+
+    def test_other_users_skus_are_not_touched(self):
+        other = User.objects.create_user(username='other', password='secret-pass')
+        make_product(other, name='Theirs', sku='SKU-1')
+        self.upload('catalog.csv', 'sku,name,cost_price,selling_price\nSKU-1,Mine,1.00,2.00\n')
+
+        self.assertEqual(Product.objects.get(created_by=other).name, 'Theirs')
+        self.assertEqual(Product.objects.get(created_by=self.user).name, 'Mine')
+
+    def test_duplicate_sku_is_rejected_on_create(self):
+        make_product(self.user, sku='SKU-1')
+        response = self.client.post('/product/', {
+            'name': 'Copy', 'sku': 'SKU-1', 'cost_price': '1.00', 'selling_price': '2.00',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sku', response.data['errors'])
+
+    def test_export_streams_every_product_and_reimports(self):
+        for i in range(5):
+            make_product(self.user, name=f'Item, "{i}"', sku=f'SKU-{i}', description=None if i % 2 else 'Line\nbreak')
+        response = self.client.get('/product/export/', {'file_format': 'csv'})
+
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        other = User.objects.create_user(username='other', password='secret-pass')
+        self.client.force_authenticate(other)
+        report = self.upload('products.csv', content).data['data']
+
+        self.assertEqual((report['created'], report['failed']), (5, 0))
+        copied = Product.objects.filter(created_by=other).values_list('sku', 'name', 'description')
+        original = Product.objects.filter(created_by=self.user).values_list('sku', 'name', 'description')
+        self.assertEqual(sorted(copied), sorted(original))
+
+    def test_jsonl_export_matches_list_payload(self):
+        make_product(self.user, sku='SKU-1')
+        response = self.client.get('/product/export/', {'file_format': 'jsonl'})
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows, json.loads(self.client.get('/product/').content)['data'])
+
+    def test_commands_round_trip(self):
+        make_product(self.user, name='Stapler', sku='STP-1')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.jsonl')
+            call_command('export_products', user='seller', output=path)
+            User.objects.create_user(username='other', password='secret-pass')
+            out = StringIO()
+            call_command('import_products', path, user='other', stdout=out)
+
+        self.assertIn('Created 1, updated 0, failed 0', out.getvalue())
+        self.assertEqual(Product.objects.get(created_by__username='other').name, 'Stapler')
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    THREADS = 16
+    ATTEMPTS_PER_THREAD = 25
+
+    def test_concurrent_reservations_never_oversell(self):
+        user = User.objects.create_user(username='seller', password='secret-pass')
+        product = make_product(user, stock=100)
+        successes = []
+        start = threading.Barrier(self.THREADS)
+
+        def checkout():
+            start.wait()
+            try:
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    while True:
+                        try:
+                            failures = Product.objects.reserve_stock({product.id: 1})
+                            break
+                        except OperationalError:
+                            # SQLite reports lock contention instead of waiting
+                            continue
+                    if not failures:
+                        successes.append(1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(len(successes), 100)
+        self.assertEqual(product.stock_available, 0)
+        self.assertEqual(product.units_sold, 100)
+
+    def test_concurrent_checkouts_of_one_hold_sell_it_once(self):
+        user = User.objects.create_user(username='seller', password='secret-pass')
+        product = make_product(user, stock=10)
+        token, _, _ = StockReservation.objects.hold(user, {product.id: 5})
+        statuses = []
+        start = threading.Barrier(self.THREADS)
+
+        def checkout():
+            client = APIClient()
+            client.force_authenticate(user)
+            start.wait()
+            try:
+                while True:
+                    response = client.post('/order/', {
+                        'customer_name': 'Jane Doe', 'customer_email': 'jane@example.com',
+                        'customer_address': '1 Main Street', 'reservation': str(token),
+                        'items': [{'product_id': str(product.id), 'quantity': 5}],
+                    }, format='json')
+                    # SQLite reports lock contention instead of waiting
+                    if 'locked' not in str(response.data.get('errors', '')):
+                        break
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        # The hold serves one checkout and the 5 units left in stock another
+        self.assertEqual(statuses.count(201), 2)
+        self.assertEqual((product.stock_available, product.units_sold), (0, 10))
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertFalse(StockReservation.objects.exists())
+
+
+@override_settings(FORECAST_HISTORY_DAYS=10, FORECAST_HALF_LIFE_DAYS=2, FORECAST_HORIZON_DAYS=7)
+class DemandForecastTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+        self.old = self.product(age=400)
+
+    def product(self, age):
+        product = make_product(self.user)
+        Product.objects.filter(pk=product.pk).update(created_at=timezone.now() - timedelta(days=age))
+        return product
+
+    def sell(self, product, quantity, days_ago, status='pending', recorded_now=False):
+        created_at = timezone.now() - timedelta(days=days_ago)
+        order = Order.objects.create(
+            customer_name='Jane Doe', customer_email='jane@example.com', customer_address='1 Main Street',
+            total_amount=Decimal('5.00'), status=status, created_by=self.user,
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=Decimal('5.00'))
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        if not recorded_now:
+            OrderItem.objects.filter(order=order).update(created_at=created_at)
+
+    def forecasts(self):
+        return dict(Product.objects.values_list('id', 'demand_forecast'))
+
+    def test_steady_sales_forecast_their_rate(self):
+        for days_ago in range(1, 11):
+            self.sell(self.old, 2, days_ago)
+        young = self.product(age=3)
+        for days_ago in range(1, 4):
+            self.sell(young, 3, days_ago)
+        idle = self.product(age=400)
+
+        run = run_forecast()
+        self.assertEqual(self.forecasts(), {self.old.id: 14, young.id: 21, idle.id: 0})
+        self.assertEqual((run.full, run.products_forecast, run.products_updated), (True, 3, 3))
+
+    def test_recent_days_weigh_more(self):
+        recent, earlier = self.old, self.product(age=400)
+        self.sell(recent, 10, 1)
+        self.sell(earlier, 10, 8)
+        run_forecast()
+        forecasts = self.forecasts()
+        self.assertGreater(forecasts[recent.id], forecasts[earlier.id])
+
+    def test_cancelled_today_and_older_sales_are_left_out(self):
+        self.sell(self.old, 5, 2, status='cancelled')
+        self.sell(self.old, 5, 0)
+        self.sell(self.old, 5, 11)
+        run_forecast()
+        self.assertEqual(self.forecasts(), {self.old.id: 0})
+
+    def test_later_runs_only_forecast_products_with_new_sales(self):
+        other = self.product(age=400)
+        self.sell(self.old, 4, 1)
+        self.sell(other, 4, 1)
+        run_forecast()
+
+        self.sell(other, 40, 1, recorded_now=True)
+        with self.assertNumQueries(8):
+            run = run_forecast()
+        self.assertEqual((run.full, run.products_forecast, run.products_updated), (False, 1, 1))
+        self.assertGreater(self.forecasts()[other.id], self.forecasts()[self.old.id])
+
+        # Recorded today, after the start of the day the last run forecast from: looked at again
+        self.assertEqual(run_forecast().products_forecast, 1)
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        run_forecast(today=tomorrow)
+        with mock.patch('product_manager.forecasting.CHECKPOINT_OVERLAP', timedelta(0)):
+            self.assertEqual(run_forecast(today=tomorrow).products_forecast, 0)
+        self.assertEqual(run_forecast(full=True).products_forecast, 2)
+
+    @mock.patch('product_manager.forecasting.CHECKPOINT_OVERLAP', timedelta(0))
+    def test_sales_on_the_day_of_a_run_are_counted_by_the_next_day(self):
+        today = timezone.localdate()
+        run_forecast(today=today)
+        self.sell(self.old, 30, 0)
+
+        # Today's sale is not history yet, but the product is looked at
+        run = run_forecast(today=today)
+        self.assertEqual((run.full, run.products_forecast), (False, 1))
+        self.assertEqual(self.forecasts(), {self.old.id: 0})
+
+        run = run_forecast(today=today + timedelta(days=1))
+        self.assertEqual((run.full, run.products_forecast, run.products_updated), (False, 1, 1))
+        self.assertGreater(self.forecasts()[self.old.id], 0)
+
+    def test_unfinished_runs_are_not_checkpoints(self):
+        DemandForecastRun.objects.create()
+        self.assertTrue(run_forecast().full)
+
+    def test_arrays_match_smoothing_each_product_in_turn(self):
+        rng = np.random.default_rng(0)
+        sale_products = np.repeat(np.arange(50), 30)
+        sale_ages = np.tile(np.arange(30), 50)
+        sale_units = rng.poisson(2, 1500)
+        product_ages = rng.integers(30, 60, 50)
+        self.assertEqual(
+            forecast(daily_rates(sale_products, sale_ages, sale_units, product_ages, 7, 30), 30).tolist(),
+            _forecast_per_product(sale_products, sale_ages, sale_units, product_ages, 7, 30, 30),
+        )
+
+    def test_command_reports_the_run(self):
+        self.sell(self.old, 2, 1)
+        out = StringIO()
+        call_command('forecast_demand', stdout=out)
+        self.assertIn('Forecast 1 product(s) (full run), 1 changed', out.getvalue())
+
+
+@override_settings(
+    PRICING_MIN_MARGIN_PERCENT=10, PRICING_MAX_CHANGE_PERCENT=30, PRICING_WORKERS=1, PRICING_CHUNK_SIZE=2,
+)
+class PriceOptimizationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret-pass')
+
+    def sell(self, product, quantity, unit_price, status='pending'):
+        order = Order.objects.create(
+            customer_name='Jane Doe', customer_email='jane@example.com', customer_address='1 Main Street',
+            total_amount=Decimal('5.00'), status=status, created_by=self.user,
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=Decimal(unit_price))
+
+    def prices(self):
+        return dict(Product.objects.values_list('id', 'optimized_price'))
+
+    def test_price_maximizes_margin_within_the_bounds(self):
+        cents = optimal_prices(
+            [10, 10, 10, 10, 2], [15, 25, 40, 8, 2.2], np.array([-2, -2, -2, -3, -50]), 0.1, 0.3,
+        )
+        # 2x cost at -2, within 30% of the selling price, and at least 10% over cost
+        self.assertEqual(cents.tolist(), [1950, 2000, 2800, 1100, 220])
+        # No finite optimum for inelastic demand: as for MAX_ELASTICITY
+        self.assertEqual(optimal_prices([10], [100], np.array([-0.5]), 0.1, 0.3).tolist(), [11000])
+
+    def test_elasticity_is_fitted_within_products(self):
+        # Each sells 2x the units at 20% off, but the cheap one sells more at any price
+        sale_products = np.array([0, 0, 1, 1])
+        sale_prices = np.array([10, 8, 100, 80])
+        sale_units = np.array([100, 100 * 1.25 ** 2, 2, 2 * 1.25 ** 2]) * 5000
+        fitted = elasticity(*price_moments(sale_products, sale_prices, sale_units, [5000] * 4, 2), 0)
+        self.assertTrue(np.allclose(fitted, -2, atol=0.05))
+
+        covariance, variance = price_moments(np.array([], dtype=np.int64), [], [], [], 0)
+        self.assertEqual(elasticity(covariance.sum(), variance.sum(), DEFAULT_ELASTICITY), DEFAULT_ELASTICITY)
+
+    def test_run_prices_every_product(self):
+        book = make_product(self.user, category='books', cost_price=Decimal('10.00'), selling_price=Decimal('15.00'))
+        for quantity, unit_price in [(4, '15.00'), (1, '20.00'), (9, '10.00')] * 20:
+            self.sell(book, quantity, unit_price)
+        # Cancelled orders are left out
+        self.sell(make_product(self.user, category='books'), 1, '1.00', status='cancelled')
+        unsold = make_product(self.user, category='home', cost_price=Decimal('10.00'), selling_price=Decimal('15.00'))
+
+        run = run_price_optimization()
+        self.assertEqual((run.products_priced, run.products_updated), (3, 3))
+        books = run.categories.get(category='books')
+        self.assertLess(books.elasticity, -2)
+        self.assertEqual(run.categories.get(category='home').elasticity, DEFAULT_ELASTICITY)
+        prices = self.prices()
+        # Elastic: cheaper than it sells for, but 10% over cost
+        self.assertTrue(Decimal('11.00') <= prices[book.id] < Decimal('15.00'))
+        # -1.5 is 3x cost, capped at 30% over the selling price
+        self.assertEqual(prices[unsold.id], Decimal('19.50'))
+
+        self.assertEqual(run_price_optimization().products_updated, 0)
+        self.assertEqual(PriceOptimizationRun.objects.filter(finished_at__isnull=False).count(), 2)
+
+    def test_stopped_run_resumes_from_its_checkpoints(self):
+        products = [make_product(self.user, category='books') for _ in range(5)]
+        with mock.patch('product_manager.pricing.write_prices', side_effect=[None, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                run_price_optimization()
+        # The first chunk of 2 was committed, the second rolled back
+        run = PriceOptimizationRun.objects.get()
+        books = run.categories.get(category='books')
+        self.assertEqual((books.last_product_id, books.products_priced), (products[1].id, 2))
+
+        with mock.patch('product_manager.pricing.write_prices', wraps=write_prices) as write:
+            resumed = run_price_optimization()
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertEqual(resumed.products_priced, 5)
+        self.assertEqual(sum(len(call.args[0]) for call in write.call_args_list), 3)
+        self.assertNotEqual(run_price_optimization(restart=True).pk, run.pk)
+
+    def test_command_reports_the_run(self):
+        make_product(self.user)
+        out = StringIO()
+        call_command('optimize_prices', stdout=out)
+        self.assertIn('Priced 1 product(s), 1 changed', out.getvalue())
@@ -1,7 +1,15 @@
+from backend.async_views import async_reads
+from product_manager.async_views import product_list, product_retrieve
 from product_manager.views import ProductViewSet
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
 router.register(r"", ProductViewSet, basename="product")
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls
+
+# For backend.async_urls
+async_urlpatterns = async_reads(router.urls, {
+    "product-list": product_list,
+    "product-detail": product_retrieve,
+})
@@ -1,41 +1,119 @@
+from decimal import Decimal
+
 from rest_framework.viewsets import ViewSet
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.decorators import action
+from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from .models import Product
-from .serializers import ProductSerializer
 
-class ProductViewSet(ViewSet):
+from backend.pagination import InvalidCursor, KeysetPaginator
+from backend.response_cache import cached_response
+from backend.routers import ReplicaReadsMixin
+from .bulk import (
+    EXPORT_CONTENT_TYPES, ImportFormatError, export_products, format_for, import_products, read_rows,
+)
+from .models import Product, StockReservation
+from .search import product_search
+from .serializers import (
+    PRODUCT_VALUES, ProductSerializer, StockReservationSerializer, quantities_by_product,
+    serialize_product_rows,
+)
+
+# ``ordering`` of the list, newest first by default; each has an index per owner
+PRODUCT_ORDERINGS = ('created_at', 'units_sold', 'profit_margin', 'sell_through_rate')
+# Columns the list narrows to a range of, with ``<column>__gt``, ``__gte``, ``__lt`` and ``__lte``
+PRODUCT_RANGE_FILTERS = ('profit_margin', 'sell_through_rate', 'units_sold')
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte')
+
+
+def _range_value(field, value):
+    try:
+        value = field.to_python(value)
+    except ValidationError:
+        return None
+    return value if value is not None and Decimal(value).is_finite() else None
+
+
+def product_list_query(request):
+    """
+    The products ``list`` pages through, as values() rows, the paginator for
+    their order, and the errors of the query parameters (the rows are None if
+    there are any)
+    """
+    products = Product.objects.filter(created_by=request.user)
+    errors = {}
+    
+    # Optional filtering
+    category = request.query_params.get('category', None)
+    search = request.query_params.get('search', None)
+    ordering = request.query_params.get('ordering', None)
+    
+    if category and category != 'all':
+        products = products.filter(category=category)
+    for name in PRODUCT_RANGE_FILTERS:
+        field = Product._meta.get_field(name)
+        for lookup in RANGE_LOOKUPS:
+            param = f'{name}__{lookup}'
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            value = _range_value(field, value)
+            if value is None:
+                errors[param] = "Enter a number."
+            else:
+                products = products.filter(**{param: value})
+    if ordering and ordering.removeprefix('-') not in PRODUCT_ORDERINGS:
+        errors['ordering'] = f"Choose one of: {', '.join(PRODUCT_ORDERINGS)}, with a leading '-' for descending."
+    if errors:
+        return None, None, errors
+        
+    # Search results come best match first, unless sorted otherwise
+    paginator = KeysetPaginator()
+    if search:
+        products = product_search.search(products, search)
+        paginator = KeysetPaginator(product_search.ordering(products))
+    if ordering:
+        paginator = KeysetPaginator((ordering, '-id' if ordering.startswith('-') else 'id'))
+    
+    # Plain rows serialized by a precompiled function, same payload as ProductSerializer
+    return products.values(*PRODUCT_VALUES, *products.query.annotations), paginator, errors
+
+
+class ProductViewSet(ReplicaReadsMixin, ViewSet):
     permission_classes = [IsAuthenticated]
     
+    @cached_response('product-list', ['products'])
     def list(self, request):
-        """List all products for the authenticated user"""
-        products = Product.objects.filter(created_by=request.user)
-        
-        # Optional filtering
-        category = request.query_params.get('category', None)
-        search = request.query_params.get('search', None)
+        """
+        List the authenticated user's products, newest first, one cursor page at a time.
         
-        if category and category != 'all':
-            products = products.filter(category=category)
-            
-        if search:
-            products = products.filter(
-                Q(name__icontains=search) | 
-                Q(description__icontains=search)
-            )
+        Optional ``ordering`` (e.g. ``-units_sold``) sorts by another column, and
+        ``profit_margin__lt=10`` and the like narrow it to a range; see product_list_query.
+        """
+        products, paginator, errors = product_list_query(request)
+        if errors:
+            return Response({
+                "meta": {"message": "Validation failed."},
+                "errors": errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            products, next_cursor = paginator.paginate(products, request)
+        except InvalidCursor as e:
+            return Response({
+                "meta": {"message": str(e)},
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = ProductSerializer(products, many=True)
         return Response({
-            "meta": {"message": "Products fetched successfully."},
-            "data": serializer.data,
+            "meta": {"message": "Products fetched successfully.", "next": next_cursor},
+            "data": serialize_product_rows(products),
         })
     
     def create(self, request):
         """Create a new product"""
-        serializer = ProductSerializer(data=request.data)
+        serializer = ProductSerializer(data=request.data, context={'owner': request.user})
         if serializer.is_valid():
             serializer.save(created_by=request.user)
             return Response({
@@ -59,7 +137,9 @@ class ProductViewSet(ViewSet):
     def update(self, request, pk=None):
         """Update a product"""
         product = get_object_or_404(Product, pk=pk, created_by=request.user)
-        serializer = ProductSerializer(product, data=request.data, partial=True)
+        serializer = ProductSerializer(
+            product, data=request.data, partial=True, context={'owner': request.user}
+        )
         if serializer.is_valid():
             serializer.save()
             return Response({
@@ -78,3 +158,79 @@ class ProductViewSet(ViewSet):
         return Response({
             "meta": {"message": "Product deleted successfully."}
         }, status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=False, methods=['post'])
+    def reserve(self, request):
+        """Hold stock for a checkout; pass the returned token when creating the order"""
+        serializer = StockReservationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                "meta": {"message": "Validation failed."},
+                "errors": serializer.errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        quantities = quantities_by_product(serializer.validated_data['items'])
+        token, expires_at, failures = StockReservation.objects.hold(
+            request.user, quantities, ttl=serializer.validated_data.get('ttl_seconds')
+        )
+        if failures:
+            return Response({
+                "meta": {"message": "Insufficient stock."},
+                "errors": {"lines": [
+                    {"product_id": str(product_id), "requested": quantities[product_id], "available": available}
+                    for product_id, available in failures.items()
+                ]},
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "meta": {"message": "Stock reserved successfully."},
+            "data": {"reservation": str(token), "expires_at": expires_at},
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Create or update products from an uploaded CSV or JSON Lines ``file``,
+        matched on SKU; ``file_format`` overrides the file extension
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({
+                "meta": {"message": "Validation failed."},
+                "errors": {"file": ["No file was submitted."]},
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_format = format_for(upload.name, request.data.get('file_format'))
+        except ImportFormatError as e:
+            return Response({
+                "meta": {"message": "Validation failed."},
+                "errors": {"file_format": [str(e)]},
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        report = import_products(request.user, read_rows(upload, file_format))
+        message = "Products imported with errors." if report['failed'] else "Products imported successfully."
+        return Response({
+            "meta": {"message": message},
+            "data": report,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream every product of the user (``?category=`` to narrow) as CSV or JSON Lines"""
+        try:
+            file_format = format_for(None, request.query_params.get('file_format', 'csv'))
+        except ImportFormatError as e:
+            return Response({
+                "meta": {"message": "Validation failed."},
+                "errors": {"file_format": [str(e)]},
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        products = Product.objects.filter(created_by=request.user)
+        category = request.query_params.get('category', None)
+        if category and category != 'all':
+            products = products.filter(category=category)
+        
+        response = StreamingHttpResponse(
+            export_products(products, file_format), content_type=EXPORT_CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
@@ -106,6 +106,20 @@ export const handleRefreshToken = async () => {
   }
 };
 
+// Lists are served in pages: follow meta.next until the last one and return every row
+export const listAllPages = async <T>(url: string, params?: Record<string, string>): Promise<T[]> => {
+  const rows: T[] = [];
+  let cursor: string | null | undefined;
+  do {
+    const res = await api.get<ApiResponse<T[]>, ApiResponse<T[]>>(url, {
+      params: cursor ? { ...params, cursor } : params,
+    });
+    rows.push(...res.data);
+    cursor = res.meta.next;
+  } while (cursor);
+  return rows;
+};
+
 export const queryClient = new QueryClient({
   defaultOptions: {
     queries: {
@@ -1,24 +1,22 @@
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
-import api from "../api";
+import api, { listAllPages } from "../api";
 import type { ApiErrorResponse, ApiResponse } from "../types";
 
 // List Products
-export const listOrdersRequest = async (params?: { category?: string; search?: string }): Promise<ApiResponse<any[]>> => {
-  const queryParams = new URLSearchParams();
+export const listOrdersRequest = async (params?: { category?: string; search?: string }): Promise<any[]> => {
+  const queryParams: Record<string, string> = {};
   if (params?.category && params.category !== 'all') {
-    queryParams.append('category', params.category);
+    queryParams.category = params.category;
   }
   if (params?.search) {
-    queryParams.append('search', params.search);
+    queryParams.search = params.search;
   }
-  
-  const url = `/order/${queryParams.toString() ? `?${queryParams.toString()}` : ''}`;
-  const res = await api.get<ApiResponse<any>>(url);
-  return res.data;
+
+  return listAllPages<any>('/order/', queryParams);
 }
 
 export const useListOrders = (params?: { category?: string; search?: string }) =>
-  useQuery<ApiResponse<any[]>>({
+  useQuery<any[]>({
     queryKey: ["orders", params],
     queryFn: () => listOrdersRequest(params),
   })
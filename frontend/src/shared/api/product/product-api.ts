@@ -1,25 +1,23 @@
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
-import api from "../api";
+import api, { listAllPages } from "../api";
 import type { ApiErrorResponse, ApiResponse } from "../types";
 import type { ProductIdPayload, ProductPayload } from "./types";
 
 // List Products
-export const listProductsRequest = async (params?: { category?: string; search?: string }): Promise<ApiResponse<ProductPayload[]>> => {
-  const queryParams = new URLSearchParams();
+export const listProductsRequest = async (params?: { category?: string; search?: string }): Promise<ProductPayload[]> => {
+  const queryParams: Record<string, string> = {};
   if (params?.category && params.category !== 'all') {
-    queryParams.append('category', params.category);
+    queryParams.category = params.category;
   }
   if (params?.search) {
-    queryParams.append('search', params.search);
+    queryParams.search = params.search;
   }
-  
-  const url = `/product/${queryParams.toString() ? `?${queryParams.toString()}` : ''}`;
-  const res = await api.get<ApiResponse<ProductPayload[]>>(url);
-  return res.data;
+
+  return listAllPages<ProductPayload>('/product/', queryParams);
 }
 
 export const useListProducts = (params?: { category?: string; search?: string }) =>
-  useQuery<ApiResponse<ProductPayload[]>>({
+  useQuery<ProductPayload[]>({
     queryKey: ["products", params],
     queryFn: () => listProductsRequest(params),
   })
@@ -4,6 +4,8 @@ export type ApiMeta = {
   status_code: number;
   type: ApiErrorType;
   message?: string;
+  // Cursor of the next page of a list; null on the last one
+  next?: string | null;
 };
 
 // eslint-disable-next-line @typescript-eslint/no-explicit-any